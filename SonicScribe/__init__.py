@@ -10,11 +10,23 @@ This package provides utilities for:
 
 Modules:
 - audio_extractor: Functions for extracting audio from video/audio files
+- silence_remover: Energy-based silence removal with timestamp remapping
 - whisper_api: Functions for transcribing audio using Whisper API
+- backends: Transcription engines (Whisper API, local CPU Whisper with faster-whisper)
 - translator: Functions for translating text segments
-- file_manager: Functions for saving transcripts and subtitles
+- file_manager: Functions for saving transcripts and subtitles (TXT, SRT, WebVTT, JSON)
+- segments: Compact column-oriented segment container
 - logger: Logger setup for detailed logging
+- cache: Content-addressed cache for extracted audio and transcriptions
+- translation_memory: SQLite store of previously translated segments
+- fingerprints: Audio fingerprint index for reusing the segments of repeated audio
+- rate_limiter: Token-bucket limiter for requests and tokens per minute
 - language_detector: Language detection using GPT
+- metrics: Per-stage timings and counters with JSON and Prometheus reports
+- clients: Shared API client (connection pool, timeouts, base URL) and sync/async bridging
+
+The SonicScribe.aio module provides the same stages as coroutines (transcribe,
+translate_segments, detect_language and run_pipeline) sharing one AsyncOpenAI client.
 
 Example Usage:
     from sonicscribe.utils.audio_extractor import extract_audio
@@ -22,14 +34,51 @@ Example Usage:
     from sonicscribe.utils.translator import translate_segments_to_english
 """
 
+import importlib
+
 __version__ = "1.0.3"
 __author__ = "Jisnu Kalita"
 __email__ = "ssh@tuklu.dev"
 
-# Import key utilities for easier access
-from .utils.audio_extractor import extract_audio
-from .utils.whisper_api import transcribe_audio, transcribe_large_audio
-from .utils.translator import translate_segments_to_english
-from .utils.file_manager import save_transcript, save_srt_from_segments, save_bilingual_srt
-from .utils.logger import setup_logger
-from .utils.language_detector import detect_language
\ No newline at end of file
+# Key utilities for easier access, imported on first use so that importing the package
+# (or running `sonicscribe --version`) does not load openai, pydub or moviepy
+_LAZY_ATTRIBUTES = {
+    "extract_audio": ".utils.audio_extractor",
+    "stream_audio_chunks": ".utils.audio_extractor",
+    "remove_silence": ".utils.silence_remover",
+    "remap_segments": ".utils.silence_remover",
+    "transcribe_audio": ".utils.whisper_api",
+    "transcribe_large_audio": ".utils.whisper_api",
+    "transcribe_audio_stream": ".utils.whisper_api",
+    "translate_segments_to_english": ".utils.translator",
+    "save_transcript": ".utils.file_manager",
+    "save_srt_from_segments": ".utils.file_manager",
+    "save_bilingual_srt": ".utils.file_manager",
+    "load_srt": ".utils.file_manager",
+    "write_srt": ".utils.file_manager",
+    "setup_logger": ".utils.logger",
+    "ArtifactCache": ".utils.cache",
+    "TranslationMemory": ".utils.translation_memory",
+    "FingerprintIndex": ".utils.fingerprints",
+    "RateLimiter": ".utils.rate_limiter",
+    "RequestPolicy": ".utils.request_policy",
+    "detect_language": ".utils.language_detector",
+    "configure_clients": ".utils.clients",
+    "RunMetrics": ".utils.metrics",
+    "SegmentStore": ".utils.segments",
+    "get_backend": ".utils.backends",
+    "LocalWhisperBackend": ".utils.backends"
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
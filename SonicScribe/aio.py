@@ -0,0 +1,357 @@
+"""
+Asyncio API for SonicScribe.
+
+All functions share one AsyncOpenAI client per event loop (or the client passed in),
+can be cancelled like any other task, and accept a per-request timeout. The synchronous
+functions in SonicScribe.utils are thin wrappers over the same coroutines.
+
+Example Usage:
+    import asyncio
+    from SonicScribe.aio import run_pipeline
+
+    result = asyncio.run(run_pipeline("lecture.mp4", translate=True, timeout=3600))
+    print(result["srt_path"])
+"""
+
+import os
+import time
+import asyncio
+import logging
+
+from SonicScribe.utils.audio_extractor import extract_audio, AUDIO_FORMATS
+from SonicScribe.utils.silence_remover import remove_silence, remap_segments
+from SonicScribe.utils.whisper_api import iter_chunk_segments_async, iter_large_audio_async, stream_chunks
+from SonicScribe.utils.backends import get_backend
+from SonicScribe.utils.request_policy import RequestPolicy
+from SonicScribe.utils.translator import translate_segments_async
+from SonicScribe.utils.language_detector import detect_language_async
+from SonicScribe.utils.file_manager import TranscriptWriter
+from SonicScribe.utils.segments import SegmentStore
+from SonicScribe.utils.cache import ArtifactCache, hash_file
+from SonicScribe.utils.checkpoint import JobCheckpoint, CheckpointInUseError
+from SonicScribe.utils.metrics import timed
+from SonicScribe.utils.clients import to_thread
+
+logger = logging.getLogger("SonicScribe")
+
+class StageLimits:
+    # Concurrency limits for each pipeline stage, shared by every file of a batch:
+    # audio extractions, Whisper uploads and translation batches in flight.
+    # Must be created inside the event loop that uses it.
+
+    def __init__(self, extract=2, transcribe=8, translate=8):
+        self.extract = asyncio.Semaphore(max(1, extract))
+        self.transcribe = asyncio.Semaphore(max(1, transcribe))
+        self.translate = asyncio.Semaphore(max(1, translate))
+
+def _transcription_settings(backend, model, chunk_size_mb, audio_format, stream, remove_silence_gaps, min_silence_ms):
+    # Settings that change the transcription of a file, for cache and job keys
+    return (
+        backend.cache_key(model), chunk_size_mb,
+        "stream" if stream else AUDIO_FORMATS[audio_format],
+        min_silence_ms if remove_silence_gaps and not stream else None
+    )
+
+async def iter_segments(input_path, model="whisper-1", output_dir="output/transcripts", audio_format="flac",
+                        chunk_size_mb=20, max_workers=4, remove_silence_gaps=False, min_silence_ms=1000,
+                        stream=False, extract_engine="ffmpeg", cache=None, client=None, request_timeout=None,
+                        limits=None, checkpoint=None, input_hash=None, metrics=None, backend=None, fingerprints=None,
+                        request_policy=None):
+    # Extract, optionally trim and transcribe a media file, yielding (segments, language) for each
+    # chunk in playback order as soon as it is ready. Timestamps are in original-media time and
+    # language is the language Whisper reported for the chunk, if any.
+    # limits (a StageLimits) shares the extraction and upload limits with other files, and a
+    # JobCheckpoint lets an interrupted transcription resume. input_hash skips re-hashing the input.
+    # Stage timings, cache hits and Whisper requests are recorded in metrics (a RunMetrics), if given.
+    # backend (a TranscriptionBackend or a name from backends.BACKENDS) transcribes the chunks;
+    # the default is the Whisper API through client. With a FingerprintIndex, audio heard in an
+    # earlier file reuses that file's segments (see whisper_api.iter_large_audio_async); streamed
+    # input is not fingerprinted. request_policy (a RequestPolicy) sets the retries, deadlines and
+    # hedging of transcription requests.
+    # The API client is only created once something needs it, so a local backend runs without a key
+    backend = get_backend(backend, client)
+    limits = limits or StageLimits(1, max_workers, 1)
+
+    # Reuse a cached transcription of the same content and settings
+    transcript_key = None
+    if cache is not None:
+        input_hash = input_hash or await to_thread(hash_file, input_path)
+        transcript_key = cache.make_key(
+            "transcription", input_hash,
+            *_transcription_settings(backend, model, chunk_size_mb, audio_format, stream, remove_silence_gaps, min_silence_ms)
+        )
+        cached = cache.get_json(transcript_key)
+        if metrics is not None:
+            metrics.increment("cache_hits" if cached else "cache_misses")
+        if cached:
+            logger.info("Using cached transcription")
+            yield cached["segments"], cached.get("language")
+            return
+
+    offset_map = None
+    if stream:
+        # Chunks are uploaded while ffmpeg is still decoding the rest of the file
+        chunk_segments = iter_chunk_segments_async(stream_chunks(input_path, chunk_size_mb), model,
+                                                   max_workers, client, request_timeout, limits.transcribe, checkpoint, metrics,
+                                                   backend, request_policy)
+    else:
+        async with limits.extract:
+            audio_key = cache.make_key("audio", input_hash, AUDIO_FORMATS[audio_format]) if cache is not None else None
+            audio_path = cache.get_file(audio_key, AUDIO_FORMATS[audio_format]["extension"]) if cache is not None else None
+            if cache is not None and metrics is not None:
+                metrics.increment("cache_hits" if audio_path else "cache_misses")
+            if audio_path is None:
+                with timed(metrics, "extract"):
+                    audio_path = await to_thread(extract_audio, input_path, output_dir, audio_format, extract_engine)
+                if not audio_path:
+                    raise RuntimeError(f"Failed to extract audio from {input_path}")
+                if metrics is not None:
+                    metrics.increment("bytes_extracted", os.path.getsize(audio_path))
+                if cache is not None:
+                    cache.put_file(audio_key, audio_path)
+
+            if remove_silence_gaps:
+                try:
+                    with timed(metrics, "remove_silence"):
+                        audio_path, offset_map = await to_thread(remove_silence, audio_path, output_dir, None, min_silence_ms)
+                except Exception as e:
+                    logger.warning(f"Silence removal failed, uploading the full audio: {e}")
+
+        # A local backend has no upload limit, but still splits larger files so chunks run in parallel.
+        # Fingerprinting happens while planning chunks, so with an index even small files are planned.
+        # Chunk files are written under output_dir, never next to audio taken from the cache, where
+        # another job's eviction could delete them mid-run.
+        max_file_size = backend.max_file_size or chunk_size_mb * 1024 * 1024
+        if os.path.getsize(audio_path) > max_file_size or fingerprints is not None:
+            chunk_segments = iter_large_audio_async(audio_path, model, chunk_size_mb, max_workers, client,
+                                                    request_timeout, limits.transcribe, checkpoint, metrics, backend,
+                                                    fingerprints, request_policy, work_dir=output_dir)
+        else:
+            if metrics is not None:
+                metrics.increment("chunks_planned")
+            chunk_segments = iter_chunk_segments_async([(audio_path, 0.0)], model, 1, client, request_timeout,
+                                                       limits.transcribe, checkpoint, metrics, backend, request_policy)
+
+    segments = []
+    languages = []
+    try:
+        async for chunk, chunk_language in chunk_segments:
+            # Shift timestamps back to the original media if silence was removed
+            chunk = remap_segments(chunk, offset_map)
+            segments.extend(chunk)
+            if chunk_language:
+                languages.append(chunk_language)
+            yield chunk, chunk_language
+    finally:
+        await chunk_segments.aclose()
+
+    if cache is not None and segments:
+        language = max(set(languages), key=languages.count) if languages else None
+        cache.put_json(transcript_key, {"segments": segments, "language": language})
+
+async def transcribe(input_path, model="whisper-1", output_dir="output/transcripts", audio_format="flac",
+                     chunk_size_mb=20, max_workers=4, remove_silence_gaps=False, min_silence_ms=1000,
+                     stream=False, extract_engine="ffmpeg", cache=None, client=None, request_timeout=None, backend=None,
+                     fingerprints=None, request_policy=None):
+    # Extract, optionally trim and transcribe a media file.
+    # Returns segment dicts with timestamps in original-media time.
+    segments = []
+    chunk_segments = iter_segments(input_path, model, output_dir, audio_format, chunk_size_mb, max_workers,
+                                   remove_silence_gaps, min_silence_ms, stream, extract_engine, cache,
+                                   client, request_timeout, backend=backend, fingerprints=fingerprints,
+                                   request_policy=request_policy)
+    try:
+        async for chunk, _ in chunk_segments:
+            segments.extend(chunk)
+    finally:
+        await chunk_segments.aclose()
+    return segments
+
+async def translate_segments(segments, source_language="unknown", model="gpt-4o-mini", batch_size=50, memory=None,
+                             max_workers=4, rate_limiter=None, client=None, request_timeout=None, semaphore=None,
+                             batch_tokens=None, metrics=None, request_policy=None):
+    # Translate segments to English; see translator.translate_segments_async
+    return await translate_segments_async(segments, batch_size, model, source_language, memory,
+                                          max_workers, rate_limiter, client, request_timeout, semaphore, batch_tokens,
+                                          metrics, request_policy)
+
+async def detect_language(text, client=None, request_timeout=None, hint=None, metrics=None):
+    # Detect the language of a text as an ISO code; see language_detector.detect_language_async
+    return await detect_language_async(text, client, request_timeout, hint, metrics)
+
+async def run_pipeline(input_path, output_dir="output/transcripts", translate=False, bilingual=False,
+                       whisper_model="whisper-1", gpt_model="gpt-4o-mini", language=None, audio_format="flac",
+                       chunk_size_mb=20, max_workers=4, translation_workers=4, remove_silence_gaps=False,
+                       min_silence_ms=1000, stream=False, extract_engine="ffmpeg", cache=None, memory=None,
+                       rate_limiter=None, client=None, request_timeout=None, timeout=None, on_segments=None,
+                       limits=None, checkpoint_dir=None, metrics=None, formats=("txt", "srt"), backend=None,
+                       fingerprints=None, request_policy=None):
+    # Run extraction, transcription, optional translation and file writing without any prompts.
+    # The stages overlap: each chunk is translated and appended to the output files while later
+    # chunks are still being transcribed. on_segments, if given, is called with every written batch.
+    # timeout bounds the whole run; request_timeout bounds each API request. limits (a StageLimits)
+    # shares per-stage concurrency limits with other pipelines, as run_batch does. With checkpoint_dir,
+    # finished chunks and translation batches are recorded there, a re-run of an interrupted job resumes
+    # from the first unfinished unit, and the checkpoint is deleted once the job succeeds.
+    # metrics (a RunMetrics) collects per-stage timings and counters of every stage. formats selects the
+    # outputs written besides the bilingual SRT (see file_manager.OUTPUT_FORMATS). backend selects the
+    # transcription engine (see iter_segments); translation always goes through client. fingerprints
+    # (a FingerprintIndex) reuses the segments of audio transcribed in earlier files. request_policy
+    # (a RequestPolicy, see whisper_api.transcribe_audio_async) governs retries, per-attempt deadlines
+    # and hedging of transcription requests and the backoff between translation retries; pass one to
+    # share its latency statistics between runs.
+    # Returns a dict with the segments (a SegmentStore), the source language and the paths of the
+    # written files, both as transcript_path/srt_path/bilingual_path and by format under "paths".
+    backend = get_backend(backend, client)
+    limits = limits or StageLimits(1, max_workers, translation_workers)
+
+    async def transcribe_stage(queue, checkpoint, input_hash):
+        chunk_segments = iter_segments(
+            input_path, whisper_model, output_dir, audio_format, chunk_size_mb, max_workers,
+            remove_silence_gaps, min_silence_ms, stream, extract_engine, cache, client, request_timeout, limits,
+            checkpoint, input_hash, metrics, backend, fingerprints, request_policy
+        )
+        try:
+            async for result in chunk_segments:
+                queue.put_nowait(result)
+        finally:
+            await chunk_segments.aclose()
+            queue.put_nowait(None)
+
+    async def pipeline():
+        source_language = language
+        segments = SegmentStore()
+
+        # Hash the input once for both the artifact cache and the job checkpoint
+        input_hash = None
+        checkpoint = None
+        translation_memory = memory
+        if cache is not None or checkpoint_dir:
+            input_hash = await to_thread(hash_file, input_path)
+        if checkpoint_dir:
+            job_key = ArtifactCache.make_key("job", input_hash, *_transcription_settings(
+                backend, whisper_model, chunk_size_mb, audio_format, stream, remove_silence_gaps, min_silence_ms
+            ))
+            try:
+                checkpoint = await to_thread(JobCheckpoint.for_job, job_key, checkpoint_dir)
+                translation_memory = checkpoint.translation_memory(memory)
+            except CheckpointInUseError as e:
+                # The same input with the same settings is already running; this run goes without
+                # a checkpoint rather than sharing its manifest and chunk files
+                logger.warning(f"{e}; transcribing {input_path} without resuming")
+
+        writer = TranscriptWriter(input_path, output_dir, bilingual=translate and bilingual, formats=formats)
+        # Transcribed chunks are small lists of segments, so the queue is left unbounded
+        # and transcription never waits for translation
+        queue = asyncio.Queue()
+        producer = asyncio.create_task(transcribe_stage(queue, checkpoint, input_hash))
+        try:
+            while True:
+                result = await queue.get()
+                if result is None:
+                    break
+                chunk, whisper_language = result
+                if not chunk:
+                    continue
+
+                # Whisper reports the language of each chunk; only if it does not is
+                # a sample of the first transcribed chunk detected separately
+                if not source_language:
+                    source_language = await detect_language(" ".join(s["text"] for s in chunk), client,
+                                                            request_timeout, hint=whisper_language, metrics=metrics)
+
+                if translate:
+                    try:
+                        chunk = await translate_segments(
+                            chunk, source_language, gpt_model, memory=translation_memory, max_workers=translation_workers,
+                            rate_limiter=rate_limiter, client=client, request_timeout=request_timeout,
+                            semaphore=limits.translate, metrics=metrics, request_policy=request_policy
+                        )
+                    except Exception as e:
+                        logger.warning(f"Translation failed, keeping the original text: {e}")
+
+                # Packed once, then both written and kept for the result
+                packed = SegmentStore(chunk)
+                with timed(metrics, "write"):
+                    await to_thread(writer.write, packed)
+                if metrics is not None:
+                    metrics.increment("segments_written", len(packed))
+                segments.extend(packed)
+                if on_segments is not None:
+                    on_segments(chunk)
+
+            # Re-raise a transcription failure
+            await producer
+            if not segments:
+                raise RuntimeError(f"No segments found in transcription of {input_path}")
+        except BaseException:
+            producer.cancel()
+            # Let the producer unwind before its chunk files and checkpoint are released
+            await asyncio.gather(producer, return_exceptions=True)
+            writer.discard()
+            if checkpoint is not None:
+                checkpoint.close()
+            raise
+
+        with timed(metrics, "write"):
+            paths = writer.close()
+        if checkpoint is not None:
+            checkpoint.remove()
+        return {
+            "segments": segments,
+            "language": source_language,
+            "transcript_path": paths["transcript"],
+            "srt_path": paths["srt"],
+            "bilingual_path": paths["bilingual"],
+            "paths": {name: path for name, path in paths.items() if name != "transcript" and path}
+        }
+
+    return await asyncio.wait_for(pipeline(), timeout)
+
+async def run_batch(inputs, output_dir="output/transcripts", jobs=2, extract_workers=2, max_workers=8,
+                    translation_workers=8, client=None, on_result=None, **options):
+    # Run run_pipeline over many media files with one client and shared per-stage limits:
+    # at most jobs files at once, extract_workers extractions, max_workers Whisper uploads and
+    # translation_workers translation batches in flight across all files. Outputs mirror the
+    # inputs' directory layout under output_dir. Other options are passed to run_pipeline.
+    # A failing file does not stop the batch. Returns one summary dict per input, in input
+    # order, and calls on_result with each summary as its file finishes. A RunMetrics passed as
+    # metrics collects the stages of every file, plus the number of completed and failed files.
+    # One RequestPolicy serves every file unless one is passed as request_policy.
+    metrics = options.get("metrics")
+    options["request_policy"] = options.get("request_policy") or RequestPolicy()
+    limits = StageLimits(extract_workers, max_workers, translation_workers)
+    slots = asyncio.Semaphore(max(1, jobs))
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in inputs]) if inputs else ""
+
+    async def run_one(input_path):
+        file_output_dir = os.path.normpath(os.path.join(
+            output_dir, os.path.relpath(os.path.dirname(os.path.abspath(input_path)), root)
+        ))
+        async with slots:
+            start_time = time.time()
+            try:
+                result = await run_pipeline(input_path, file_output_dir, client=client, max_workers=max_workers,
+                                            translation_workers=translation_workers, limits=limits, **options)
+                summary = {
+                    "input": input_path,
+                    "status": "ok",
+                    "error": None,
+                    "segments": len(result["segments"]),
+                    "language": result["language"],
+                    "transcript_path": result["transcript_path"],
+                    "srt_path": result["srt_path"],
+                    "bilingual_path": result["bilingual_path"]
+                }
+            except Exception as e:
+                logger.error(f"Failed to process {input_path}: {e}")
+                summary = {"input": input_path, "status": "failed", "error": str(e) or type(e).__name__}
+            if metrics is not None:
+                metrics.increment("files_completed" if summary["status"] == "ok" else "files_failed")
+            summary["elapsed"] = time.time() - start_time
+
+        if on_result is not None:
+            on_result(summary)
+        return summary
+
+    return await asyncio.gather(*(run_one(path) for path in inputs))
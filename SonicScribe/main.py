@@ -3,65 +3,90 @@ import sys
 import logging
 import time
 import os
-import questionary
-from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
+import json
 from rich.console import Console
 
-from SonicScribe.utils.audio_extractor import extract_audio
-from SonicScribe.utils.whisper_api import transcribe_audio, transcribe_large_audio
-from SonicScribe.utils.file_manager import save_transcript, save_srt_from_segments
-from SonicScribe.utils.translator import translate_segments_to_english
+from SonicScribe.utils.audio_extractor import AUDIO_FORMATS
+from SonicScribe.utils.file_manager import collect_inputs, OUTPUT_FORMATS
 from SonicScribe.utils.logger import setup_logger
-from SonicScribe.utils.language_detector import detect_language
+from SonicScribe.utils.language_detector import LANGUAGES
+from SonicScribe.utils.cache import ArtifactCache, DEFAULT_CACHE_DIR
+from SonicScribe.utils.translation_memory import TranslationMemory
+from SonicScribe.utils.fingerprints import FingerprintIndex
+from SonicScribe.utils.request_policy import RequestPolicy
+from SonicScribe.utils.rate_limiter import RateLimiter
+from SonicScribe.utils.clients import configure_clients
+from SonicScribe.utils.backends import BACKENDS, get_backend
+from SonicScribe.utils.metrics import RunMetrics
 from SonicScribe import __version__
 
+def parse_formats(value):
+    # --formats value as a tuple of OUTPUT_FORMATS names
+    formats = tuple(name.strip().lower() for name in value.split(",") if name.strip())
+    unknown = [name for name in formats if name not in OUTPUT_FORMATS]
+    if unknown or not formats:
+        raise argparse.ArgumentTypeError(f"unknown output format(s) in {value!r}; choose from {', '.join(OUTPUT_FORMATS)}")
+    return formats
+
 def parse_args():
     # Parse command line arguments with expanded options
     parser = argparse.ArgumentParser(description="🎙️ SonicScribe - Transcribe & Translate using Whisper API")
-    parser.add_argument("--input", required=True, help="Path to input audio/video file")
+    parser.add_argument("--input", required=True, help="Path to input audio/video file, or a directory, glob pattern or manifest (.txt list of paths) to process as a batch")
+    parser.add_argument("--language", help="Language code of the input (e.g. 'fr'); skips the language prompt")
+    parser.add_argument("--non-interactive", action="store_true", help="Never prompt; auto-detect the language unless --language is given (always on for batches)")
     parser.add_argument("--translate", action="store_true", help="Translate subtitles to English using GPT")
     parser.add_argument("--output-dir", default="output/transcripts", help="Directory to save output files")
-    parser.add_argument("--whisper-model", default="whisper-1", help="Whisper model to use for transcription")
+    parser.add_argument("--whisper-model", default="whisper-1", help="Whisper model to use for transcription (with --backend local: a faster-whisper model such as small or large-v3; whisper-1 means small)")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="api", help="Transcribe with the Whisper API, or locally on the CPU with faster-whisper (pip install sonicscribe[local])")
+    parser.add_argument("--compute-type", default="int8", help="Quantization of the local model with --backend local (e.g. int8, int8_float32, float32)")
+    parser.add_argument("--cpu-threads", type=int, help="Threads per local transcription worker with --backend local (default: all cores split between --workers)")
     parser.add_argument("--gpt-model", default="gpt-4o-mini", help="GPT model to use for translation")
     parser.add_argument("--chunk-size", type=int, default=20, help="Chunk size in MB for large files")
+    parser.add_argument("--workers", type=int, default=4, help="Number of chunks to transcribe concurrently (shared by all files in a batch)")
+    parser.add_argument("--translation-workers", type=int, default=4, help="Number of translation batches to send concurrently (shared by all files in a batch)")
+    parser.add_argument("--jobs", type=int, default=2, help="Number of files processed at the same time in a batch")
+    parser.add_argument("--extract-workers", type=int, default=2, help="Number of audio extractions run at the same time in a batch")
+    parser.add_argument("--summary", help="Write a JSON summary of a batch run to this path")
+    parser.add_argument("--report", help="Write per-stage timings and counters of the run to this JSON file")
+    parser.add_argument("--prometheus", help="Write the run's metrics to this file in the Prometheus text format (for node_exporter's textfile collector)")
+    parser.add_argument("--rpm", type=int, default=500, help="Maximum translation requests per minute")
+    parser.add_argument("--tpm", type=int, default=200000, help="Maximum translation tokens per minute")
+    parser.add_argument("--audio-format", choices=list(AUDIO_FORMATS), default="flac", help="Encoding of the extracted audio uploaded to Whisper (flac, mp3 and opus are mono 16 kHz)")
+    parser.add_argument("--extract-engine", choices=["ffmpeg", "moviepy"], default="ffmpeg", help="Audio extraction engine (ffmpeg demuxes only the audio stream)")
+    parser.add_argument("--stream", action="store_true", help="Decode audio through an ffmpeg pipe and upload chunks while the rest of the file is still being decoded")
+    parser.add_argument("--remove-silence", action="store_true", help="Cut silence and music beds out of the audio before uploading it")
+    parser.add_argument("--min-silence", type=int, default=1000, help="Shortest pause in milliseconds removed by --remove-silence")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the extraction, transcription and translation caches")
+    parser.add_argument("--no-resume", action="store_true", help="Do not checkpoint finished chunks and translation batches for resuming an interrupted run")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory for cached audio, transcriptions, job checkpoints, the translation memory and the fingerprint index")
+    parser.add_argument("--base-url", help="OpenAI-compatible API base URL, e.g. a gateway or local mock (default: OPENAI_BASE_URL or the OpenAI API)")
+    parser.add_argument("--max-connections", type=int, help="Maximum open HTTP connections shared by all API requests (default: 100)")
+    parser.add_argument("--connect-timeout", type=float, help="Seconds to wait for an API connection (default: 10)")
+    parser.add_argument("--max-attempts", type=int, default=3, help="Attempts per Whisper request, counting the first (default: 3); only timeouts, rate limits, server errors and dropped connections are retried")
+    parser.add_argument("--request-deadline", type=float, help="Seconds one Whisper attempt may take before it is abandoned and retried (default: 60 plus 20 per MB uploaded)")
+    parser.add_argument("--hedge-percentile", type=float, help="Send a duplicate of any Whisper request slower than this percentile of recent requests (e.g. 95) and use whichever answers first")
+    parser.add_argument("--read-timeout", type=float, help="Seconds to wait while uploading to or reading from the API (default: 600)")
+    parser.add_argument("--reuse-repeated-audio", action="store_true", help="Fingerprint transcribed audio and reuse the segments of stretches heard before (intros, jingles, ads) instead of transcribing them again")
+    parser.add_argument("--fingerprint-regions", type=int, default=50000, help="Maximum number of 10-second regions kept in the fingerprint index before least recently matched ones are evicted")
+    parser.add_argument("--cache-size", type=int, default=2048, help="Maximum cache size in MB before least recently used entries are evicted")
     parser.add_argument("--verbose", "-v", action="store_true", help="Enable verbose logging")
     parser.add_argument("--bilingual", action="store_true", help="Create bilingual subtitles with original and translated text")
+    parser.add_argument("--formats", default="txt,srt", type=parse_formats, help=f"Comma-separated output formats to write: {', '.join(f for f in OUTPUT_FORMATS if f != 'bilingual')} (--bilingual adds the bilingual SRT)")
     parser.add_argument("--version", action="version", version=f"SonicScribe {__version__}")  # Dynamically fetch version
     return parser.parse_args()
 
-def select_language(original_segments, console):
+def select_language(console):
     # Prompt the user to select or input a language.
+    # Returns None for auto-detection, which then runs on the first transcribed chunk.
+    # questionary pulls in prompt_toolkit, so it is only imported when a prompt is shown
+    import questionary
+    
     console.print("[bold yellow]🌐 Language Selection[/bold yellow]")
     
     # Predefined list of languages
     language_choices = [
         "Auto-detect (default)",
-        "af (Afrikaans)", "am (Amharic)", "ar (Arabic)", "as (Assamese)",
-        "az (Azerbaijani)", "ba (Bashkir)", "be (Belarusian)", "bg (Bulgarian)",
-        "bn (Bengali)", "bo (Tibetan)", "br (Breton)", "bs (Bosnian)",
-        "ca (Catalan)", "cs (Czech)", "cy (Welsh)", "da (Danish)",
-        "de (German)", "el (Greek)", "en (English)", "eo (Esperanto)",
-        "es (Spanish)", "et (Estonian)", "eu (Basque)", "fa (Persian)",
-        "fi (Finnish)", "fo (Faroese)", "fr (French)", "gl (Galician)",
-        "gu (Gujarati)", "ha (Hausa)", "haw (Hawaiian)", "he (Hebrew)",
-        "hi (Hindi)", "hr (Croatian)", "ht (Haitian Creole)", "hu (Hungarian)",
-        "hy (Armenian)", "id (Indonesian)", "is (Icelandic)", "it (Italian)",
-        "ja (Japanese)", "jw (Javanese)", "ka (Georgian)", "kk (Kazakh)",
-        "km (Khmer)", "kn (Kannada)", "ko (Korean)", "la (Latin)",
-        "lb (Luxembourgish)", "ln (Lingala)", "lo (Lao)", "lt (Lithuanian)",
-        "lv (Latvian)", "mg (Malagasy)", "mi (Maori)", "mk (Macedonian)",
-        "ml (Malayalam)", "mn (Mongolian)", "mr (Marathi)", "ms (Malay)",
-        "mt (Maltese)", "my (Burmese)", "ne (Nepali)", "nl (Dutch)",
-        "no (Norwegian)", "oc (Occitan)", "pa (Punjabi)", "pl (Polish)",
-        "ps (Pashto)", "pt (Portuguese)", "ro (Romanian)", "ru (Russian)",
-        "sa (Sanskrit)", "sd (Sindhi)", "si (Sinhala)", "sk (Slovak)",
-        "sl (Slovenian)", "sn (Shona)", "so (Somali)", "sq (Albanian)",
-        "sr (Serbian)", "su (Sundanese)", "sv (Swedish)", "sw (Swahili)",
-        "ta (Tamil)", "te (Telugu)", "tg (Tajik)", "th (Thai)",
-        "tk (Turkmen)", "tl (Tagalog)", "tr (Turkish)", "tt (Tatar)",
-        "uk (Ukrainian)", "ur (Urdu)", "uz (Uzbek)", "vi (Vietnamese)",
-        "wa (Walloon)", "xh (Xhosa)", "yi (Yiddish)", "yo (Yoruba)",
-        "zh (Chinese)", "zu (Zulu)"
+        *(f"{code} ({name})" for code, name in LANGUAGES.items())
     ]
     
     # Ask the user to select or input a language
@@ -78,162 +103,285 @@ def select_language(original_segments, console):
     
     # Handle auto-detection
     if selected_language == "Auto-detect (default)":
-        console.print("[bold yellow]🌐 Auto-detecting language... This may cost additional API usage.[/bold yellow]")
-        detected_language = detect_language(" ".join([s["text"] for s in original_segments]))
-        console.print(f"[bold green]🌐 Detected language: {detected_language}[/bold green]")
-        return detected_language
+        console.print("[bold yellow]🌐 Language will be auto-detected... This may cost additional API usage.[/bold yellow]")
+        return None
     
     # Return the selected or manually entered language
     return selected_language.split(" ")[0]  # Extract language code (e.g., 'en')
 
-def main():
-    args = parse_args()
+def pipeline_options(args, language, cache, memory, fingerprints=None):
+    # run_pipeline options shared by single-file and batch runs
+    return {
+        "translate": args.translate,
+        "bilingual": args.bilingual,
+        "whisper_model": args.whisper_model,
+        "gpt_model": args.gpt_model,
+        "language": language,
+        "audio_format": args.audio_format,
+        "chunk_size_mb": args.chunk_size,
+        "remove_silence_gaps": args.remove_silence and not args.stream,
+        "min_silence_ms": args.min_silence,
+        "stream": args.stream,
+        "extract_engine": args.extract_engine,
+        "cache": cache,
+        "memory": memory,
+        "fingerprints": fingerprints,
+        "request_policy": RequestPolicy(args.max_attempts, args.request_deadline, hedge_percentile=args.hedge_percentile),
+        "rate_limiter": RateLimiter(args.rpm, args.tpm),
+        "checkpoint_dir": None if args.no_cache or args.no_resume else os.path.join(args.cache_dir, "jobs"),
+        "formats": args.formats,
+        # The API backend uses the pipeline's own client; a local one is built once and shares its loaded model
+        "backend": get_backend(args.backend, compute_type=args.compute_type, workers=args.workers,
+                               cpu_threads=args.cpu_threads) if args.backend != "api" else None
+    }
+
+def add_stage_tasks(progress, metrics, translate):
+    # Determinate progress bars for transcribed chunks and translated segments, driven by the
+    # run's metrics. A bar stays indeterminate until its total is known (streamed input has none).
+    transcribe_task = progress.add_task("Transcribing chunks...", total=None)
+    translate_task = progress.add_task("Translating segments...", total=None) if translate else None
     
-    # Setup logger
-    log_level = logging.DEBUG if args.verbose else logging.INFO
-    logger = setup_logger(log_level)
+    def show_progress(metrics, done=False):
+        chunks = metrics.get("chunks_transcribed") + metrics.get("chunks_resumed") + metrics.get("chunks_reused")
+        progress.update(transcribe_task, total=chunks if done else metrics.get("chunks_planned") or None, completed=chunks)
+        if translate_task is not None:
+            translated = metrics.get("segments_translated")
+            progress.update(translate_task, total=translated if done else metrics.get("segments_to_translate") or None,
+                            completed=translated)
     
-    # Rich console for pretty output
-    console = Console()
+    def finish():
+        # Every bar is complete once the run is; streamed input only now learns its total
+        show_progress(metrics, done=True)
     
-    console.print(f"[bold blue]🎙️ SonicScribe[/bold blue]")
-    console.print(f"📂 File: [cyan]{args.input}[/cyan]")
-    console.print(f"🔁 Translate to English: [cyan]{'Yes' if args.translate else 'No'}[/cyan]")
-    console.print(f"💾 Output directory: [cyan]{args.output_dir}[/cyan]")
-    console.print(f"🤖 Whisper model: [cyan]{args.whisper_model}[/cyan]")
-    
-    if args.translate:
-        console.print(f"🤖 Translation model: [cyan]{args.gpt_model}[/cyan]")
+    metrics.on_update = show_progress
+    return finish
+
+def write_reports(args, metrics, status):
+    # Write the --report and --prometheus files of a finished (or failed) run
+    if args.report:
+        metrics.write_json(args.report, input=args.input, status=status)
+    if args.prometheus:
+        metrics.write_prometheus(args.prometheus)
+
+def process_file(args, console, language, cache, memory, metrics, fingerprints=None):
+    # Process a single input with live progress and a transcript preview
+    # The pipeline and progress display are imported here so `--help` and `--version` stay fast
+    from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn, BarColumn, MofNCompleteColumn
+    from SonicScribe.utils.clients import run_sync
+    from SonicScribe.aio import run_pipeline
     
     start_time = time.time()
     
-    # Extract audio with progress spinner
+    # Transcribe, translate and write chunk by chunk, with a progress bar per stage
     with Progress(
         SpinnerColumn(),
         TextColumn("[bold blue]{task.description}[/bold blue]"),
+        BarColumn(),
+        MofNCompleteColumn(),
         TimeElapsedColumn(),
         console=console
     ) as progress:
-        task = progress.add_task("Extracting audio...", total=None)
-        audio_path = extract_audio(args.input, args.output_dir)
-        progress.update(task, completed=True)
+        finish = add_stage_tasks(progress, metrics, args.translate)
+        written = []
+        
+        def on_segments(segments):
+            if not written:
+                progress.console.print(f"📝 First subtitles written after [cyan]{time.time() - start_time:.2f}[/cyan] seconds")
+            written.extend(segments)
+        
+        try:
+            result = run_sync(run_pipeline(
+                args.input,
+                output_dir=args.output_dir,
+                max_workers=args.workers,
+                translation_workers=args.translation_workers,
+                on_segments=on_segments,
+                metrics=metrics,
+                **pipeline_options(args, language, cache, memory, fingerprints)
+            ))
+            finish()
+        except Exception as e:
+            console.print(f"[bold red]❌ Error processing {args.input}: {e}[/bold red]")
+            return 1
     
-    if not audio_path:
-        console.print("[bold red]❌ Failed to extract audio. Exiting.[/bold red]")
-        return 1
+    if language is None:
+        console.print(f"[bold green]🌐 Detected language: {result['language']}[/bold green]")
+    
+    # Extract full text from segments
+    full_text = " ".join(result["segments"].texts)
+    
+    console.print("\n[bold green]📄 Transcript Preview:[/bold green]\n")
+    preview_text = full_text[:500] + ("..." if len(full_text) > 500 else "")
+    console.print(f"[italic]{preview_text}[/italic]")
+    
+    if result["bilingual_path"]:
+        console.print(f"🌐 Bilingual SRT saved to: [cyan]{result['bilingual_path']}[/cyan]")
+    
+    console.print("\n[bold green]✅ Processing complete![/bold green]")
+    elapsed_time = time.time() - start_time
+    console.print(f"⏱️ Total processing time: [cyan]{elapsed_time:.2f}[/cyan] seconds")
+    if result["transcript_path"]:
+        console.print(f"📄 Transcript saved to: [cyan]{result['transcript_path']}[/cyan]")
+    if result["srt_path"]:
+        console.print(f"🎬 SRT subtitles saved to: [cyan]{result['srt_path']}[/cyan]")
+    if result["paths"].get("vtt"):
+        console.print(f"🎬 WebVTT subtitles saved to: [cyan]{result['paths']['vtt']}[/cyan]")
+    if result["paths"].get("json"):
+        console.print(f"🧾 JSON segments saved to: [cyan]{result['paths']['json']}[/cyan]")
+    
+    return 0
+
+def process_batch(args, console, inputs, language, cache, memory, metrics, fingerprints=None):
+    # Process many inputs in one event loop with shared clients and per-stage limits,
+    # then print a per-file summary. Returns 1 if any file failed.
+    from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn, BarColumn, MofNCompleteColumn
+    from rich.table import Table
+    from SonicScribe.utils.clients import run_sync
+    from SonicScribe.aio import run_batch
+    
+    start_time = time.time()
     
-    # Transcribe audio with progress spinner
     with Progress(
         SpinnerColumn(),
         TextColumn("[bold blue]{task.description}[/bold blue]"),
+        BarColumn(),
+        MofNCompleteColumn(),
         TimeElapsedColumn(),
         console=console
     ) as progress:
-        task = progress.add_task("Transcribing audio...", total=None)
-        try:
-            # Check file size and use appropriate transcription method
-            file_size = os.path.getsize(audio_path)
-            if file_size > 25 * 1024 * 1024:  # 25 MB
-                console.print(f"[yellow]⚠️ Audio file is too large for Whisper API ({file_size / (1024 * 1024):.2f} MB), splitting into chunks...[/yellow]")
-                text_response = transcribe_large_audio(audio_path, args.whisper_model, args.chunk_size)
-            else:
-                console.print(f"[green]Audio file size: {file_size / (1024 * 1024):.2f} MB, using Whisper API directly[/green]")
-                text_response = transcribe_audio(audio_path, args.whisper_model)
-                
-            progress.update(task, completed=True)
-            
-            if not text_response:
-                console.print("[bold red]❌ Failed to transcribe audio. Exiting.[/bold red]")
-                return 1
-                
-        except Exception as e:
-            progress.update(task, completed=True)
-            console.print(f"[bold red]❌ Error during transcription: {e}[/bold red]")
-            return 1
-    
-    # Process segments
-    try:
-        # Handle different response formats
-        if hasattr(text_response, "segments"):
-            segments = text_response.segments
-        else:
-            segments = text_response.get("segments", [])
-            
-        if not segments:
-            console.print("[bold red]😔 No segments found in transcription response.[/bold red]")
-            return 1
+        task = progress.add_task("Processing files...", total=len(inputs))
+        finish = add_stage_tasks(progress, metrics, args.translate)
         
-        # Store original segments before translation
-        original_segments = []
-        for seg in segments:
-            if hasattr(seg, 'start') and hasattr(seg, 'end') and hasattr(seg, 'text'):
-                original_segments.append({
-                    "start": seg.start if hasattr(seg, 'start') else seg["start"],
-                    "end": seg.end if hasattr(seg, 'end') else seg["end"],
-                    "text": seg.text if hasattr(seg, 'text') else seg["text"]
-                })
+        def on_result(summary):
+            if summary["status"] == "ok":
+                progress.console.print(f"[green]✅ {summary['input']}[/green] ({summary['segments']} segments, {summary['elapsed']:.1f}s)")
             else:
-                original_segments.append(seg.copy() if hasattr(seg, 'copy') else dict(seg))
+                progress.console.print(f"[red]❌ {summary['input']}: {summary['error']}[/red]")
+            progress.advance(task)
         
-        # Prompt user for language selection
-        detected_language = select_language(original_segments, console)
-        
-        if args.translate:
-            with Progress(
-                SpinnerColumn(),
-                TextColumn("[bold blue]{task.description}[/bold blue]"),
-                TimeElapsedColumn(),
-                console=console
-            ) as progress:
-                task = progress.add_task("Translating segments to English...", total=None)
-                try:
-                    translated_segments = translate_segments_to_english(
-                        original_segments, 
-                        batch_size=10, 
-                        model=args.gpt_model,
-                        source_language=detected_language
-                    )
-                    progress.update(task, completed=True)
-                    
-                    # Use translated segments for further processing
-                    segments = translated_segments
-                except Exception as e:
-                    progress.update(task, completed=True)
-                    console.print(f"[bold yellow]⚠️ Translation warning: {e}[/bold yellow]")
-                    console.print("[bold yellow]⚠️ Continuing with original segments...[/bold yellow]")
-        
-        # Extract full text from segments
-        full_text = " ".join([s["text"] for s in segments])
-        
-        console.print("\n[bold green]📄 Transcript Preview:[/bold green]\n")
-        preview_text = full_text[:500] + ("..." if len(full_text) > 500 else "")
-        console.print(f"[italic]{preview_text}[/italic]")
-        
-        # Save transcript and SRT files
-        transcript_path = save_transcript(full_text, args.input, args.output_dir)
-        srt_path = save_srt_from_segments(segments, args.input, args.output_dir)
-        
-        # Save bilingual SRT if requested and translation was done
-        if args.translate and args.bilingual and "original_text" in segments[0]:
-            from utils.file_manager import save_bilingual_srt
-            bilingual_path = save_bilingual_srt(segments, args.input, args.output_dir)
-            if bilingual_path:
-                console.print(f"🌐 Bilingual SRT saved to: [cyan]{bilingual_path}[/cyan]")
-        
-        if transcript_path and srt_path:
-            console.print("\n[bold green]✅ Processing complete![/bold green]")
-            elapsed_time = time.time() - start_time
-            console.print(f"⏱️ Total processing time: [cyan]{elapsed_time:.2f}[/cyan] seconds")
-            console.print(f"📄 Transcript saved to: [cyan]{transcript_path}[/cyan]")
-            console.print(f"🎬 SRT subtitles saved to: [cyan]{srt_path}[/cyan]")
-        else:
-            console.print("\n[bold yellow]⚠️ Processing completed with warnings.[/bold yellow]")
-            return 1
-    except Exception as e:
-        console.print(f"[bold red]❌ Error processing transcription: {e}[/bold red]")
-        return 1
+        results = run_sync(run_batch(
+            inputs,
+            output_dir=args.output_dir,
+            jobs=args.jobs,
+            extract_workers=args.extract_workers,
+            max_workers=args.workers,
+            translation_workers=args.translation_workers,
+            on_result=on_result,
+            metrics=metrics,
+            **pipeline_options(args, language, cache, memory, fingerprints)
+        ))
+        finish()
+    
+    table = Table(title="Batch summary")
+    table.add_column("File", style="cyan")
+    table.add_column("Status")
+    table.add_column("Segments", justify="right")
+    table.add_column("Language")
+    table.add_column("Time", justify="right")
+    for summary in results:
+        ok = summary["status"] == "ok"
+        table.add_row(
+            summary["input"],
+            "[green]ok[/green]" if ok else f"[red]failed[/red] {summary['error']}",
+            str(summary["segments"]) if ok else "-",
+            summary["language"] if ok else "-",
+            f"{summary['elapsed']:.1f}s"
+        )
+    console.print(table)
+    
+    failed = sum(1 for summary in results if summary["status"] != "ok")
+    console.print(f"⏱️ Processed [cyan]{len(results)}[/cyan] files in [cyan]{time.time() - start_time:.2f}[/cyan] seconds, "
+                  f"[{'red' if failed else 'green'}]{failed} failed[/{'red' if failed else 'green'}]")
+    
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        console.print(f"📋 Summary saved to: [cyan]{args.summary}[/cyan]")
+    
+    return 1 if failed else 0
 
-    return 0
+def main():
+    # `sonicscribe serve ...` runs the long-running job service instead of a one-off run
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from SonicScribe.server import main as serve
+        return serve(sys.argv[2:])
+    
+    args = parse_args()
+    
+    # Setup logger
+    log_level = logging.DEBUG if args.verbose else logging.INFO
+    logger = setup_logger(log_level)
+    
+    # All API requests share one connection pool configured from the command line
+    configure_clients(
+        base_url=args.base_url,
+        max_connections=args.max_connections,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        write_timeout=args.read_timeout
+    )
+    
+    # Rich console for pretty output
+    console = Console()
+    
+    # A directory, glob or manifest expands to a batch of files
+    inputs = collect_inputs(args.input)
+    batch = inputs != [args.input]
+    
+    console.print(f"[bold blue]🎙️ SonicScribe[/bold blue]")
+    if batch:
+        console.print(f"📂 Files: [cyan]{len(inputs)}[/cyan] from [cyan]{args.input}[/cyan]")
+    else:
+        console.print(f"📂 File: [cyan]{args.input}[/cyan]")
+    console.print(f"🔁 Translate to English: [cyan]{'Yes' if args.translate else 'No'}[/cyan]")
+    console.print(f"💾 Output directory: [cyan]{args.output_dir}[/cyan]")
+    console.print(f"🤖 Whisper model: [cyan]{args.whisper_model}[/cyan]")
+    if args.backend != "api":
+        console.print(f"🖥️ Transcription backend: [cyan]{args.backend} ({args.compute_type})[/cyan]")
+    
+    if args.translate:
+        console.print(f"🤖 Translation model: [cyan]{args.gpt_model}[/cyan]")
+    
+    if batch and not inputs:
+        console.print(f"[bold red]❌ No media files found in {args.input}[/bold red]")
+        return 1
+    
+    if args.stream and args.remove_silence:
+        console.print("[yellow]⚠️ --remove-silence is not supported with --stream and will be ignored[/yellow]")
+    if args.stream and args.reuse_repeated_audio:
+        console.print("[yellow]⚠️ --reuse-repeated-audio is not supported with --stream and will be ignored[/yellow]")
+    
+    # Prompt user for language selection before any work starts, so every stage can overlap.
+    # Batch runs never prompt: without --language every file is auto-detected.
+    language = args.language
+    if language is None and not (batch or args.non_interactive):
+        language = select_language(console)
+    
+    cache = None
+    memory = None
+    if not args.no_cache and (batch or os.path.exists(args.input)):
+        cache = ArtifactCache(args.cache_dir, args.cache_size)
+    if args.translate and not args.no_cache:
+        memory = TranslationMemory(os.path.join(args.cache_dir, "translations.sqlite3"))
+    fingerprints = None
+    if args.reuse_repeated_audio and not args.no_cache:
+        fingerprints = FingerprintIndex(os.path.join(args.cache_dir, "fingerprints.sqlite3"), args.fingerprint_regions)
+    
+    metrics = RunMetrics()
+    status = "failed"
+    try:
+        if batch:
+            result = process_batch(args, console, inputs, language, cache, memory, metrics, fingerprints)
+        else:
+            result = process_file(args, console, language, cache, memory, metrics, fingerprints)
+        status = "ok" if result == 0 else "failed"
+        return result
+    finally:
+        if memory is not None:
+            memory.close()
+        if fingerprints is not None:
+            fingerprints.close()
+        write_reports(args, metrics, status)
 
 if __name__ == "__main__":
     sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,645 @@
+"""
+Long-running SonicScribe service (`sonicscribe serve`).
+
+One process keeps the imports, the API client and its connection pool warm and runs
+submitted jobs through the same stages as the CLI (extract, transcribe, translate, write)
+with a fixed number of concurrent jobs and a bounded queue. It speaks JSON over HTTP on a
+TCP port or a Unix socket:
+
+    POST   /jobs                  submit {"input": "/path/to/media.mp4", "translate": true, ...}
+    POST   /jobs?filename=a.mp4   submit the request body as the media file (options as query parameters)
+    GET    /jobs                  list jobs
+    GET    /jobs/<id>             job status, result summary and metrics
+    GET    /jobs/<id>/result      an output file (?format=srt|txt|bilingual|vtt|json, default srt)
+    DELETE /jobs/<id>             cancel a queued or running job
+    GET    /health                queue and worker state
+
+A full queue answers 429 with Retry-After before any upload is read, so callers back off instead
+of piling up work.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import asyncio
+import logging
+import shutil
+import argparse
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from urllib.parse import urlsplit, parse_qs
+
+from SonicScribe import __version__
+from SonicScribe.utils.backends import BACKENDS, get_backend
+from SonicScribe.utils.cache import ArtifactCache, DEFAULT_CACHE_DIR
+from SonicScribe.utils.clients import configure_clients, close_async_client
+from SonicScribe.utils.file_manager import OUTPUT_FORMATS, is_media_file
+from SonicScribe.utils.logger import setup_logger
+from SonicScribe.utils.metrics import RunMetrics
+from SonicScribe.utils.rate_limiter import RateLimiter
+from SonicScribe.utils.request_policy import RequestPolicy
+from SonicScribe.utils.translation_memory import TranslationMemory
+from SonicScribe.utils.fingerprints import FingerprintIndex
+
+logger = logging.getLogger("SonicScribe")
+
+# Per-job options a client may set, with the type each is converted to
+JOB_OPTIONS = {
+    "translate": bool,
+    "bilingual": bool,
+    "language": str,
+    "whisper_model": str,
+    "gpt_model": str,
+    "audio_format": str,
+    "chunk_size_mb": int,
+    "remove_silence_gaps": bool,
+    "min_silence_ms": int,
+    "stream": bool,
+    "formats": tuple,
+    "output_dir": str
+}
+
+# Finished jobs kept for status and result requests; older ones are forgotten first
+MAX_FINISHED_JOBS = 1000
+
+# Output directory of jobs when the service defaults do not set one (run_pipeline's default)
+DEFAULT_OUTPUT_DIR = "output/transcripts"
+
+def _inside(path, root):
+    # Whether the real path of path is root or below it (root already resolved)
+    path = os.path.realpath(path)
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+def _convert_option(name, value):
+    # Convert a JSON or query-string value to the type of a JOB_OPTIONS entry
+    kind = JOB_OPTIONS[name]
+    if kind is bool:
+        return value if isinstance(value, bool) else str(value).strip().lower() in ("1", "true", "yes", "on")
+    if kind is tuple:
+        formats = tuple(value) if isinstance(value, (list, tuple)) else tuple(f.strip() for f in str(value).split(",") if f.strip())
+        unknown = [name for name in formats if name not in OUTPUT_FORMATS]
+        if unknown:
+            raise ValueError(f"Unknown output formats: {', '.join(unknown)}")
+        return formats
+    return kind(value)
+
+class Job:
+    # One submitted input and its state: queued, running, done, failed or cancelled
+
+    def __init__(self, input_path, options, upload=False):
+        self.id = uuid.uuid4().hex
+        self.input = input_path
+        self.options = options
+        self.upload = upload
+        self.status = "queued"
+        self.error = None
+        self.result = None
+        self.metrics = RunMetrics()
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.task = None
+
+    def to_dict(self):
+        summary = {
+            "id": self.id,
+            "input": self.input,
+            "status": self.status,
+            "error": self.error,
+            "options": {name: list(value) if isinstance(value, tuple) else value for name, value in self.options.items()},
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished
+        }
+        if self.result is not None:
+            summary["result"] = {
+                "segments": len(self.result["segments"]),
+                "language": self.result["language"],
+                "paths": self.result["paths"]
+            }
+        if self.started is not None:
+            summary["metrics"] = self.metrics.report()
+        return summary
+
+class QueueFull(Exception):
+    # Raised by TranscriptionService.submit when the queue holds queue_size jobs
+    pass
+
+class TranscriptionService:
+    # Runs jobs on a dedicated event loop thread that owns one API client, the shared per-stage
+    # limits, the artifact cache, the translation memory and, with reuse_repeated_audio, the
+    # fingerprint index. At most `jobs` jobs run at once and
+    # at most queue_size wait; submit, status and cancel are safe to call from any thread.
+    #
+    # Clients choose which files are read and where outputs go, so those paths are confined:
+    # a job's output_dir is resolved under the default output directory, and with input_root
+    # only files below it may be submitted by path. Without input_root any file the process can
+    # read may be submitted, which is only safe while the service listens on localhost.
+
+    def __init__(self, defaults, jobs=2, queue_size=16, extract_workers=2, max_workers=8, translation_workers=8,
+                 cache_dir=DEFAULT_CACHE_DIR, cache_size_mb=2048, use_cache=True, resume=True, rate_limiter=None,
+                 reuse_repeated_audio=False, request_policy=None, input_root=None):
+        self.defaults = defaults
+        self.output_root = os.path.realpath(defaults.get("output_dir", DEFAULT_OUTPUT_DIR))
+        self.input_root = os.path.realpath(input_root) if input_root else None
+        self.jobs = max(1, jobs)
+        self.queue_size = max(1, queue_size)
+        self.extract_workers = extract_workers
+        self.max_workers = max_workers
+        self.translation_workers = translation_workers
+        self.cache_dir = cache_dir
+        self.cache_size_mb = cache_size_mb
+        self.use_cache = use_cache
+        self.resume = resume
+        self.reuse_repeated_audio = reuse_repeated_audio
+        self.rate_limiter = rate_limiter or RateLimiter()
+        # Shared by every job, so hedging learns from the latency of all of them
+        self.request_policy = request_policy or RequestPolicy()
+        self.upload_dir = os.path.join(cache_dir, "uploads")
+
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._loop = None
+        self._queue = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run_loop, name="sonicscribe-jobs", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        # Cancel the workers and any running jobs, then close the client
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+            self._thread.join()
+
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._serve())
+        self._loop.close()
+
+    async def _serve(self):
+        from SonicScribe.aio import StageLimits
+
+        # Everything below is created once and shared by every job
+        self._queue = asyncio.Queue()
+        self._stopping = asyncio.Event()
+        self.limits = StageLimits(self.extract_workers, self.max_workers, self.translation_workers)
+        self.cache = ArtifactCache(self.cache_dir, self.cache_size_mb) if self.use_cache else None
+        self.memory = TranslationMemory(os.path.join(self.cache_dir, "translations.sqlite3")) if self.use_cache else None
+        self.fingerprints = None
+        if self.use_cache and self.reuse_repeated_audio:
+            self.fingerprints = FingerprintIndex(os.path.join(self.cache_dir, "fingerprints.sqlite3"))
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.jobs)]
+        self._ready.set()
+        logger.info(f"Service ready: {self.jobs} concurrent job(s), queue of {self.queue_size}")
+        try:
+            await self._stopping.wait()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await close_async_client()
+            if self.memory is not None:
+                self.memory.close()
+            if self.fingerprints is not None:
+                self.fingerprints.close()
+
+    async def _shutdown(self):
+        self._stopping.set()
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            with self._lock:
+                # A job cancelled while queued already left the queue count
+                cancelled = job.status == "cancelled"
+                if not cancelled:
+                    self._queued -= 1
+                    job.status = "running"
+                    job.started = time.time()
+                    self._running += 1
+            if cancelled:
+                self._remove_upload(job)
+                continue
+            # Each job runs as its own task so cancelling it leaves the worker serving
+            job.task = asyncio.create_task(self._run_job(job))
+            try:
+                await asyncio.wait([job.task])
+                job.result = job.task.result()
+                job.status = "done"
+            except asyncio.CancelledError:
+                job.status = "cancelled"
+                if not job.task.done():
+                    # The worker itself is being stopped
+                    job.task.cancel()
+                    raise
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {e}")
+                job.status = "failed"
+                job.error = str(e) or type(e).__name__
+            finally:
+                job.finished = time.time()
+                with self._lock:
+                    self._running -= 1
+                self._remove_upload(job)
+
+    def _remove_upload(self, job):
+        if job.upload:
+            try:
+                os.remove(job.input)
+                os.rmdir(os.path.dirname(job.input))
+            except OSError as e:
+                logger.warning(f"Could not remove uploaded file {job.input}: {e}")
+
+    async def _run_job(self, job):
+        from SonicScribe.aio import run_pipeline
+
+        options = {**self.defaults, **job.options}
+        if "output_dir" not in job.options:
+            # Jobs share the default output directory, so each writes under its own id; two uploads
+            # of meeting.mp4 would otherwise write the same meeting.srt at the same time
+            options["output_dir"] = os.path.join(self.output_root, job.id)
+        return await run_pipeline(
+            job.input,
+            limits=self.limits,
+            max_workers=self.max_workers,
+            translation_workers=self.translation_workers,
+            cache=self.cache,
+            memory=self.memory if options.get("translate") else None,
+            fingerprints=self.fingerprints,
+            rate_limiter=self.rate_limiter,
+            request_policy=self.request_policy,
+            checkpoint_dir=os.path.join(self.cache_dir, "jobs") if self.use_cache and self.resume else None,
+            metrics=job.metrics,
+            **options
+        )
+
+    def check_input(self, input_path):
+        # Raise ValueError for an input path outside input_root
+        if self.input_root is not None and not _inside(input_path, self.input_root):
+            raise ValueError(f"Input must be under {self.input_root}")
+
+    def resolve_output_dir(self, options):
+        # Resolve options["output_dir"] (relative to the default output directory) in place,
+        # raising ValueError if it leaves that directory
+        if "output_dir" in options:
+            output_dir = os.path.realpath(os.path.join(self.output_root, options["output_dir"]))
+            if not _inside(output_dir, self.output_root):
+                raise ValueError(f"output_dir must be under {self.output_root}")
+            options["output_dir"] = output_dir
+
+    def reserve(self):
+        # Hold a queue slot for a job whose request is still being read, so a full queue is
+        # refused before an upload is spooled. Raises QueueFull; pass reserved=True to submit,
+        # or give the slot back with release.
+        with self._lock:
+            if self._queued >= self.queue_size:
+                raise QueueFull(f"Queue is full ({self.queue_size} jobs waiting)")
+            self._queued += 1
+
+    def release(self):
+        # Give back a slot taken with reserve for a request that did not become a job
+        with self._lock:
+            self._queued -= 1
+
+    def submit(self, input_path, options=None, upload=False, reserved=False):
+        # Queue a job and return it. Raises QueueFull when queue_size jobs are already waiting,
+        # unless a slot was taken with reserve.
+        job = Job(input_path, dict(options or {}), upload)
+        if not reserved:
+            self.reserve()
+        with self._lock:
+            self._jobs[job.id] = job
+            self._forget_finished()
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, job)
+        logger.info(f"Queued job {job.id} for {input_path}")
+        return job
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in ("done", "failed", "cancelled")]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        # Cancel a queued or running job; returns False if it already finished or does not exist
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in ("queued", "running"):
+                return False
+            if job.status == "queued":
+                # Frees its queue slot now; the worker skips it when it comes up
+                self._queued -= 1
+                job.status = "cancelled"
+                job.finished = time.time()
+                return True
+        # The worker creates the job's task in the loop thread, so look it up there
+        self._loop.call_soon_threadsafe(lambda: job.task is not None and job.task.cancel())
+        return True
+
+    def health(self):
+        with self._lock:
+            return {
+                "version": __version__,
+                "queued": self._queued,
+                "running": self._running,
+                "jobs": self.jobs,
+                "queue_size": self.queue_size
+            }
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    # JSON API over the TranscriptionService in self.server.service
+    protocol_version = "HTTP/1.1"
+    server_version = f"SonicScribe/{__version__}"
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def address_string(self):
+        # Unix-socket peers have no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) and self.client_address else "unix"
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message, headers=None):
+        self._send_json(status, {"error": message}, headers)
+
+    def _refuse(self, status, message, headers=None):
+        # Answer without reading the rest of the request body, then close the connection, since
+        # the unread body cannot be told apart from a next request
+        self.close_connection = True
+        try:
+            self._send_error(status, message, {**(headers or {}), "Connection": "close"})
+        except ConnectionError:
+            # The client hung up mid-upload; there is no one left to answer
+            pass
+
+    def _route(self):
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        return parts, {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+    def do_GET(self):
+        service = self.server.service
+        parts, query = self._route()
+        if parts == ["health"]:
+            return self._send_json(HTTPStatus.OK, service.health())
+        if parts == ["jobs"]:
+            return self._send_json(HTTPStatus.OK, {"jobs": [job.to_dict() for job in service.list()]})
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = service.get(parts[1])
+            if job is None:
+                return self._send_error(HTTPStatus.NOT_FOUND, f"No job {parts[1]}")
+            if len(parts) == 2:
+                return self._send_json(HTTPStatus.OK, job.to_dict())
+            if parts[2] == "result":
+                return self._send_result(job, query.get("format", "srt"))
+        self._send_error(HTTPStatus.NOT_FOUND, f"Unknown path {self.path}")
+
+    def _send_result(self, job, output_format):
+        if job.status != "done":
+            return self._send_error(HTTPStatus.CONFLICT, f"Job is {job.status}")
+        path = job.result["paths"].get(output_format)
+        if path is None:
+            return self._send_error(HTTPStatus.NOT_FOUND, f"Job has no {output_format} output")
+        content_type = "application/json" if output_format == "json" else (
+            "text/vtt" if output_format == "vtt" else "text/plain")
+        with open(path, "rb") as f:
+            body = f.read()
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        service = self.server.service
+        parts, query = self._route()
+        if parts != ["jobs"]:
+            return self._send_error(HTTPStatus.NOT_FOUND, f"Unknown path {self.path}")
+
+        length = int(self.headers.get("Content-Length", 0))
+        upload = "filename" in query
+        # Take a queue slot before reading the body, so a full queue costs the client nothing to upload
+        try:
+            service.reserve()
+        except QueueFull as e:
+            return self._refuse(HTTPStatus.TOO_MANY_REQUESTS, str(e), {"Retry-After": "5"})
+        job = None
+        try:
+            job = self._submit(service, query, length, upload)
+        finally:
+            if job is None:
+                service.release()
+        if job is not None:
+            self._send_json(HTTPStatus.ACCEPTED, job.to_dict(), {"Location": f"/jobs/{job.id}"})
+
+    def _submit(self, service, query, length, upload):
+        # Read a POST /jobs request and submit its job into the reserved slot. Returns the job,
+        # or None after answering with an error.
+        try:
+            if upload:
+                # The body is the media file itself; options come from the query string
+                try:
+                    input_path = self._save_upload(query.pop("filename"), length)
+                except (ValueError, OSError) as e:
+                    return self._refuse(HTTPStatus.BAD_REQUEST, str(e))
+                request = query
+            else:
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(request, dict):
+                    return self._send_error(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object")
+                input_path = request.pop("input", None)
+                if not input_path:
+                    return self._send_error(HTTPStatus.BAD_REQUEST, "Missing 'input'")
+                if not isinstance(input_path, str):
+                    return self._send_error(HTTPStatus.BAD_REQUEST, "'input' must be a path")
+                service.check_input(input_path)
+                if not os.path.isfile(input_path):
+                    return self._send_error(HTTPStatus.BAD_REQUEST, f"Input file not found: {input_path}")
+            unknown = set(request) - set(JOB_OPTIONS)
+            if unknown:
+                raise ValueError(f"Unknown options: {', '.join(sorted(unknown))}")
+            options = {name: _convert_option(name, value) for name, value in request.items()}
+            service.resolve_output_dir(options)
+        except (ValueError, TypeError) as e:
+            if upload:
+                os.remove(input_path)
+                os.rmdir(os.path.dirname(input_path))
+            return self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+        return service.submit(input_path, options, upload=upload, reserved=True)
+
+    def _save_upload(self, filename, length):
+        # Spool an uploaded body to the service's upload directory
+        filename = os.path.basename(filename)
+        if not is_media_file(filename):
+            raise ValueError(f"Unsupported media file: {filename}")
+        # One directory per upload keeps the original name, which the output files are named after
+        directory = os.path.join(self.server.service.upload_dir, uuid.uuid4().hex)
+        os.makedirs(directory)
+        path = os.path.join(directory, filename)
+        remaining = length
+        try:
+            with open(path, "wb") as f:
+                while remaining > 0:
+                    block = self.rfile.read(min(remaining, 1024 * 1024))
+                    if not block:
+                        break
+                    f.write(block)
+                    remaining -= len(block)
+            if remaining:
+                raise ValueError("Upload ended before Content-Length bytes were received")
+        except BaseException:
+            # A dropped connection or a full disk leaves nothing behind
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        return path
+
+    def do_DELETE(self):
+        parts, _ = self._route()
+        if len(parts) == 2 and parts[0] == "jobs":
+            if self.server.service.cancel(parts[1]):
+                return self._send_json(HTTPStatus.OK, self.server.service.get(parts[1]).to_dict())
+            return self._send_error(HTTPStatus.CONFLICT, f"Job {parts[1]} is not queued or running")
+        self._send_error(HTTPStatus.NOT_FOUND, f"Unknown path {self.path}")
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    # HTTP server on a Unix socket, for callers on the same host
+    daemon_threads = True
+
+def make_server(service, host="127.0.0.1", port=8765, socket_path=None):
+    # HTTP server for the service on a TCP port, or on a Unix socket if socket_path is given
+    if socket_path:
+        if os.path.exists(socket_path):
+            # A stale socket from an earlier run; refuse to replace anything that is in use
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(socket_path)
+                raise RuntimeError(f"Another service is already listening on {socket_path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.remove(socket_path)
+            finally:
+                probe.close()
+        server = UnixHTTPServer(socket_path, ServiceRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), ServiceRequestHandler)
+        server.daemon_threads = True
+    server.service = service
+    return server
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="sonicscribe serve", description="🎙️ SonicScribe - run as a local transcription service")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port to listen on")
+    parser.add_argument("--socket", help="Listen on this Unix socket instead of a TCP port")
+    parser.add_argument("--jobs", type=int, default=2, help="Number of jobs processed at the same time")
+    parser.add_argument("--queue-size", type=int, default=16, help="Jobs allowed to wait before submissions are refused with 429")
+    parser.add_argument("--workers", type=int, default=8, help="Chunks transcribed concurrently, shared by all jobs")
+    parser.add_argument("--translation-workers", type=int, default=8, help="Translation batches sent concurrently, shared by all jobs")
+    parser.add_argument("--extract-workers", type=int, default=2, help="Audio extractions run at the same time")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Directory for output files; each job writes to a subdirectory named after its id, or to its output_dir below this directory")
+    parser.add_argument("--input-root", help="Only accept jobs for files below this directory (uploads are always accepted); "
+                                             "without it any file the service can read may be submitted by path")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="api", help="Transcribe with the Whisper API, or locally on the CPU with faster-whisper")
+    parser.add_argument("--compute-type", default="int8", help="Quantization of the local model with --backend local")
+    parser.add_argument("--cpu-threads", type=int, help="Threads per local transcription worker (default: all cores split between --workers)")
+    parser.add_argument("--formats", default="txt,srt", help="Default output formats")
+    parser.add_argument("--translate", action="store_true", help="Translate to English unless a job says otherwise")
+    parser.add_argument("--rpm", type=int, default=500, help="Maximum translation requests per minute")
+    parser.add_argument("--tpm", type=int, default=200000, help="Maximum translation tokens per minute")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the artifact cache, translation memory or job checkpoints")
+    parser.add_argument("--no-resume", action="store_true", help="Do not checkpoint jobs for resuming")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory for caches, checkpoints and uploaded files")
+    parser.add_argument("--cache-size", type=int, default=2048, help="Maximum cache size in MB")
+    parser.add_argument("--reuse-repeated-audio", action="store_true", help="Reuse the segments of audio heard in earlier jobs (intros, jingles, ads)")
+    parser.add_argument("--base-url", help="OpenAI-compatible API base URL")
+    parser.add_argument("--max-connections", type=int, help="Maximum open HTTP connections shared by all API requests")
+    parser.add_argument("--connect-timeout", type=float, help="Seconds to wait for an API connection")
+    parser.add_argument("--max-attempts", type=int, default=3, help="Attempts per Whisper request, counting the first (default: 3); only timeouts, rate limits, server errors and dropped connections are retried")
+    parser.add_argument("--request-deadline", type=float, help="Seconds one Whisper attempt may take (default: 60 plus 20 per MB uploaded)")
+    parser.add_argument("--hedge-percentile", type=float, help="Duplicate Whisper requests slower than this percentile of recent requests")
+    parser.add_argument("--read-timeout", type=float, help="Seconds to wait while uploading to or reading from the API")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Enable verbose logging")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_logger(logging.DEBUG if args.verbose else logging.INFO)
+    configure_clients(
+        base_url=args.base_url,
+        max_connections=args.max_connections,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        write_timeout=args.read_timeout
+    )
+
+    defaults = {
+        "output_dir": args.output_dir,
+        "translate": args.translate,
+        "formats": _convert_option("formats", args.formats)
+    }
+    if args.backend != "api":
+        # One local model for the whole service, serving --workers chunks in parallel across jobs
+        defaults["backend"] = get_backend(args.backend, compute_type=args.compute_type, workers=args.workers,
+                                          cpu_threads=args.cpu_threads)
+    service = TranscriptionService(
+        defaults,
+        jobs=args.jobs,
+        queue_size=args.queue_size,
+        extract_workers=args.extract_workers,
+        max_workers=args.workers,
+        translation_workers=args.translation_workers,
+        cache_dir=args.cache_dir,
+        cache_size_mb=args.cache_size,
+        use_cache=not args.no_cache,
+        resume=not args.no_resume,
+        rate_limiter=RateLimiter(args.rpm, args.tpm),
+        reuse_repeated_audio=args.reuse_repeated_audio,
+        request_policy=RequestPolicy(args.max_attempts, args.request_deadline, hedge_percentile=args.hedge_percentile),
+        input_root=args.input_root
+    ).start()
+    if not args.socket and not args.input_root and args.host not in ("127.0.0.1", "localhost", "::1"):
+        logger.warning(f"Listening on {args.host} without --input-root: any client can have any readable file transcribed")
+    server = make_server(service, args.host, args.port, args.socket)
+    logger.info(f"Listening on {args.socket or f'http://{args.host}:{args.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
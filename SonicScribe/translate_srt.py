@@ -1,16 +1,13 @@
 import os
-from openai import OpenAI
-from dotenv import load_dotenv
-import re
 import argparse
 from rich.progress import Progress, TextColumn, SpinnerColumn, TimeElapsedColumn
 from rich.console import Console
-from SonicScribe.utils.language_detector import detect_language
-from SonicScribe.utils.file_manager import save_transcript, save_srt_from_segments
-
-# Load environment variables
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from SonicScribe.utils.language_detector import detect_language_async
+from SonicScribe.utils.file_manager import load_srt, write_srt
+from SonicScribe.utils.translator import translate_segments_async
+from SonicScribe.utils.translation_memory import TranslationMemory, DEFAULT_MEMORY_PATH
+from SonicScribe.utils.rate_limiter import RateLimiter
+from SonicScribe.utils.clients import configure_clients, run_sync
 
 def parse_args():
     parser = argparse.ArgumentParser(description="🌐 SRT Translator - Convert subtitles to English")
@@ -19,8 +16,40 @@ def parse_args():
     parser.add_argument("--model", default="gpt-4o-mini", help="GPT model to use for translation")
     parser.add_argument("--bilingual", action="store_true", help="Create bilingual SRT with original and translated text")
     parser.add_argument("--language", default=None, help="Language of the input subtitles (e.g., 'en', 'fr', 'es'). If not specified, it will be auto-detected.")
+    parser.add_argument("--batch-size", type=int, default=50, help="Maximum number of subtitles sent to GPT per request")
+    parser.add_argument("--batch-tokens", type=int, default=None, help="Estimated prompt tokens per request (default depends on the model)")
+    parser.add_argument("--workers", type=int, default=4, help="Number of translation batches to send concurrently")
+    parser.add_argument("--rpm", type=int, default=500, help="Maximum translation requests per minute")
+    parser.add_argument("--tpm", type=int, default=200000, help="Maximum translation tokens per minute")
+    parser.add_argument("--base-url", help="OpenAI-compatible API base URL, e.g. a gateway or local mock (default: OPENAI_BASE_URL or the OpenAI API)")
+    parser.add_argument("--max-connections", type=int, help="Maximum open HTTP connections shared by all API requests (default: 100)")
+    parser.add_argument("--connect-timeout", type=float, help="Seconds to wait for an API connection (default: 10)")
+    parser.add_argument("--read-timeout", type=float, help="Seconds to wait while uploading to or reading from the API (default: 600)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the persistent translation memory")
+    parser.add_argument("--memory-path", default=DEFAULT_MEMORY_PATH, help="Path of the translation memory database")
     return parser.parse_args()
 
+async def translate_subtitles(args, subtitles, memory, console):
+    # Detect the language (unless given) and translate in one event loop, so both stages
+    # share one API client and its connections
+    language = args.language
+    if not language:
+        console.print("[bold yellow]🌐 Detecting language of the subtitles...[/bold yellow]")
+        language = await detect_language_async(" ".join(subtitle["text"] for subtitle in subtitles))
+        console.print(f"[bold green]🌐 Detected language: {language}[/bold green]")
+    
+    translated = await translate_segments_async(
+        subtitles,
+        batch_size=args.batch_size,
+        batch_tokens=args.batch_tokens,
+        model=args.model,
+        source_language=language,
+        memory=memory,
+        max_workers=args.workers,
+        rate_limiter=RateLimiter(args.rpm, args.tpm)
+    )
+    return language, translated
+
 def main():
     args = parse_args()
     
@@ -29,6 +58,15 @@ def main():
         base, ext = os.path.splitext(args.input)
         args.output = f"{base}_english{ext}"
     
+    # All API requests share one connection pool configured from the command line
+    configure_clients(
+        base_url=args.base_url,
+        max_connections=args.max_connections,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        write_timeout=args.read_timeout
+    )
+    
     # Create console for rich output
     console = Console()
     console.print(f"[bold blue]🌐 SRT Translator[/bold blue]")
@@ -42,95 +80,48 @@ def main():
         console.print(f"[bold red]❌ Input file not found: {args.input}[/bold red]")
         return 1
         
-    # Read the SRT content
+    # Read and parse the SRT content
     try:
-        with open(args.input, 'r', encoding='utf-8') as f:
-            content = f.read()
+        subtitles = load_srt(args.input)
     except Exception as e:
         console.print(f"[bold red]❌ Error reading SRT file: {e}[/bold red]")
         return 1
-
-    # Split into subtitle blocks (each entry in the SRT file)
-    subtitle_blocks = re.split(r'\n\s*\n', content)
-    total_blocks = len(subtitle_blocks)
     
-    console.print(f"Found [bold cyan]{total_blocks}[/bold cyan] subtitle blocks")
+    # Only cues with text are sent for translation; the rest are written back unchanged
+    to_translate = [i for i, subtitle in enumerate(subtitles) if subtitle["text"].strip()]
     
-    # Detect language if not specified
-    detected_language = args.language
-    if not detected_language:
-        console.print("[bold yellow]🌐 Detecting language of the subtitles...[/bold yellow]")
-        all_text = " ".join([block.split("\n", 2)[-1] for block in subtitle_blocks if block.strip()])
-        detected_language = detect_language(all_text)
-        console.print(f"[bold green]🌐 Detected language: {detected_language}[/bold green]")
+    console.print(f"Found [bold cyan]{len(subtitles)}[/bold cyan] subtitle blocks")
     
-    # Process each block with progress indicator
-    translated_blocks = []
+    # Previously translated lines are reused from the translation memory
+    memory = None if args.no_cache else TranslationMemory(args.memory_path)
     
     with Progress(
         SpinnerColumn(),
         TextColumn("[bold blue]{task.description}[/bold blue]"),
         TimeElapsedColumn(),
     ) as progress:
-        task = progress.add_task("Translating subtitles...", total=total_blocks)
-        
-        for i, block in enumerate(subtitle_blocks):
-            if not block.strip():
-                translated_blocks.append(block)
-                progress.update(task, advance=1)
-                continue
-            
-            # Split the block into lines
-            lines = block.strip().split('\n')
-            
-            # Need at least 3 lines for a proper subtitle block (number, timestamp, text)
-            if len(lines) < 3:
-                translated_blocks.append(block)
-                progress.update(task, advance=1)
-                continue
-            
-            # Extract parts
-            index = lines[0]
-            timestamp = lines[1]
-            text = '\n'.join(lines[2:])
-            
-            # Skip empty text or caption info like "Subtitles by..."
-            if not text.strip() or "SDI Media" in text:
-                translated_blocks.append(block)
-                progress.update(task, advance=1)
-                continue
-            
-            # Translate the text
-            try:
-                response = client.chat.completions.create(
-                    model=args.model,
-                    messages=[
-                        {"role": "system", "content": f"You are a translation assistant. Translate {detected_language} to English."},
-                        {"role": "user", "content": f"Translate this text to English: {text}"}
-                    ]
-                )
-                
-                translated_text = response.choices[0].message.content.strip()
-                
-                # Rebuild the subtitle block with translated text
-                if args.bilingual:
-                    translated_block = f"{index}\n{timestamp}\n{text}\n{translated_text}"
-                else:
-                    translated_block = f"{index}\n{timestamp}\n{translated_text}"
-                
-                translated_blocks.append(translated_block)
-                
-            except Exception as e:
-                console.print(f"[bold yellow]⚠️ Error translating block {i+1}: {e}[/bold yellow]")
-                translated_blocks.append(block)  # Keep original if translation fails
-                
-            progress.update(task, advance=1)
+        task = progress.add_task("Translating subtitles...", total=None)
+        detected_language, translated = run_sync(translate_subtitles(args, [subtitles[i] for i in to_translate], memory, progress.console))
+        progress.update(task, completed=True)
+    
+    # Put translations back in place, keeping the original cue numbers and timestamps
+    # (segments come back without original_text when nothing was translated, e.g. without an API key)
+    untranslated = 0
+    for i, segment in zip(to_translate, translated):
+        original_text = segment.get("original_text", subtitles[i]["text"])
+        subtitles[i] = {**subtitles[i], "text": segment["text"], "original_text": original_text}
+        untranslated += segment["text"] == original_text
+    
+    if untranslated:
+        console.print(f"[bold yellow]⚠️ {untranslated} subtitle blocks were kept in the original language[/bold yellow]")
 
     # Write the translated SRT
     try:
-        with open(args.output, 'w', encoding='utf-8') as f:
-            f.write('\n\n'.join(translated_blocks))
+        write_srt(subtitles, args.output, bilingual=args.bilingual)
         console.print(f"[bold green]✅ Translation completed successfully![/bold green]")
+        if memory:
+            stats = memory.stats()
+            console.print(f"🧠 Translation memory: [cyan]{stats['hits']}[/cyan] hits, [cyan]{stats['misses']}[/cyan] misses")
         console.print(f"Translated SRT saved to: [cyan]{args.output}[/cyan]")
     except Exception as e:
         console.print(f"[bold red]❌ Error saving translated SRT: {e}[/bold red]")
@@ -140,4 +131,4 @@ def main():
 
 if __name__ == "__main__":
     import sys
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(main())
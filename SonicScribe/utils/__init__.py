@@ -3,17 +3,59 @@ Utility modules for SonicScribe.
 
 This package contains helper functions and modules for:
 - Audio extraction
+- Silence removal before upload
 - Transcription using Whisper API
 - Translation using GPT models
 - File management for transcripts and subtitles
 - Logging setup
+- Caching of extracted audio and transcriptions
+- Persistent translation memory
+- Audio fingerprints for reusing the transcription of repeated audio
+- Rate limiting of API requests
 - Language detection
+- Shared API clients and sync/async bridging
+- Per-stage run metrics
 """
 
-# Import key utilities for easier access
-from .audio_extractor import extract_audio
-from .whisper_api import transcribe_audio, transcribe_large_audio
-from .translator import translate_segments_to_english
-from .file_manager import save_transcript, save_srt_from_segments, save_bilingual_srt
-from .logger import setup_logger
-from .language_detector import detect_language
\ No newline at end of file
+import importlib
+
+# Key utilities for easier access, imported on first use so that importing the package
+# (or running `sonicscribe --version`) does not load openai, pydub or moviepy
+_LAZY_ATTRIBUTES = {
+    "extract_audio": ".audio_extractor",
+    "stream_audio_chunks": ".audio_extractor",
+    "remove_silence": ".silence_remover",
+    "remap_segments": ".silence_remover",
+    "transcribe_audio": ".whisper_api",
+    "transcribe_large_audio": ".whisper_api",
+    "transcribe_audio_stream": ".whisper_api",
+    "translate_segments_to_english": ".translator",
+    "save_transcript": ".file_manager",
+    "save_srt_from_segments": ".file_manager",
+    "save_bilingual_srt": ".file_manager",
+    "load_srt": ".file_manager",
+    "write_srt": ".file_manager",
+    "setup_logger": ".logger",
+    "ArtifactCache": ".cache",
+    "TranslationMemory": ".translation_memory",
+    "FingerprintIndex": ".fingerprints",
+    "RateLimiter": ".rate_limiter",
+    "RequestPolicy": ".request_policy",
+    "detect_language": ".language_detector",
+    "configure_clients": ".clients",
+    "RunMetrics": ".metrics",
+    "SegmentStore": ".segments"
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,38 +1,219 @@
 import os
-from moviepy import VideoFileClip, AudioFileClip
+import shutil
+import struct
+import subprocess
+from functools import lru_cache
 import logging
 
 logger = logging.getLogger("SonicScribe")
 
-def extract_audio(input_path, output_dir="output/extracted_audio"):
-    # Extract audio from video/audio files with proper resource management
-    
-    base_name = os.path.splitext(os.path.basename(input_path))[0]
-    output_path = os.path.join(output_dir, f"{base_name}.wav")
+# Output encodings for extracted audio. Whisper resamples everything to 16 kHz mono,
+# so the speech presets drop nothing the model uses and fit far more audio per upload.
+AUDIO_FORMATS = {
+    # Full-rate PCM WAV at the source sample rate and channel count
+    "wav": {"extension": "wav", "codec": "pcm_s16le", "sample_rate": None, "channels": None, "bitrate": None},
+    # Mono 16 kHz PCM WAV (~1.9 MB per minute)
+    "wav16k": {"extension": "wav", "codec": "pcm_s16le", "sample_rate": 16000, "channels": 1, "bitrate": None},
+    # Mono 16 kHz lossless FLAC (~0.5-1 MB per minute)
+    "flac": {"extension": "flac", "codec": "flac", "sample_rate": 16000, "channels": 1, "bitrate": None},
+    # Mono 16 kHz MP3 at a speech bitrate (~0.35 MB per minute)
+    "mp3": {"extension": "mp3", "codec": "libmp3lame", "sample_rate": 16000, "channels": 1, "bitrate": "48k"},
+    # Mono 16 kHz Opus in Ogg at a speech bitrate (~0.25 MB per minute)
+    "opus": {"extension": "ogg", "codec": "libopus", "sample_rate": 16000, "channels": 1, "bitrate": "32k"},
+}
 
-    os.makedirs(output_dir, exist_ok=True)
+@lru_cache(maxsize=None)
+def get_ffmpeg_binary():
+    # Prefer ffmpeg from PATH, falling back to the binary bundled with moviepy
+    from moviepy.config import FFMPEG_BINARY
+    return shutil.which("ffmpeg") or FFMPEG_BINARY
+
+def get_audio_format(audio_path):
+    # Look up the encoding settings for an audio file from its extension
+    extension = os.path.splitext(audio_path)[1].lstrip(".").lower()
+    for settings in AUDIO_FORMATS.values():
+        if settings["extension"] == extension:
+            return settings
+    return {"extension": extension, "codec": None, "sample_rate": None, "channels": None, "bitrate": None}
+
+def load_audio(audio_path):
+    # Load an audio file into a pydub AudioSegment. WAV is read natively; compressed
+    # formats are decoded with ffmpeg directly, as pydub would also need ffprobe.
+    from pydub import AudioSegment
+
+    settings = get_audio_format(audio_path)
+    if settings["extension"] == "wav":
+        return AudioSegment.from_wav(audio_path)
+
+    sample_rate = settings["sample_rate"] or 16000
+    channels = settings["channels"] or 1
+    command = [get_ffmpeg_binary(), "-nostdin", "-loglevel", "error", "-i", audio_path,
+               "-f", "s16le", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-ac", str(channels), "-"]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to decode {audio_path}: {result.stderr.decode(errors='ignore').strip()}")
+    return AudioSegment(data=result.stdout, sample_width=2, frame_rate=sample_rate, channels=channels)
+
+def decode_audio_file(audio_path, output_path):
+    # Decode an audio file with ffmpeg into raw 16-bit PCM at output_path, at the rate and channel
+    # count load_audio would use, without holding the audio in memory. Returns the PCM layout.
+    settings = get_audio_format(audio_path)
+    sample_rate = settings["sample_rate"] or 16000
+    channels = settings["channels"] or 1
+    command = [get_ffmpeg_binary(), "-nostdin", "-loglevel", "error", "-i", audio_path,
+               "-f", "s16le", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-ac", str(channels), "-y", output_path]
+    result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=False)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to decode {audio_path}: {result.stderr.decode(errors='ignore').strip()}")
+    return {"sample_rate": sample_rate, "channels": channels, "sample_width": 2, "block_align": 2 * channels}
+
+def export_audio(audio, output_path):
+    # Write a pydub AudioSegment using the same encoding settings as extract_audio
+    from pydub import AudioSegment
+
+    settings = get_audio_format(output_path)
+    AudioSegment.converter = get_ffmpeg_binary()
+    audio.export(output_path, format=settings["extension"], codec=settings["codec"], bitrate=settings["bitrate"])
+    return output_path
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".webm", ".avi", ".flv")
+AUDIO_EXTENSIONS = (".mp3", ".aac", ".m4a", ".flac", ".ogg", ".wav")
+
+def make_wav_header(data_size, sample_rate=16000, channels=1, sample_width=2):
+    # Build a 44-byte PCM WAV header for data_size bytes of raw audio
+    byte_rate = sample_rate * channels * sample_width
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, byte_rate, channels * sample_width, sample_width * 8,
+        b"data", data_size
+    )
+
+def read_wav_info(audio_path):
+    # Parse a RIFF/WAVE header without loading the audio. Returns the PCM layout and the
+    # byte range of the data chunk, or None if the file is not 16/24/32-bit integer PCM.
+    with open(audio_path, "rb") as f:
+        riff, _, wave_id = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave_id != b"WAVE":
+            return None
+
+        info = None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                return None
+            chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+            if chunk_id == b"fmt ":
+                fmt = f.read(chunk_size)
+                format_tag, channels, sample_rate, _, block_align, bits = struct.unpack("<HHIIHH", fmt[:16])
+                # 0xFFFE is WAVE_FORMAT_EXTENSIBLE, which ffmpeg uses for PCM with more than two channels
+                if format_tag not in (1, 0xFFFE):
+                    return None
+                info = {"channels": channels, "sample_rate": sample_rate,
+                        "sample_width": bits // 8, "block_align": block_align}
+            elif chunk_id == b"data":
+                if info is None:
+                    return None
+                info["data_offset"] = f.tell()
+                # Streamed WAVs may leave the size unset; the data then runs to the end of the file
+                file_size = os.fstat(f.fileno()).st_size
+                info["data_size"] = min(chunk_size, file_size - info["data_offset"])
+                return info
+            else:
+                f.seek(chunk_size, os.SEEK_CUR)
+            # Chunks are padded to an even number of bytes
+            if chunk_size % 2:
+                f.seek(1, os.SEEK_CUR)
+
+def _ffmpeg_audio_command(input_path, settings):
+    # ffmpeg arguments that demux and decode only the first audio stream; video,
+    # subtitle and data streams are never decoded
+    command = [get_ffmpeg_binary(), "-nostdin", "-loglevel", "error", "-i", input_path,
+               "-map", "0:a:0", "-vn", "-sn", "-dn"]
+    if settings["channels"]:
+        command += ["-ac", str(settings["channels"])]
+    if settings["sample_rate"]:
+        command += ["-ar", str(settings["sample_rate"])]
+    command += ["-c:a", settings["codec"]]
+    if settings["codec"] == "flac":
+        # Decoders often output float samples, which FLAC would otherwise store as 24-bit
+        command += ["-sample_fmt", "s16"]
+    if settings["bitrate"]:
+        command += ["-b:a", settings["bitrate"]]
+    return command
+
+def _extract_with_ffmpeg(input_path, output_path, settings):
+    # Extract the audio track with a single ffmpeg process
+    command = _ffmpeg_audio_command(input_path, settings) + ["-y", output_path]
+    result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=False)
+    if result.returncode != 0:
+        message = result.stderr.decode(errors="ignore").strip()
+        if "matches no streams" in message:
+            raise ValueError("No audio track found in input file")
+        raise RuntimeError(f"ffmpeg failed: {message}")
+
+def _extract_with_moviepy(input_path, output_path, settings):
+    # Extract the audio track through moviepy clips (decodes the video as well)
+    from moviepy import VideoFileClip, AudioFileClip
+
+    # Encoding options passed through to moviepy's ffmpeg writer
+    write_options = {
+        "fps": settings["sample_rate"],
+        "codec": settings["codec"],
+        "bitrate": settings["bitrate"],
+        "ffmpeg_params": ["-ac", str(settings["channels"])] if settings["channels"] else None,
+        "logger": None,
+    }
 
-    logger.info(f"Extracting audio from: {input_path}")
     clip = None
-    
     try:
-        if not os.path.exists(input_path):
-            raise FileNotFoundError(f"Input file not found: {input_path}")
-            
-        if input_path.lower().endswith((".mp4", ".mkv", ".mov", ".webm", ".avi", ".flv")):
+        if input_path.lower().endswith(VIDEO_EXTENSIONS):
             clip = VideoFileClip(input_path)
             if clip.audio is None:
                 raise ValueError("No audio track found in video file")
-            clip.audio.write_audiofile(output_path, codec="pcm_s16le", logger=None)
-        elif input_path.lower().endswith((".mp3", ".aac", ".m4a", ".flac", ".ogg", ".wav")):
-            clip = AudioFileClip(input_path)
-            clip.write_audiofile(output_path, codec="pcm_s16le", logger=None)
+            clip.audio.write_audiofile(output_path, **write_options)
         else:
+            clip = AudioFileClip(input_path)
+            clip.write_audiofile(output_path, **write_options)
+    finally:
+        # Make sure to close the clip to release resources
+        if clip is not None:
+            try:
+                clip.close()
+                logger.debug("Clip resources released")
+            except Exception as e:
+                logger.error(f"Error closing clip: {e}")
+
+def extract_audio(input_path, output_dir="output/extracted_audio", audio_format="wav", engine="ffmpeg"):
+    # Extract audio from video/audio files. The ffmpeg engine demuxes only the audio
+    # stream; the moviepy engine is kept as a fallback.
+    if audio_format not in AUDIO_FORMATS:
+        logger.error(f"Unsupported audio format: {audio_format} (choose from {', '.join(AUDIO_FORMATS)})")
+        return None
+    settings = AUDIO_FORMATS[audio_format]
+
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
+    output_path = os.path.join(output_dir, f"{base_name}.{settings['extension']}")
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    logger.info(f"Extracting audio from: {input_path} ({audio_format}, {engine})")
+
+    try:
+        if not os.path.exists(input_path):
+            raise FileNotFoundError(f"Input file not found: {input_path}")
+
+        if not input_path.lower().endswith(VIDEO_EXTENSIONS + AUDIO_EXTENSIONS):
             raise ValueError(f"Unsupported file format: {os.path.splitext(input_path)[1]}")
-    
-        logger.info(f"Audio saved to: {output_path}")
+
+        if engine == "moviepy":
+            _extract_with_moviepy(input_path, output_path, settings)
+        else:
+            _extract_with_ffmpeg(input_path, output_path, settings)
+
+        logger.info(f"Audio saved to: {output_path} ({os.path.getsize(output_path) / (1024 * 1024):.2f} MB)")
         return output_path
-    
+
     except FileNotFoundError as e:
         logger.error(f"File not found: {e}")
         return None
@@ -42,12 +223,40 @@ def extract_audio(input_path, output_dir="output/extracted_audio"):
     except Exception as e:
         logger.error(f"Error extracting audio: {e}")
         return None
-    
+
+def stream_audio_chunks(input_path, chunk_seconds=600, sample_rate=16000):
+    # Decode the audio stream through an ffmpeg pipe and yield ((filename, wav_bytes), offset_seconds)
+    # chunks as soon as each one is complete, so uploads can start before decoding finishes
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Input file not found: {input_path}")
+
+    settings = {"channels": 1, "sample_rate": sample_rate, "codec": "pcm_s16le", "bitrate": None}
+    command = _ffmpeg_audio_command(input_path, settings) + ["-f", "s16le", "pipe:1"]
+    chunk_bytes = int(chunk_seconds * sample_rate) * 2
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
+
+    logger.info(f"Streaming audio from: {input_path} in {chunk_seconds:.0f} second chunks")
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        index = 0
+        while True:
+            data = process.stdout.read(chunk_bytes)
+            if not data:
+                break
+            offset = index * chunk_bytes / (2 * sample_rate)
+            index += 1
+            logger.debug(f"Decoded chunk {index} ({len(data) / (2 * sample_rate):.1f} seconds)")
+            yield (f"{base_name}_{index}.wav", make_wav_header(len(data), sample_rate) + data), offset
+
+        if process.wait() != 0:
+            message = process.stderr.read().decode(errors="ignore").strip()
+            if "matches no streams" in message:
+                raise ValueError("No audio track found in input file")
+            raise RuntimeError(f"ffmpeg failed: {message}")
     finally:
-        # Make sure to close the clip to release resources
-        if clip is not None:
-            try:
-                clip.close()
-                logger.debug("Clip resources released")
-            except Exception as e:
-                logger.error(f"Error closing clip: {e}")
\ No newline at end of file
+        # Stop ffmpeg if the consumer gave up early
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
@@ -0,0 +1,139 @@
+import io
+import os
+import types
+import asyncio
+import logging
+import threading
+from contextlib import nullcontext
+
+from SonicScribe.utils.clients import get_async_client, request_options, to_thread
+
+logger = logging.getLogger("SonicScribe")
+
+# Largest file the Whisper API accepts in a single request
+WHISPER_MAX_FILE_SIZE = 25 * 1024 * 1024
+
+# API model names that mean "the backend's own model" to a local backend
+API_MODEL_NAMES = ("whisper-1",)
+
+class TranscriptionBackend:
+    # Engine that turns one audio upload, a file path or an in-memory (filename, bytes) tuple,
+    # into a response shaped like the API's verbose_json: an object with segments (each with
+    # start, end and text), language and duration. whisper_api chunks, schedules, retries and
+    # shifts timestamps around it, so file_manager and translator see the same segments whatever
+    # the engine. max_file_size is the largest upload sent as one request (None means one chunk
+    # of chunk_size_mb), remote says whether requests leave the machine, and stage names the
+    # RunMetrics stage each request is timed as.
+    name = None
+    max_file_size = None
+    remote = False
+    stage = "transcription"
+
+    async def transcribe(self, audio, model, request_timeout=None):
+        raise NotImplementedError
+
+    def cache_key(self, model):
+        # Part of the cache and checkpoint keys that identifies this engine and model
+        return f"{self.name}:{model}"
+
+class OpenAIBackend(TranscriptionBackend):
+    # The Whisper API, through the shared AsyncOpenAI client (or the client passed in)
+    name = "api"
+    max_file_size = WHISPER_MAX_FILE_SIZE
+    remote = True
+    stage = "whisper_request"
+
+    def __init__(self, client=None):
+        self.client = client
+
+    async def transcribe(self, audio, model, request_timeout=None):
+        # The SDK's own retries are turned off so RequestPolicy alone decides what is retried, when,
+        # and within which deadline
+        client = (self.client or get_async_client()).with_options(max_retries=0)
+        with _open_upload(audio) as audio_file:
+            return await client.audio.transcriptions.create(
+                model=model,
+                file=audio_file,
+                response_format="verbose_json",
+                **request_options(request_timeout)
+            )
+
+    def cache_key(self, model):
+        # Kept as the bare model name so caches written before backends existed stay valid
+        return model
+
+class LocalWhisperBackend(TranscriptionBackend):
+    # Whisper running on this machine's CPU with faster-whisper (CTranslate2), int8-quantized by
+    # default. The model is loaded once per process and serves `workers` chunks in parallel with
+    # cpu_threads threads each, which by default split all cores between the workers, so the
+    # chunks whisper_api schedules concurrently keep every core busy. Needs the optional
+    # faster-whisper package (pip install sonicscribe[local]).
+    name = "local"
+    stage = "local_transcription"
+
+    def __init__(self, model="small", compute_type="int8", workers=4, cpu_threads=None, beam_size=5, vad_filter=False):
+        self.model = model
+        self.compute_type = compute_type
+        self.workers = max(1, workers)
+        self.cpu_threads = cpu_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.beam_size = beam_size
+        self.vad_filter = vad_filter
+
+    def model_name(self, model):
+        # API model names fall back to this backend's model
+        return self.model if not model or model in API_MODEL_NAMES else model
+
+    async def transcribe(self, audio, model, request_timeout=None):
+        # Decoding is CPU-bound and releases the GIL inside CTranslate2, so it runs in a worker thread
+        return await asyncio.wait_for(to_thread(self._transcribe, audio, self.model_name(model)), request_timeout)
+
+    def _transcribe(self, audio, model):
+        whisper = _load_local_model(model, self.compute_type, self.cpu_threads, self.workers)
+        source = audio if isinstance(audio, (str, os.PathLike)) else io.BytesIO(audio[1])
+        segments, info = whisper.transcribe(source, beam_size=self.beam_size, vad_filter=self.vad_filter)
+        # segments is a lazy generator; decoding happens while it is consumed
+        segments = [types.SimpleNamespace(start=segment.start, end=segment.end, text=segment.text) for segment in segments]
+        return types.SimpleNamespace(segments=segments, language=info.language, duration=info.duration)
+
+    def cache_key(self, model):
+        return f"{self.name}:{self.model_name(model)}:{self.compute_type}"
+
+# Loaded local models, shared by every backend instance with the same settings
+_LOCAL_MODELS = {}
+_LOCAL_MODELS_LOCK = threading.Lock()
+
+def _load_local_model(model, compute_type, cpu_threads, workers):
+    key = (model, compute_type, cpu_threads, workers)
+    with _LOCAL_MODELS_LOCK:
+        if key not in _LOCAL_MODELS:
+            try:
+                from faster_whisper import WhisperModel
+            except ImportError:
+                raise ImportError("The local backend needs faster-whisper: pip install sonicscribe[local]") from None
+            logger.info(f"Loading local Whisper model {model} ({compute_type}, {workers} worker(s) x {cpu_threads} thread(s))")
+            _LOCAL_MODELS[key] = WhisperModel(model, device="cpu", compute_type=compute_type,
+                                              cpu_threads=cpu_threads, num_workers=workers)
+        return _LOCAL_MODELS[key]
+
+def _open_upload(audio):
+    # Accept either a file path or an in-memory (filename, bytes) upload
+    if isinstance(audio, (str, os.PathLike)):
+        return open(audio, "rb")
+    return nullcontext(audio)
+
+# Backends selectable by name, e.g. from the command line
+BACKENDS = {
+    "api": OpenAIBackend,
+    "local": LocalWhisperBackend
+}
+
+def get_backend(backend=None, client=None, **settings):
+    # Resolve a backend instance, a name from BACKENDS (built with settings) or None (the API)
+    if isinstance(backend, TranscriptionBackend):
+        return backend
+    name = backend or "api"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend {name!r}; choose from {', '.join(BACKENDS)}")
+    if name == "api":
+        return OpenAIBackend(client)
+    return BACKENDS[name](**settings)
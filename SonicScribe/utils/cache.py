@@ -0,0 +1,143 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+
+logger = logging.getLogger("SonicScribe")
+
+# Shared on-disk location for cached artifacts
+DEFAULT_CACHE_DIR = os.getenv("SONICSCRIBE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "sonicscribe"))
+
+def hash_file(path, block_size=1024 * 1024):
+    # SHA-256 of a file's content, read in blocks so large media files are not loaded into memory
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ArtifactCache:
+    # Content-addressed cache for extracted audio and transcription results. Entries are
+    # keyed by a hash of the input content plus the parameters that produced them, and the
+    # least recently used entries are evicted once the cache grows past max_size_mb. The size
+    # is measured once and then kept as a running total, so the cache directory is only walked
+    # again when the total says there is something to evict.
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size_mb=2048):
+        self.cache_dir = os.path.join(cache_dir, "artifacts")
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.size = sum(size for _, size, _ in self._entries())
+
+    @staticmethod
+    def make_key(*parts):
+        # Combine a content hash and parameters into a single cache key
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _path(self, key, extension):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{extension}")
+
+    def _hit(self, path):
+        # Refresh the modification time, which doubles as the LRU timestamp
+        if not os.path.exists(path):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def get_file(self, key, extension):
+        # Path of a cached file, or None on a miss
+        path = self._hit(self._path(key, extension))
+        logger.debug(f"Cache {'hit' if path else 'miss'} for {key[:12]}.{extension}")
+        return path
+
+    def put_file(self, key, source_path):
+        # Store a copy of source_path and return the cached path, or None if the file is larger
+        # than the whole cache. A hard link is not used because ffmpeg truncates and rewrites its
+        # output file in place on the next extraction.
+        size = os.path.getsize(source_path)
+        if size > self.max_size:
+            logger.debug(f"Not caching {source_path}: larger than the cache")
+            return None
+        extension = os.path.splitext(source_path)[1].lstrip(".")
+        path = self._path(key, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.copyfile(source_path, tmp_path)
+        self._replace(tmp_path, path, size)
+        return path
+
+    def get_json(self, key):
+        # Cached JSON document, or None on a miss
+        path = self.get_file(key, "json")
+        if path is None:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+
+    def put_json(self, key, data):
+        # Store a JSON document atomically, unless it is larger than the whole cache
+        path = self._path(key, "json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        size = os.path.getsize(tmp_path)
+        if size > self.max_size:
+            logger.debug(f"Not caching {key[:12]}.json: larger than the cache")
+            os.remove(tmp_path)
+            return None
+        self._replace(tmp_path, path, size)
+        return path
+
+    def _replace(self, tmp_path, path, size):
+        # Move a finished entry into place, counting it (less any entry it replaces) in the total
+        try:
+            size -= os.path.getsize(path)
+        except OSError:
+            pass
+        os.replace(tmp_path, path)
+        self.size += size
+        if self.size > self.max_size:
+            self.evict()
+
+    def _entries(self):
+        # (mtime, size, path) of every file in the cache
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        # Remove least recently used entries until the cache fits in max_size. The total is
+        # measured again here, since other processes may share the cache directory.
+        entries = self._entries()
+        total_size = sum(size for _, size, _ in entries)
+        self.size = total_size
+        if total_size <= self.max_size:
+            return
+
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+                total_size -= size
+                logger.debug(f"Evicted cache entry: {path}")
+            except OSError:
+                continue
+            if total_size <= self.max_size:
+                break
+        self.size = total_size
@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+from SonicScribe.utils.cache import DEFAULT_CACHE_DIR
+from SonicScribe.utils.translation_memory import TranslationMemory, normalize_text
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger("SonicScribe")
+
+# Manifests of unfinished jobs, one directory per job
+DEFAULT_JOBS_DIR = os.path.join(DEFAULT_CACHE_DIR, "jobs")
+
+# Checkpoints of jobs not touched for this long are deleted; their runs were abandoned
+MAX_JOB_AGE_SECONDS = 7 * 24 * 3600
+
+class CheckpointInUseError(RuntimeError):
+    # Raised when another run, in this process or another, holds the job's checkpoint
+    pass
+
+def _try_lock(f):
+    # Take an exclusive lock on an open file without waiting; False if someone else holds it.
+    # The lock is released when the file is closed, or by the OS when the process dies.
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+class JobCheckpoint:
+    # Append-only manifest of the units one job has finished: its chunk plan, the segments of each
+    # transcribed chunk and the result of each translation batch. Every unit is written and flushed
+    # to disk as soon as it completes, so a job killed halfway resumes from the first unfinished
+    # unit. The job directory also holds chunk files that would be expensive to recreate.
+    # A checkpoint is held by one run at a time: opening one that another run holds raises
+    # CheckpointInUseError rather than letting both write the same manifest and chunk files.
+
+    def __init__(self, job_dir):
+        self.job_dir = job_dir
+        self.path = os.path.join(job_dir, "manifest.jsonl")
+        self.plan = None
+        self.chunks = {}
+        self.translations = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._lock_file = self._acquire()
+        self._load()
+        self._file = open(self.path, "a", encoding="utf-8")
+        if self.chunks or self.translations:
+            logger.info(f"Resuming job from {self.path}: {len(self.chunks)} chunk(s) and "
+                        f"{len(self.translations)} translated line(s) already done")
+
+    def _acquire(self):
+        # Lock the job directory. A run that finishes removes the directory, lock file included,
+        # so a lock taken on a file that has meanwhile been unlinked is taken again on a fresh one.
+        lock_path = os.path.join(self.job_dir, "lock")
+        while True:
+            os.makedirs(self.job_dir, exist_ok=True)
+            f = open(lock_path, "a+b")
+            if not _try_lock(f):
+                f.close()
+                raise CheckpointInUseError(f"Job checkpoint {self.job_dir} is in use by another run")
+            try:
+                if os.path.samestat(os.fstat(f.fileno()), os.stat(lock_path)):
+                    return f
+            except FileNotFoundError:
+                pass
+            f.close()
+
+    @classmethod
+    def for_job(cls, key, jobs_dir=DEFAULT_JOBS_DIR):
+        # Checkpoint for the job with the given key (see ArtifactCache.make_key). Abandoned
+        # checkpoints of other jobs are expired first.
+        expire_jobs(jobs_dir)
+        return cls(os.path.join(jobs_dir, key))
+
+    @property
+    def chunk_dir(self):
+        # Directory for chunk files that must survive a restart
+        return os.path.join(self.job_dir, "chunks")
+
+    @staticmethod
+    def _translation_key(text, source_language, target_language, model):
+        # Languages are normalized as TranslationMemory normalizes them
+        return "\x1f".join([TranslationMemory._language(source_language), TranslationMemory._language(target_language),
+                             model, normalize_text(text)])
+
+    def _load(self):
+        # Replay the manifest; a line cut short by a crash is ignored
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Ignoring incomplete line {line_number} of {self.path}")
+                    continue
+                if record["type"] == "plan":
+                    if record["plan"] != self.plan:
+                        self.chunks.clear()
+                    self.plan = record["plan"]
+                elif record["type"] == "chunk":
+                    self.chunks[record["index"]] = (record["offset"], record["segments"], record.get("language"))
+                elif record["type"] == "translation":
+                    self.translations.update(record["translations"])
+
+    def _append(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def record_plan(self, plan):
+        # Record the chunk plan. Chunk results of a different earlier plan no longer apply.
+        if plan == self.plan:
+            return
+        if self.chunks:
+            logger.warning(f"Chunk plan changed, discarding {len(self.chunks)} checkpointed chunk(s)")
+            self.chunks.clear()
+        self.plan = plan
+        self._append({"type": "plan", "plan": plan})
+
+    def chunk_segments(self, index, offset):
+        # (segments, language) of a finished chunk, or None if the chunk (at this offset) still has to be transcribed
+        chunk = self.chunks.get(index)
+        if chunk is None or chunk[0] != offset:
+            return None
+        return chunk[1], chunk[2]
+
+    def record_chunk(self, index, offset, segments, language=None):
+        # Record the segments of a finished chunk and the language Whisper reported for it
+        self.chunks[index] = (offset, segments, language)
+        self._append({"type": "chunk", "index": index, "offset": offset, "segments": segments, "language": language})
+
+    def lookup(self, texts: Iterable[str], source_language, target_language="en", model="gpt-4o-mini") -> Dict[str, str]:
+        # Return {normalized source text: translation} for the lines this job already translated
+        found = {}
+        for text in texts:
+            translation = self.translations.get(self._translation_key(text, source_language, target_language, model))
+            if translation is not None:
+                found[normalize_text(text)] = translation
+        self.hits += len(found)
+        self.misses += len(set(normalize_text(text) for text in texts)) - len(found)
+        return found
+
+    def store(self, pairs: Iterable[Tuple[str, str]], source_language, target_language="en", model="gpt-4o-mini"):
+        # Record the result of a translation batch
+        translations = {
+            self._translation_key(text, source_language, target_language, model): translation
+            for text, translation in pairs
+            if normalize_text(text) and translation
+        }
+        if translations:
+            self.translations.update(translations)
+            self._append({"type": "translation", "translations": translations})
+
+    def stats(self):
+        # Hit/miss counters for this process
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+    def translation_memory(self, memory=None):
+        # Translation memory for translate_segments_async that reads and records this job's
+        # batches first and falls back to a shared TranslationMemory, if given
+        return _CheckpointedMemory(self, memory) if memory is not None else self
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+            self._lock_file.close()
+
+    def remove(self):
+        # Delete the manifest and chunk files once the job has finished. The lock is held until
+        # they are gone so no other run opens the checkpoint halfway through.
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+        if fcntl is None:
+            # Windows cannot delete a file that is still open
+            self._lock_file.close()
+        try:
+            shutil.rmtree(self.job_dir)
+        except OSError as e:
+            logger.warning(f"Could not remove job checkpoint {self.job_dir}: {e}")
+        self.close()
+
+def expire_jobs(jobs_dir=DEFAULT_JOBS_DIR, max_age=MAX_JOB_AGE_SECONDS):
+    # Delete the checkpoints whose manifest has not been written for max_age seconds, along with
+    # their chunk files. Checkpoints held by a running job are left alone. Returns the number deleted.
+    try:
+        names = os.listdir(jobs_dir)
+    except FileNotFoundError:
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for name in names:
+        job_dir = os.path.join(jobs_dir, name)
+        manifest = os.path.join(job_dir, "manifest.jsonl")
+        try:
+            if os.path.getmtime(manifest if os.path.exists(manifest) else job_dir) > cutoff:
+                continue
+            f = open(os.path.join(job_dir, "lock"), "a+b")
+        except OSError:
+            continue
+        try:
+            if not _try_lock(f):
+                continue
+            if fcntl is None:
+                # Windows cannot delete a file that is still open
+                f.close()
+            shutil.rmtree(job_dir, ignore_errors=True)
+            removed += 1
+        finally:
+            f.close()
+    if removed:
+        logger.info(f"Removed {removed} abandoned job checkpoint(s) from {jobs_dir}")
+    return removed
+
+class _CheckpointedMemory:
+    # Layers a job checkpoint over a shared TranslationMemory
+
+    def __init__(self, checkpoint, memory):
+        self.checkpoint = checkpoint
+        self.memory = memory
+
+    def lookup(self, texts, source_language, target_language="en", model="gpt-4o-mini"):
+        texts = list(texts)
+        found = self.checkpoint.lookup(texts, source_language, target_language, model)
+        missing = [text for text in texts if normalize_text(text) not in found]
+        if missing:
+            found.update(self.memory.lookup(missing, source_language, target_language, model))
+        return found
+
+    def get(self, text, source_language, target_language="en", model="gpt-4o-mini") -> Optional[str]:
+        return self.lookup([text], source_language, target_language, model).get(normalize_text(text))
+
+    def store(self, pairs, source_language, target_language="en", model="gpt-4o-mini"):
+        pairs = list(pairs)
+        self.checkpoint.store(pairs, source_language, target_language, model)
+        self.memory.store(pairs, source_language, target_language, model)
+
+    def stats(self):
+        return self.memory.stats()
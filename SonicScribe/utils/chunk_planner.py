@@ -0,0 +1,164 @@
+import re
+import sys
+import logging
+from array import array
+
+logger = logging.getLogger("SonicScribe")
+
+# A cut may move back this far from the end of the byte budget to land on a quiet frame
+SEARCH_SECONDS = 2.0
+
+# Frame length loudness is measured over, as in silence_remover
+FRAME_MS = 30
+
+# Audio shared by neighbouring chunks, so a word cut at one chunk's edge is whole in the other
+OVERLAP_SECONDS = 1.5
+
+# Longest run of words looked for when removing text repeated across a chunk boundary
+MAX_REPEATED_WORDS = 12
+
+# Shortest run of words taken as repeated, unless the segment ends before the previous chunk
+# does: a single common word ("the", "and") matches by chance far too often
+MIN_REPEATED_WORDS = 2
+
+_WORD = re.compile(r"\w+")
+
+def frame_energies(pcm, sample_width, frame_bytes):
+    # Mean square amplitude of each frame_bytes-long frame of little-endian PCM (channels mixed).
+    # Only the top two bytes of wider samples are used, which is plenty to rank frames by loudness.
+    if sample_width < 2:
+        return None
+    pcm = bytes(pcm)
+    if sample_width > 2:
+        top = bytearray(len(pcm) // sample_width * 2)
+        top[0::2] = pcm[sample_width - 2::sample_width]
+        top[1::2] = pcm[sample_width - 1::sample_width]
+        pcm = top
+        frame_bytes = frame_bytes // sample_width * 2
+    samples = array("h")
+    samples.frombytes(pcm[:len(pcm) - len(pcm) % 2])
+    if sys.byteorder == "big":
+        samples.byteswap()
+    per_frame = max(1, frame_bytes // 2)
+    return [sum(x * x for x in samples[i:i + per_frame]) / per_frame for i in range(0, len(samples), per_frame)]
+
+def find_quiet_cut(pcm, layout, earliest, target, frame_ms=FRAME_MS):
+    # Byte position in [earliest, target] at the middle of the quietest frame, aligned to whole
+    # sample frames. pcm is the PCM data (bytes or a memoryview, e.g. of an mmap) from position 0.
+    # Frames are scanned from the target backwards, so among equally quiet frames the latest wins.
+    block_align = layout["block_align"]
+    frame_bytes = max(block_align, int(layout["sample_rate"] * frame_ms / 1000) * block_align)
+    earliest -= earliest % block_align
+    target -= target % block_align
+    if target - earliest < frame_bytes:
+        return target
+
+    energies = frame_energies(pcm[earliest:target], layout["sample_width"], frame_bytes)
+    if not energies:
+        return target
+    quietest = min(range(len(energies) - 1, -1, -1), key=energies.__getitem__)
+    cut = earliest + quietest * frame_bytes + frame_bytes // 2
+    return min(target, cut - cut % block_align)
+
+def plan_chunks(pcm, layout, data_size, chunk_bytes, overlap_seconds=OVERLAP_SECONDS, search_seconds=SEARCH_SECONDS,
+                reused=()):
+    # Plan chunks of PCM data that each fit chunk_bytes. Every cut is snapped back to the quietest
+    # frame within search_seconds of the budget, and each chunk after the first starts about
+    # overlap_seconds before the previous cut, also on a quiet frame. Returns dicts with the data
+    # byte range (start, end), offset and duration in seconds, and keep_after: the previous chunk's
+    # cut in seconds, as segments that end by then were already transcribed by that chunk.
+    # reused lists stretches of audio whose segments are already known, as dicts with start and end
+    # in seconds, the segments and their language, in playback order (see fingerprints.reusable_spans).
+    # Each becomes a chunk of its own whose "reused" entry holds its segments and language; only the
+    # audio between them is planned as above, reaching overlap_seconds into the stretches on either side.
+    block_align = layout["block_align"]
+    bytes_per_second = layout["sample_rate"] * block_align
+    chunk_bytes = max(block_align, chunk_bytes - chunk_bytes % block_align)
+    overlap = int(overlap_seconds * layout["sample_rate"]) * block_align
+    search = int(search_seconds * layout["sample_rate"]) * block_align
+    # Without room for new audio after the overlap, drop the overlap rather than loop forever
+    if 2 * (overlap + search) >= chunk_bytes:
+        overlap = 0
+
+    def to_bytes(seconds):
+        position = min(data_size, max(0, int(seconds * bytes_per_second)))
+        return position - position % block_align
+
+    def plan_range(start, stop, keep_after):
+        # Chunks covering [start, stop), the first of which keeps segments ending after keep_after
+        while True:
+            end = stop
+            if stop - start > chunk_bytes:
+                target = start + chunk_bytes
+                end = find_quiet_cut(pcm, layout, max(start + overlap + search, target - search), target)
+            plan.append({
+                "start": start,
+                "end": end,
+                "offset": start / bytes_per_second,
+                "duration": (end - start) / bytes_per_second,
+                "keep_after": keep_after
+            })
+            if end >= stop:
+                return
+            keep_after = end / bytes_per_second
+            start = find_quiet_cut(pcm, layout, max(start + block_align, end - overlap - search), end - overlap) if overlap else end
+
+    plan = []
+    start = 0
+    keep_after = None
+    for span in reused:
+        span_start, span_end = to_bytes(span["start"]), to_bytes(span["end"])
+        if span_end <= start:
+            continue
+        if span_start > start:
+            plan_range(start, min(span_end, span_start + overlap), keep_after)
+        plan.append({
+            "start": span_start,
+            "end": span_end,
+            "offset": span_start / bytes_per_second,
+            "duration": (span_end - span_start) / bytes_per_second,
+            "keep_after": None,
+            "reused": {"segments": span["segments"], "language": span.get("language")}
+        })
+        keep_after = span_end / bytes_per_second
+        start = data_size
+        if span_end < data_size:
+            start = find_quiet_cut(pcm, layout, max(span_start, span_end - overlap - search), span_end - overlap) if overlap else span_end
+    if start < data_size or not plan:
+        plan_range(start, data_size, keep_after)
+    return plan
+
+def trim_repeated_segments(segments, keep_after):
+    # Drop the segments (in file time) of a chunk that end by keep_after, the previous chunk's cut:
+    # that chunk transcribed the same audio with more context before it
+    if keep_after is None:
+        return segments
+    return [segment for segment in segments if segment["end"] > keep_after]
+
+def drop_repeated_words(previous, segments):
+    # Remove text a chunk repeats from the end of the previous chunk, given the previous chunk's
+    # last segments. Only leading segments that start before the previous chunk's last segment ends
+    # are examined; the longest run of words ending the previous chunk that also starts such a
+    # segment is cut from it, and a segment left empty is dropped. Runs shorter than
+    # MIN_REPEATED_WORDS only count in segments that lie wholly inside the previous chunk.
+    if not previous:
+        return segments
+    tail = [word.lower() for word in _WORD.findall(" ".join(segment["text"] for segment in previous))][-MAX_REPEATED_WORDS:]
+    previous_end = previous[-1]["end"]
+    result = list(segments)
+    while result and result[0]["start"] < previous_end and tail:
+        segment = result[0]
+        matches = list(_WORD.finditer(segment["text"]))
+        words = [match.group().lower() for match in matches]
+        repeated = next((k for k in range(min(len(tail), len(words)), 0, -1) if tail[-k:] == words[:k]), 0)
+        if not repeated or (repeated < MIN_REPEATED_WORDS and segment["end"] > previous_end):
+            break
+        if repeated == len(words):
+            logger.debug(f"Dropping segment repeated across a chunk boundary: {segment['text']!r}")
+            result.pop(0)
+            continue
+        rest = segment["text"][matches[repeated - 1].end():].lstrip(" ,.;:!?-…")
+        result[0] = {**segment, "start": min(max(segment["start"], previous_end), segment["end"]),
+                     "text": (" " if segment["text"].startswith(" ") else "") + rest}
+        break
+    return result
@@ -0,0 +1,123 @@
+import os
+import asyncio
+import logging
+import weakref
+from functools import lru_cache, partial
+
+logger = logging.getLogger("SonicScribe")
+
+# One AsyncOpenAI client per event loop; its connection pool cannot be shared across loops
+_async_clients = weakref.WeakKeyDictionary()
+
+# HTTP settings of the clients created by get_async_client, changed through configure_clients.
+# base_url=None falls back to OPENAI_BASE_URL or the public API. Timeouts are in seconds; the
+# write timeout covers uploading a chunk, so large chunks on slow links may need a higher one.
+CLIENT_DEFAULTS = {
+    "base_url": None,
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 30.0,
+    "connect_timeout": 10.0,
+    "read_timeout": 600.0,
+    "write_timeout": 600.0,
+    "max_retries": 2,
+}
+_client_settings = dict(CLIENT_DEFAULTS)
+
+@lru_cache(maxsize=None)
+def load_environment():
+    # Load environment variables from a .env file, once and only when first needed
+    from dotenv import load_dotenv
+    load_dotenv()
+
+def get_api_key():
+    # OpenAI API key from the environment (or a .env file)
+    load_environment()
+    return os.getenv("OPENAI_API_KEY")
+
+def request_options(request_timeout=None):
+    # Per-request keyword arguments for the OpenAI client. The timeout is left out when unset,
+    # since an explicit None would disable the client's own timeout.
+    return {"timeout": request_timeout} if request_timeout is not None else {}
+
+def configure_clients(**settings):
+    # Change the HTTP settings (see CLIENT_DEFAULTS) of every client created from now on.
+    # Settings passed as None keep their current value.
+    unknown = set(settings) - set(CLIENT_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown client settings: {', '.join(sorted(unknown))}")
+    _client_settings.update({name: value for name, value in settings.items() if value is not None})
+    if _async_clients:
+        logger.debug("Client settings changed; clients that already exist keep their old settings")
+    return dict(_client_settings)
+
+def client_settings():
+    # Current HTTP settings used for new clients
+    return dict(_client_settings)
+
+def create_async_client(**settings):
+    # New AsyncOpenAI client with its own connection pool, using the configured settings
+    # updated with any given here. Callers own the client and must close it.
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient, Timeout, DEFAULT_CONNECTION_LIMITS
+
+    # Limits of the HTTP library this openai release is built on
+    Limits = type(DEFAULT_CONNECTION_LIMITS)
+
+    settings = {**_client_settings, **{name: value for name, value in settings.items() if value is not None}}
+    timeout = Timeout(
+        connect=settings["connect_timeout"],
+        read=settings["read_timeout"],
+        write=settings["write_timeout"],
+        pool=settings["connect_timeout"]
+    )
+    http_client = DefaultAsyncHttpxClient(
+        limits=Limits(
+            max_connections=settings["max_connections"],
+            max_keepalive_connections=settings["max_keepalive_connections"],
+            keepalive_expiry=settings["keepalive_expiry"]
+        ),
+        timeout=timeout
+    )
+    return AsyncOpenAI(
+        api_key=get_api_key(),
+        base_url=settings["base_url"],
+        timeout=timeout,
+        max_retries=settings["max_retries"],
+        http_client=http_client
+    )
+
+def get_async_client():
+    # Shared AsyncOpenAI client for the running event loop, created on first use. Transcription,
+    # translation and language detection all go through it and share its connection pool.
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = create_async_client()
+        _async_clients[loop] = client
+    return client
+
+async def close_async_client():
+    # Close the running loop's client and release its connections
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+async def to_thread(func, *args, **kwargs):
+    # Run a blocking call in the event loop's default thread pool (asyncio.to_thread needs Python 3.9)
+    return await asyncio.get_running_loop().run_in_executor(None, partial(func, *args, **kwargs))
+
+def run_sync(coroutine):
+    # Run a coroutine to completion from synchronous code, closing the loop's client afterwards
+    async def runner():
+        try:
+            return await coroutine
+        finally:
+            await close_async_client()
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(runner())
+    coroutine.close()
+    raise RuntimeError("Synchronous SonicScribe functions cannot be called from a running event loop; "
+                       "use the async API in SonicScribe.aio instead")
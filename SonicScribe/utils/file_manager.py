@@ -1,9 +1,240 @@
 import os
+import re
+import glob
+from json.encoder import encode_basestring as encode_string
 import logging
 from typing import List, Dict, Any
+from SonicScribe.utils.audio_extractor import VIDEO_EXTENSIONS, AUDIO_EXTENSIONS
+from SonicScribe.utils.segments import SegmentStore
 
 logger = logging.getLogger("SonicScribe")
 
+# Matches "00:01:02,345 --> 00:01:04,000" (also with '.' separators or trailing position settings)
+SRT_TIMESTAMP = re.compile(
+    r"(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})\s*-->\s*(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})"
+)
+
+# Text files listing one media path per line are treated as batch manifests
+MANIFEST_EXTENSIONS = (".txt", ".lst", ".m3u")
+
+def is_media_file(path):
+    # Whether a path has an audio or video extension SonicScribe can extract from
+    return path.lower().endswith(VIDEO_EXTENSIONS + AUDIO_EXTENSIONS)
+
+def collect_inputs(source):
+    # Expand a media file, directory (searched recursively), glob pattern or manifest file
+    # into a sorted list of media file paths. Manifest lines are paths relative to the
+    # manifest; blank lines and lines starting with '#' are ignored.
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(root, name)
+            for root, _, files in os.walk(source)
+            for name in files
+            if is_media_file(name)
+        )
+
+    if os.path.isfile(source) and source.lower().endswith(MANIFEST_EXTENSIONS):
+        base_dir = os.path.dirname(source)
+        with open(source, "r", encoding="utf-8-sig") as f:
+            lines = [line.strip() for line in f]
+        return [os.path.join(base_dir, line) for line in lines if line and not line.startswith("#")]
+
+    if any(char in source for char in "*?["):
+        return sorted(path for path in glob.glob(source, recursive=True) if os.path.isfile(path) and is_media_file(path))
+
+    return [source]
+
+# Zero-padded digit strings, looked up instead of formatted for every timestamp
+_TWO_DIGITS = [f"{i:02d}" for i in range(100)]
+_THREE_DIGITS = [f"{i:03d}" for i in range(1000)]
+
+def format_timestamps(values, separator=","):
+    # Format many times in seconds at once as HH:MM:SS,mmm (HH:MM:SS.mmm for WebVTT with separator=".").
+    # Each value is rounded once to whole milliseconds so e.g. 1.9996 becomes 00:00:02,000 rather than 00:00:01,1000
+    return [
+        f"{_TWO_DIGITS[ms // 3600000] if ms < 360000000 else ms // 3600000}:{_TWO_DIGITS[ms // 60000 % 60]}:"
+        f"{_TWO_DIGITS[ms // 1000 % 60]}{separator}{_THREE_DIGITS[ms % 1000]}"
+        for ms in [max(0, int(round(value * 1000))) for value in values]
+    ]
+
+def format_time(seconds):
+    # Format time in SRT format (HH:MM:SS,mmm)
+    return format_timestamps([float(seconds)])[0]
+
+def _parse_time(hours, minutes, seconds, millis):
+    # Convert SRT timestamp fields to seconds
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds) + int(millis.ljust(3, "0")) / 1000
+
+def parse_srt(content) -> List[Dict[str, Any]]:
+    # Parse SRT content into segments with index, start, end and text.
+    # Tolerates a BOM, CRLF line endings, missing indices and extra blank lines inside cues.
+    segments = []
+    current = None
+    lines = content.lstrip("﻿").replace("\r\n", "\n").replace("\r", "\n").split("\n")
+
+    for i, line in enumerate(lines):
+        match = SRT_TIMESTAMP.search(line)
+        if match:
+            if current is not None:
+                segments.append(current)
+            # The cue number, if any, is the line directly above the timestamp
+            previous = lines[i - 1].strip() if i > 0 else ""
+            if current is not None and previous.isdigit() and current["lines"] and current["lines"][-1].strip() == previous:
+                current["lines"].pop()
+            groups = match.groups()
+            current = {
+                "index": int(previous) if previous.isdigit() else len(segments) + 1,
+                "start": _parse_time(*groups[:4]),
+                "end": _parse_time(*groups[4:]),
+                "lines": []
+            }
+        elif current is not None:
+            current["lines"].append(line)
+
+    if current is not None:
+        segments.append(current)
+
+    for segment in segments:
+        segment["text"] = "\n".join(segment.pop("lines")).strip()
+    return segments
+
+def load_srt(path) -> List[Dict[str, Any]]:
+    # Read and parse an SRT file
+    with open(path, "r", encoding="utf-8-sig") as f:
+        return parse_srt(f.read())
+
+# Names of the output formats in log messages
+_FORMAT_NAMES = {
+    "txt": "Transcript",
+    "srt": "Subtitles (with timestamps)",
+    "bilingual": "Bilingual subtitles",
+    "vtt": "WebVTT subtitles",
+    "json": "JSON segments"
+}
+
+# Output formats a TranscriptWriter can produce and the file name suffix of each
+OUTPUT_FORMATS = {
+    "txt": "_transcribed.txt",
+    "srt": ".srt",
+    "bilingual": "_bilingual.srt",
+    "vtt": ".vtt",
+    "json": ".json"
+}
+
+def render_segments(segments, formats=("srt",), first_index=1):
+    # Render segments (dicts or a SegmentStore) into each requested format and return {format: text}.
+    # Work is done column-wise: timestamps are formatted for all cues at once, and the cue headers
+    # are built once and shared by the SRT and bilingual SRT. Cues are numbered from first_index
+    # unless the segments carry their own numbers. "txt" is the space-joined transcript,
+    # "bilingual" an SRT with the original text above the translation, and "json" the objects
+    # separated by ",\n" without the enclosing brackets, so consecutive calls can be appended to one file.
+    store = segments if isinstance(segments, SegmentStore) else SegmentStore(segments)
+    numbers = store.cue_numbers(first_index)
+    texts = [text.strip() for text in store.texts]
+    rendered = {}
+
+    if "txt" in formats:
+        rendered["txt"] = " ".join(store.texts)
+
+    if "srt" in formats or "bilingual" in formats:
+        headers = [f"{number}\n{start} --> {end}\n" for number, start, end
+                   in zip(numbers, format_timestamps(store.starts), format_timestamps(store.ends))]
+        if "srt" in formats:
+            rendered["srt"] = "".join([f"{header}{text}\n\n" for header, text in zip(headers, texts)])
+        if "bilingual" in formats:
+            rendered["bilingual"] = "".join([
+                f"{header}{original.strip()}\n{text}\n\n"
+                if original is not None and original is not text and original.strip() and original.strip() != text
+                else f"{header}{text}\n\n"
+                for header, text, original in zip(headers, texts, store.originals)
+            ])
+
+    if "vtt" in formats:
+        rendered["vtt"] = "".join([
+            f"{number}\n{start} --> {end}\n{text}\n\n" for number, start, end, text
+            in zip(numbers, format_timestamps(store.starts, "."), format_timestamps(store.ends, "."), texts)
+        ])
+
+    if "json" in formats:
+        # Objects are assembled around json's C string encoder, which is much faster than encoding
+        # a dict per segment; float repr is what json itself writes for timestamps
+        rendered["json"] = ",\n".join([
+            f'{{"index": {number}, "start": {start!r}, "end": {end!r}, "text": {encode_string(text)}'
+            + (f', "original_text": {encode_string(original)}}}' if original is not None else "}")
+            for number, start, end, text, original in zip(numbers, store.starts, store.ends, texts, store.originals)
+        ])
+    return rendered
+
+def write_srt(segments: List[Dict[str, Any]], output_path, bilingual=False):
+    # Write segments as SRT, keeping each segment's own cue number when it has one.
+    # With bilingual=True the original text is written above the translation.
+    name = "bilingual" if bilingual else "srt"
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(render_segments(segments, (name,))[name])
+    return output_path
+
+class TranscriptWriter:
+    # Writes the outputs of one input as segments arrive, so the first subtitles are on disk while
+    # later chunks are still being processed. formats is any of OUTPUT_FORMATS; the transcript and
+    # SRT names match save_transcript, save_srt_from_segments and save_bilingual_srt. Each batch of
+    # segments is rendered for every format in one pass and written through large buffers.
+
+    def __init__(self, original_file, output_dir="output/transcripts", bilingual=False, formats=("txt", "srt")):
+        os.makedirs(output_dir, exist_ok=True)
+        base = os.path.splitext(os.path.basename(original_file))[0]
+        unknown = set(formats) - set(OUTPUT_FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown output formats: {', '.join(sorted(unknown))}")
+        formats = [name for name in OUTPUT_FORMATS if name in formats or (name == "bilingual" and bilingual)]
+        self.formats = tuple(formats)
+        self.paths = {name: os.path.join(output_dir, base + OUTPUT_FORMATS[name]) for name in self.formats}
+        self.count = 0
+        self._files = {name: open(path, "w", encoding="utf-8", buffering=1024 * 1024) for name, path in self.paths.items()}
+        if "vtt" in self._files:
+            self._files["vtt"].write("WEBVTT\n\n")
+        if "json" in self._files:
+            self._files["json"].write("[\n")
+
+    def write(self, segments: List[Dict[str, Any]]):
+        # Append segments to every output and flush them so readers see complete cues
+        store = segments if isinstance(segments, SegmentStore) else SegmentStore(segments)
+        if not store:
+            return
+        rendered = render_segments(store, self.formats, self.count + 1)
+        for name, text in rendered.items():
+            # Continue the transcript and the JSON array across batches
+            if self.count and name == "txt":
+                text = " " + text
+            elif self.count and name == "json":
+                text = ",\n" + text
+            self._files[name].write(text)
+        self.count += len(store)
+
+        for f in self._files.values():
+            f.flush()
+
+    def close(self):
+        # Finish writing and return the output paths by format, with None for formats not written.
+        # The transcript is also returned as "transcript" for callers of earlier versions.
+        if "json" in self._files:
+            self._files["json"].write("\n]\n")
+        for f in self._files.values():
+            f.close()
+        for name, path in self.paths.items():
+            logger.info(f"{_FORMAT_NAMES[name]} saved at: {path}")
+        paths = {name: self.paths.get(name) for name in OUTPUT_FORMATS}
+        paths["transcript"] = paths["txt"]
+        return paths
+
+    def discard(self):
+        # Close and delete the partial outputs of a failed run
+        for name, f in self._files.items():
+            f.close()
+            try:
+                os.remove(self.paths[name])
+            except OSError as e:
+                logger.warning(f"Could not remove partial output {self.paths[name]}: {e}")
+
 def save_transcript(text, original_file, output_dir="output/transcripts"):
     # Save transcript to file with proper error handling
     os.makedirs(output_dir, exist_ok=True)
@@ -27,32 +258,8 @@ def save_srt_from_segments(segments: List[Dict[str, Any]], original_file, output
     base = os.path.splitext(os.path.basename(original_file))[0]
     output_path = os.path.join(output_dir, f"{base}.srt")
 
-    def format_time(seconds):
-        # Format time in SRT format (HH:MM:SS,mmm)
-        # Ensure we're working with a float
-        seconds = float(seconds)
-        
-        hrs = int(seconds // 3600)
-        mins = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        # Ensure exactly 3 digits for milliseconds
-        millis = int(round((seconds % 1) * 1000))
-        
-        return f"{hrs:02d}:{mins:02d}:{secs:02d},{millis:03d}"
-
     try:
-        with open(output_path, "w", encoding="utf-8") as f:
-            for i, seg in enumerate(segments):
-                # Check if segment has required keys
-                if 'start' not in seg or 'end' not in seg or 'text' not in seg:
-                    logger.warning(f"Skipping malformed segment: {seg}")
-                    continue
-                    
-                start = format_time(seg['start'])
-                end = format_time(seg['end'])
-                f.write(f"{i + 1}\n")
-                f.write(f"{start} --> {end}\n")
-                f.write(seg['text'].strip() + "\n\n")
+        write_srt(segments, output_path)
         logger.info(f"Subtitles (with timestamps) saved at: {output_path}")
         return output_path
     except IOError as e:
@@ -67,37 +274,10 @@ def save_bilingual_srt(segments, original_file, output_dir="output/transcripts")
     base = os.path.splitext(os.path.basename(original_file))[0]
     output_path = os.path.join(output_dir, f"{base}_bilingual.srt")
 
-    def format_time(seconds):
-        # Format time in SRT format (HH:MM:SS,mmm)
-        seconds = float(seconds)
-        hrs = int(seconds // 3600)
-        mins = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        millis = int(round((seconds % 1) * 1000))
-        return f"{hrs:02d}:{mins:02d}:{secs:02d},{millis:03d}"
-
     try:
-        with open(output_path, "w", encoding="utf-8") as f:
-            for i, seg in enumerate(segments):
-                if 'start' not in seg or 'end' not in seg or 'text' not in seg:
-                    logger.warning(f"Skipping malformed segment: {seg}")
-                    continue
-                    
-                start = format_time(seg['start'])
-                end = format_time(seg['end'])
-                
-                # Check if we have both original and translated text
-                if 'original_text' in seg and seg['original_text'] != seg['text']:
-                    text = f"{seg['original_text']}\n{seg['text']}"
-                else:
-                    text = seg['text']
-                    
-                f.write(f"{i + 1}\n")
-                f.write(f"{start} --> {end}\n")
-                f.write(text.strip() + "\n\n")
-                
+        write_srt(segments, output_path, bilingual=True)
         logger.info(f"Bilingual subtitles saved at: {output_path}")
         return output_path
     except Exception as e:
         logger.error(f"Failed to save bilingual subtitles: {e}")
-        return None
\ No newline at end of file
+        return None
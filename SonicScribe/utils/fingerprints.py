@@ -0,0 +1,324 @@
+import os
+import sys
+import time
+import json
+import uuid
+import sqlite3
+import logging
+import operator
+import threading
+from array import array
+
+from SonicScribe.utils.cache import DEFAULT_CACHE_DIR
+
+logger = logging.getLogger("SonicScribe")
+
+DEFAULT_INDEX_PATH = os.path.join(DEFAULT_CACHE_DIR, "fingerprints.sqlite3")
+
+# Audio is averaged down to about this rate before fingerprinting; the features only look at
+# the shape of the spectrum below 2 kHz, where most of the energy of speech and music is
+FINGERPRINT_RATE = 4000
+
+# Samples of FINGERPRINT_RATE audio per fingerprint frame (32 ms), and frames each feature is measured over
+HOP_SAMPLES = 128
+WINDOW_HOPS = 4
+
+# Autocorrelation lags measured per frame. Band k >= 1 is the energy of x[n] - x[n - k], a comb
+# filter, which is 2 * (R0 - Rk); band 0 is the plain energy R0.
+LAGS = 8
+
+# Length of a stored region, and the shortest region worth storing or reusing
+REGION_SECONDS = 10.0
+MIN_REGION_SECONDS = 5.0
+
+# Consecutive frames hashed into one lookup key, and every how many frames of a stored region a key is kept
+KEY_FRAMES = 3
+KEY_STRIDE = 2
+
+# A region matches if at least this many keys agree on its position and at most this share of
+# its fingerprint bits differ there (unrelated audio differs in about half of them)
+MIN_VOTES = 3
+MAX_BIT_ERRORS = 0.2
+
+# Regions quieter than this mean square amplitude (16-bit scale) are not fingerprinted: silence
+# and hum carry too little structure to identify anything
+MIN_ENERGY = 2.0e4
+
+# Frames decoded and measured at a time, so a long memory-mapped file is never copied whole
+BLOCK_FRAMES = 2048
+
+def _decimated(pcm, layout, step):
+    # First channel of little-endian PCM as 16-bit samples, summed over blocks of step samples
+    # down to about FINGERPRINT_RATE. Only the top two bytes of wider samples are used, as in
+    # chunk_planner.
+    sample_width = layout["sample_width"]
+    channels = max(1, layout["block_align"] // sample_width)
+    pcm = bytes(pcm)
+    if sample_width > 2:
+        top = bytearray(len(pcm) // sample_width * 2)
+        top[0::2] = pcm[sample_width - 2::sample_width]
+        top[1::2] = pcm[sample_width - 1::sample_width]
+        pcm = top
+    samples = array("h")
+    samples.frombytes(pcm[:len(pcm) - len(pcm) % 2])
+    if sys.byteorder == "big":
+        samples.byteswap()
+
+    stride = step * channels
+    count = len(samples) // stride
+    # Boxcar sum of each block: a cheap low-pass before dropping samples
+    total = samples[0:count * stride:stride]
+    for j in range(1, step):
+        total = list(map(operator.add, total, samples[j * channels:count * stride:stride]))
+    return total
+
+def fingerprint_pcm(pcm, layout):
+    # Fingerprint of PCM audio (bytes or a memoryview, e.g. of an mmap), a dict with bits: one byte
+    # per frame of HOP_SAMPLES samples at about FINGERPRINT_RATE, energies: the mean square amplitude
+    # of every frame, and frame_seconds: the exact length of a frame at the audio's sample rate.
+    # Each frame's comb-filter band energies are summed over WINDOW_HOPS frames; bit k < 7 says
+    # whether the difference between bands k and k+1 grew since the previous frame, and bit 7
+    # whether the overall energy did. These bits depend on how the spectrum moves rather than on
+    # levels, so they survive gain changes and re-encoding, and overlapping windows keep them stable
+    # when the audio is shifted by part of a frame.
+    step = max(1, round(layout["sample_rate"] / FINGERPRINT_RATE))
+    hop = max(1, round(HOP_SAMPLES * layout["sample_rate"] / step / FINGERPRINT_RATE))
+    frame_seconds = hop * step / layout["sample_rate"]
+    if layout["sample_width"] < 2:
+        return {"bits": b"", "energies": array("d"), "frame_seconds": frame_seconds}
+
+    block_bytes = BLOCK_FRAMES * hop * step * layout["block_align"]
+    lags = []
+    for block_start in range(0, len(pcm), block_bytes):
+        samples = _decimated(pcm[block_start:block_start + block_bytes], layout, step)
+        for i in range(len(samples) // hop):
+            frame = samples[i * hop:(i + 1) * hop]
+            lags.append([sum(map(operator.mul, frame, frame))] +
+                        [sum(map(operator.mul, frame[k:], frame)) for k in range(1, LAGS)])
+
+    bits = bytearray()
+    energies = array("d")
+    previous = None
+    for i in range(len(lags)):
+        window = lags[max(0, i - WINDOW_HOPS + 1):i + 1]
+        r = [sum(values) for values in zip(*window)]
+        bands = [r[0]] + [2 * (r[0] - r[k]) for k in range(1, LAGS)]
+        differences = [bands[k] - bands[k + 1] for k in range(LAGS - 1)]
+        value = 0
+        if previous is not None:
+            for k in range(LAGS - 1):
+                if differences[k] > previous[1][k]:
+                    value |= 1 << k
+            if bands[0] > previous[0]:
+                value |= 1 << 7
+        previous = (bands[0], differences)
+        bits.append(value)
+        energies.append(lags[i][0] / (hop * step * step))
+    return {"bits": bytes(bits), "energies": energies, "frame_seconds": frame_seconds}
+
+def _keys(bits, stride=1):
+    # (lookup key, frame) for every KEY_FRAMES-long run of frames, one run every stride frames
+    return [(int.from_bytes(bits[i:i + KEY_FRAMES], "big"), i) for i in range(0, len(bits) - KEY_FRAMES + 1, stride)]
+
+def bit_errors(a, b):
+    # Share of differing bits between two equally long fingerprints
+    if not a:
+        return 1.0
+    # Counted with bin() since int.bit_count needs Python 3.10
+    return bin(int.from_bytes(a, "big") ^ int.from_bytes(b, "big")).count("1") / (8 * len(a))
+
+def reusable_spans(matches, fingerprint, tolerance_frames=2):
+    # Turn matches (see FingerprintIndex.match) into stretches of audio whose segments can be reused,
+    # as dicts with start and end in seconds, the segments and their language, in playback order.
+    # Matches of consecutive regions of one source merge into one stretch. A stored segment that runs past the
+    # end of its stretch is dropped, as the audio after it did not match, and the stretch is narrowed
+    # to the segments it keeps, so the audio around them is transcribed again. Stretches shorter
+    # than MIN_REGION_SECONDS are not worth cutting out.
+    frame_seconds = fingerprint["frame_seconds"]
+    runs = []
+    for match in matches:
+        last = runs[-1][-1] if runs else None
+        if (last is not None and match["source"] == last["source"]
+                and match["position"] == last["position"] + last["end"] - last["start"]
+                and abs(match["start"] - last["end"]) <= tolerance_frames):
+            runs[-1].append(match)
+        else:
+            runs.append([match])
+
+    spans = []
+    for run in runs:
+        start = run[0]["start"] * frame_seconds
+        end = run[-1]["end"] * frame_seconds
+        segments = [segment for match in run for segment in match["segments"]
+                    if segment["end"] <= end + tolerance_frames * frame_seconds]
+        if segments:
+            start, end = segments[0]["start"], min(end, segments[-1]["end"])
+        if end - start >= MIN_REGION_SECONDS:
+            spans.append({"start": start, "end": end, "segments": segments, "language": run[0]["language"]})
+    return spans
+
+class FingerprintIndex:
+    # Persistent store of fingerprinted audio regions and their transcribed segments, backed by
+    # SQLite. A transcribed file is stored as regions of REGION_SECONDS, each with its fingerprint,
+    # lookup keys and the segments that start in it, relative to the region's start. Audio in a
+    # later file that matches a region, wherever it sits, reuses those segments instead of being
+    # transcribed again. Entries are keyed by the transcription engine and model (see
+    # TranscriptionBackend.cache_key), and the least recently matched regions are evicted once the
+    # index holds more than max_regions.
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, max_regions=50000):
+        self.path = path
+        self.max_regions = max_regions
+        self.hits = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS regions ("
+            " id INTEGER PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " source TEXT NOT NULL,"
+            " position INTEGER NOT NULL,"
+            " bits BLOB NOT NULL,"
+            " segments TEXT NOT NULL,"
+            " language TEXT,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS region_keys (key INTEGER NOT NULL, region INTEGER NOT NULL, frame INTEGER NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS region_keys_key ON region_keys (key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS region_keys_region ON region_keys (region)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS regions_last_used ON regions (last_used)")
+        self._conn.commit()
+
+    def match(self, fingerprint, model):
+        # Find stored regions in a fingerprint (see fingerprint_pcm). Returns non-overlapping matches
+        # in playback order as dicts with the frame range (start, end), the region's source and
+        # position, and its segments, shifted to the match's place in seconds, and their language.
+        bits = fingerprint["bits"]
+        if len(bits) < KEY_FRAMES:
+            return []
+        keys = _keys(bits)
+        with self._lock:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS query_keys (key INTEGER NOT NULL, frame INTEGER NOT NULL)")
+            self._conn.execute("DELETE FROM query_keys")
+            self._conn.executemany("INSERT INTO query_keys VALUES (?, ?)", keys)
+            votes = self._conn.execute(
+                "SELECT k.region, q.frame - k.frame AS shift, COUNT(*) AS votes"
+                " FROM query_keys q JOIN region_keys k ON k.key = q.key JOIN regions r ON r.id = k.region"
+                " WHERE r.model = ? GROUP BY k.region, shift HAVING votes >= ? ORDER BY votes DESC",
+                (model, MIN_VOTES)
+            ).fetchall()
+            self._conn.execute("DELETE FROM query_keys")
+
+            candidates = []
+            regions = {}
+            for region, shift, _ in votes:
+                if region not in regions:
+                    regions[region] = self._conn.execute(
+                        "SELECT bits, segments, language, source, position FROM regions WHERE id = ?", (region,)
+                    ).fetchone()
+                region_bits = regions[region][0]
+                if shift < 0 or shift + len(region_bits) > len(bits):
+                    continue
+                # The first frame has no predecessor to compare with, so its bits are left out
+                errors = bit_errors(region_bits[1:], bits[shift + 1:shift + len(region_bits)])
+                if errors <= MAX_BIT_ERRORS:
+                    candidates.append((errors, shift, region))
+
+            # Best matches first, skipping any that overlap one already taken
+            matches = []
+            taken = []
+            for errors, shift, region in sorted(candidates):
+                region_bits, segments, language, source, position = regions[region]
+                end = shift + len(region_bits)
+                if any(shift < other_end and other_start < end for other_start, other_end in taken):
+                    continue
+                taken.append((shift, end))
+                offset = shift * fingerprint["frame_seconds"]
+                matches.append({
+                    "start": shift,
+                    "end": end,
+                    "source": source,
+                    "position": position,
+                    "errors": errors,
+                    "language": language,
+                    "segments": [{**segment, "start": segment["start"] + offset, "end": segment["end"] + offset}
+                                 for segment in json.loads(segments)]
+                })
+
+            if matches:
+                now = time.time()
+                self._conn.executemany("UPDATE regions SET last_used = ? WHERE id = ?",
+                                       [(now, region) for _, _, region in candidates])
+                self._conn.commit()
+            self.hits += len(matches)
+        return sorted(matches, key=lambda match: match["start"])
+
+    def store(self, fingerprint, spans, segments, model, language=None):
+        # Store the audio of a transcribed file's fingerprint within spans ((start, end) frame ranges,
+        # usually the parts that were actually transcribed) as regions of REGION_SECONDS, each with
+        # the segments (in file time) that start in it and the language they are in. Quiet regions
+        # are left out.
+        bits = fingerprint["bits"]
+        energies = fingerprint["energies"]
+        frame_seconds = fingerprint["frame_seconds"]
+        region_frames = int(REGION_SECONDS / frame_seconds)
+        min_frames = int(MIN_REGION_SECONDS / frame_seconds)
+        source = uuid.uuid4().hex
+        now = time.time()
+        rows = []
+        for span_start, span_end in spans:
+            for start in range(span_start, span_end, region_frames):
+                end = min(start + region_frames, span_end)
+                if end - start < min_frames or sum(energies[start:end]) / (end - start) < MIN_ENERGY:
+                    continue
+                offset = start * frame_seconds
+                region_segments = [
+                    {"start": segment["start"] - offset, "end": segment["end"] - offset, "text": segment["text"]}
+                    for segment in segments
+                    if offset <= segment["start"] < end * frame_seconds
+                ]
+                rows.append((start, bytes(bits[start:end]), json.dumps(region_segments, ensure_ascii=False)))
+        if not rows:
+            return 0
+
+        with self._lock:
+            for start, region_bits, region_segments in rows:
+                cursor = self._conn.execute(
+                    "INSERT INTO regions (model, source, position, bits, segments, language, last_used)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (model, source, start, region_bits, region_segments, language, now)
+                )
+                self._conn.executemany("INSERT INTO region_keys VALUES (?, ?, ?)",
+                                       [(key, cursor.lastrowid, frame) for key, frame in _keys(region_bits, KEY_STRIDE)])
+            self._evict()
+            self._conn.commit()
+        logger.debug(f"Stored {len(rows)} fingerprinted region(s)")
+        return len(rows)
+
+    def _evict(self):
+        # Drop the least recently used regions beyond max_regions, with their keys
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM regions").fetchone()
+        if count > self.max_regions:
+            evicted = [row[0] for row in self._conn.execute(
+                "SELECT id FROM regions ORDER BY last_used ASC LIMIT ?", (count - self.max_regions,)
+            )]
+            for start in range(0, len(evicted), 500):
+                batch = evicted[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                self._conn.execute(f"DELETE FROM region_keys WHERE region IN ({placeholders})", batch)
+                self._conn.execute(f"DELETE FROM regions WHERE id IN ({placeholders})", batch)
+            logger.debug(f"Evicted {len(evicted)} regions from the fingerprint index")
+
+    def stats(self):
+        # Matched regions in this process and regions stored
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM regions").fetchone()
+        return {"hits": self.hits, "regions": count}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,22 +1,145 @@
-from openai import OpenAI
-import os
-from dotenv import load_dotenv
+import re
+import logging
+from SonicScribe.utils.clients import get_async_client, request_options, run_sync
+from SonicScribe.utils.metrics import timed
 
-# Load environment variables
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+logger = logging.getLogger("SonicScribe")
 
-def detect_language(text):
-    """Detect the language of the given text using GPT."""
+# Languages supported by Whisper, as ISO 639-1 codes (Whisper's own codes) and English names
+LANGUAGES = {
+    "af": "Afrikaans", "am": "Amharic", "ar": "Arabic", "as": "Assamese",
+    "az": "Azerbaijani", "ba": "Bashkir", "be": "Belarusian", "bg": "Bulgarian",
+    "bn": "Bengali", "bo": "Tibetan", "br": "Breton", "bs": "Bosnian",
+    "ca": "Catalan", "cs": "Czech", "cy": "Welsh", "da": "Danish",
+    "de": "German", "el": "Greek", "en": "English", "eo": "Esperanto",
+    "es": "Spanish", "et": "Estonian", "eu": "Basque", "fa": "Persian",
+    "fi": "Finnish", "fo": "Faroese", "fr": "French", "gl": "Galician",
+    "gu": "Gujarati", "ha": "Hausa", "haw": "Hawaiian", "he": "Hebrew",
+    "hi": "Hindi", "hr": "Croatian", "ht": "Haitian Creole", "hu": "Hungarian",
+    "hy": "Armenian", "id": "Indonesian", "is": "Icelandic", "it": "Italian",
+    "ja": "Japanese", "jw": "Javanese", "ka": "Georgian", "kk": "Kazakh",
+    "km": "Khmer", "kn": "Kannada", "ko": "Korean", "la": "Latin",
+    "lb": "Luxembourgish", "ln": "Lingala", "lo": "Lao", "lt": "Lithuanian",
+    "lv": "Latvian", "mg": "Malagasy", "mi": "Maori", "mk": "Macedonian",
+    "ml": "Malayalam", "mn": "Mongolian", "mr": "Marathi", "ms": "Malay",
+    "mt": "Maltese", "my": "Burmese", "ne": "Nepali", "nl": "Dutch",
+    "no": "Norwegian", "oc": "Occitan", "pa": "Punjabi", "pl": "Polish",
+    "ps": "Pashto", "pt": "Portuguese", "ro": "Romanian", "ru": "Russian",
+    "sa": "Sanskrit", "sd": "Sindhi", "si": "Sinhala", "sk": "Slovak",
+    "sl": "Slovenian", "sn": "Shona", "so": "Somali", "sq": "Albanian",
+    "sr": "Serbian", "su": "Sundanese", "sv": "Swedish", "sw": "Swahili",
+    "ta": "Tamil", "te": "Telugu", "tg": "Tajik", "th": "Thai",
+    "tk": "Turkmen", "tl": "Tagalog", "tr": "Turkish", "tt": "Tatar",
+    "uk": "Ukrainian", "ur": "Urdu", "uz": "Uzbek", "vi": "Vietnamese",
+    "wa": "Walloon", "xh": "Xhosa", "yi": "Yiddish", "yo": "Yoruba",
+    "zh": "Chinese", "zu": "Zulu"
+}
+
+# Other names and codes for the same languages, including those Whisper reports in verbose_json
+LANGUAGE_ALIASES = {
+    "burmese": "my", "myanmar": "my", "castilian": "es", "valencian": "ca", "flemish": "nl",
+    "haitian": "ht", "letzeburgesch": "lb", "moldavian": "ro", "moldovan": "ro", "pushto": "ps",
+    "panjabi": "pa", "sinhalese": "si", "mandarin": "zh", "farsi": "fa", "jv": "jw", "nb": "no",
+    "nn": "no", "iw": "he", "in": "id", "ji": "yi", "fil": "tl", "filipino": "tl", "norwegian bokmal": "no",
+    "nynorsk": "no", "bahasa": "ms"
+}
+
+# Only this much text is sent to GPT when no cheaper source of the language is available
+DETECTION_SAMPLE_CHARS = 1000
+
+_LANGUAGE_NAMES = {name.lower(): code for code, name in LANGUAGES.items()}
+_LANGUAGE_NAMES.update(LANGUAGE_ALIASES)
+
+def normalize_language(language):
+    """Normalize a language code, name or free-form reply (e.g. "The text is in French.")
+    to a code from LANGUAGES, or "unknown"."""
+    value = " ".join(str(language or "").strip().lower().split())
+    if not value:
+        return "unknown"
+
+    # Codes, including regional variants such as "pt-BR" or "zh_CN"
+    code = re.split(r"[-_]", value)[0]
+    if code in LANGUAGES:
+        return code
+    if value in _LANGUAGE_NAMES:
+        return _LANGUAGE_NAMES[value]
+
+    # Names inside a sentence, longest first so "haitian creole" wins over "haitian"
+    for name in sorted(_LANGUAGE_NAMES, key=len, reverse=True):
+        if len(name) > 3 and re.search(rf"\b{re.escape(name)}\b", value):
+            return _LANGUAGE_NAMES[name]
+    return "unknown"
+
+def _sample(text, max_chars=DETECTION_SAMPLE_CHARS):
+    # A bounded slice of the text from its middle, where intros and credits are least likely
+    text = " ".join(str(text).split())
+    if len(text) <= max_chars:
+        return text
+    start = (len(text) - max_chars) // 2
+    return text[start:start + max_chars]
+
+def detect_language_offline(text):
+    """Detect the language of the given text locally with the optional langdetect package.
+    Returns a code, or None if langdetect is not installed or is not confident."""
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a language detection assistant."},
-                {"role": "user", "content": f"Detect the language of the following text: {text}"}
-            ]
-        )
-        detected_language = response.choices[0].message.content.strip()
+        from langdetect import DetectorFactory, detect_langs
+    except ImportError:
+        return None
+
+    # Make results deterministic
+    DetectorFactory.seed = 0
+    try:
+        best = detect_langs(text)[0]
+    except Exception as e:
+        logger.debug(f"Offline language detection failed: {e}")
+        return None
+    language = normalize_language(best.lang)
+    if best.prob < 0.9 or language == "unknown":
+        return None
+    return language
+
+async def detect_language_async(text, client=None, request_timeout=None, hint=None, metrics=None):
+    """Detect the language of the given text as a code from LANGUAGES, or "unknown".
+    Uses the hint (e.g. the language Whisper reported) if it names a language, then the
+    offline detector, and only then asks GPT about a bounded sample of the text.
+    A GPT request is timed in metrics (a RunMetrics), if given."""
+    language = normalize_language(hint)
+    if language != "unknown":
+        logger.info(f"Using language reported by Whisper: {language}")
+        return language
+
+    sample = _sample(text)
+    if not sample:
+        return "unknown"
+
+    language = detect_language_offline(sample)
+    if language:
+        logger.info(f"Detected language offline: {language}")
+        return language
+
+    client = client or get_async_client()
+    try:
+        with timed(metrics, "language_detection"):
+            response = await client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": "You are a language detection assistant. Reply with the ISO 639-1 code of the language only."},
+                    {"role": "user", "content": f"Detect the language of the following text: {sample}"}
+                ],
+                max_tokens=5,
+                **request_options(request_timeout)
+            )
+        usage = getattr(response, "usage", None)
+        if metrics is not None and usage is not None:
+            metrics.increment("prompt_tokens", usage.prompt_tokens or 0)
+            metrics.increment("completion_tokens", usage.completion_tokens or 0)
+        detected_language = normalize_language(response.choices[0].message.content)
+        logger.info(f"Detected language with GPT: {detected_language}")
         return detected_language
     except Exception as e:
-        return "unknown"
\ No newline at end of file
+        logger.warning(f"Language detection failed: {e}")
+        return "unknown"
+
+def detect_language(text, request_timeout=None, hint=None):
+    """Detect the language of the given text (synchronous wrapper)."""
+    return run_sync(detect_language_async(text, request_timeout=request_timeout, hint=hint))
@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+
+# Counters recorded by the pipeline, with the help text of their Prometheus metric
+COUNTERS = {
+    "bytes_extracted": "Bytes of audio extracted from the inputs",
+    "chunks_planned": "Audio chunks planned for transcription",
+    "chunks_transcribed": "Audio chunks transcribed by Whisper",
+    "chunks_resumed": "Audio chunks taken from a job checkpoint",
+    "chunks_reused": "Stretches of repeated audio whose segments were taken from the fingerprint index",
+    "audio_seconds_reused": "Seconds of audio not transcribed because the fingerprint index already had them",
+    "whisper_requests": "Whisper requests sent, including retries",
+    "whisper_errors": "Whisper requests that failed",
+    "whisper_retries": "Whisper requests sent again after a retryable failure",
+    "whisper_hedges": "Duplicate Whisper requests sent for requests slower than the hedge percentile",
+    "whisper_hedge_wins": "Duplicate Whisper requests that answered before the original",
+    "bytes_uploaded": "Bytes of audio uploaded to Whisper",
+    "audio_seconds": "Seconds of audio transcribed by Whisper",
+    "segments_to_translate": "Segments handed to translation",
+    "segments_translated": "Segments translated, including translation memory hits",
+    "translation_requests": "Translation requests sent, including retries and re-requests",
+    "translation_retries": "Translation requests sent again after a retryable failure",
+    "translation_rerequests": "Follow-up requests for segments missing from a reply",
+    "translation_memory_hits": "Segments taken from the translation memory",
+    "prompt_tokens": "Prompt tokens reported by the chat API",
+    "completion_tokens": "Completion tokens reported by the chat API",
+    "cache_hits": "Extracted audio and transcriptions taken from the artifact cache",
+    "cache_misses": "Extracted audio and transcriptions not found in the artifact cache",
+    "segments_written": "Segments written to the output files",
+    "files_completed": "Input files processed successfully",
+    "files_failed": "Input files that failed"
+}
+
+class RunMetrics:
+    # Thread-safe counters and per-stage timings of one run (a file or a whole batch). Stages are
+    # extraction, chunking, each Whisper request, each translation batch, language detection and
+    # file writing; counters are the names in COUNTERS. on_update, if given, is called with the
+    # metrics after every change, which is what drives the CLI progress bars.
+
+    def __init__(self, on_update=None):
+        self.on_update = on_update
+        self.started = time.time()
+        self.counters = defaultdict(float)
+        self.stages = defaultdict(lambda: {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+        self._lock = threading.Lock()
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+        self._updated()
+
+    def record(self, stage, seconds, **counters):
+        # Record one run of a stage and add any counters that go with it
+        with self._lock:
+            entry = self.stages[stage]
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            for name, value in counters.items():
+                self.counters[name] += value
+        self._updated()
+
+    @contextmanager
+    def timed(self, stage, **counters):
+        # Time the block as one run of stage; recorded even if the block fails
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, **counters)
+
+    def get(self, name):
+        with self._lock:
+            return self.counters.get(name, 0)
+
+    def _updated(self):
+        if self.on_update is not None:
+            self.on_update(self)
+
+    def report(self):
+        # Snapshot of every stage and counter, suitable for JSON
+        with self._lock:
+            stages = {name: {**entry, "seconds": round(entry["seconds"], 3), "max_seconds": round(entry["max_seconds"], 3)}
+                      for name, entry in self.stages.items()}
+            counters = {name: int(value) if float(value).is_integer() else round(value, 3)
+                        for name, value in self.counters.items()}
+        return {
+            "started": self.started,
+            "elapsed_seconds": round(time.time() - self.started, 3),
+            "stages": stages,
+            "counters": counters
+        }
+
+    def write_json(self, path, **extra):
+        # Write the report (plus any extra top-level fields) as JSON
+        _write_atomic(path, json.dumps({**self.report(), **extra}, ensure_ascii=False, indent=2) + "\n")
+
+    def write_prometheus(self, path, prefix="sonicscribe"):
+        # Write the report in the Prometheus text format, for node_exporter's textfile collector
+        report = self.report()
+        lines = [
+            f"# HELP {prefix}_run_elapsed_seconds Wall time of the run",
+            f"# TYPE {prefix}_run_elapsed_seconds gauge",
+            f"{prefix}_run_elapsed_seconds {report['elapsed_seconds']}"
+        ]
+        for field, help_text in (("count", "Times each stage ran"), ("seconds", "Seconds spent in each stage")):
+            lines += [f"# HELP {prefix}_stage_{field}_total {help_text}", f"# TYPE {prefix}_stage_{field}_total counter"]
+            lines += [f'{prefix}_stage_{field}_total{{stage="{stage}"}} {entry[field]}' for stage, entry in sorted(report["stages"].items())]
+        for name, value in sorted(report["counters"].items()):
+            lines += [
+                f"# HELP {prefix}_{name}_total {COUNTERS.get(name, name.replace('_', ' '))}",
+                f"# TYPE {prefix}_{name}_total counter",
+                f"{prefix}_{name}_total {value}"
+            ]
+        _write_atomic(path, "\n".join(lines) + "\n")
+
+def _write_atomic(path, content):
+    # Replace path in one step so collectors never read a half-written file
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+@contextmanager
+def timed(metrics, stage, **counters):
+    # metrics.timed(...) that does nothing when metrics is None
+    if metrics is None:
+        yield
+    else:
+        with metrics.timed(stage, **counters):
+            yield
@@ -0,0 +1,90 @@
+import time
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger("SonicScribe")
+
+def estimate_tokens(text):
+    # Rough token count for rate limiting (about four characters per token)
+    return len(text) // 4 + 1
+
+def get_retry_after(error):
+    # Seconds requested by the server's Retry-After header (or OpenAI's retry-after-ms), if the error carries one
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            return float(headers.get(name)) * scale
+        except (TypeError, ValueError):
+            continue
+    return None
+
+class RateLimiter:
+    # Thread-safe token-bucket limiter for requests per minute and tokens per minute.
+    # A 429 pauses every caller and halves the allowed rate, which then recovers
+    # gradually with each successful request.
+
+    def __init__(self, requests_per_minute=500, tokens_per_minute=200000):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._rate_factor = 1.0
+        self._backoff = 0.0
+        self._paused_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute * self._rate_factor / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute * self._rate_factor / 60)
+
+    def _reserve(self, tokens):
+        # Take one request and the given tokens if available; otherwise return how long to wait
+        tokens = min(tokens, self.tokens_per_minute)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self._requests >= 1 and self._tokens >= tokens:
+                self._requests -= 1
+                self._tokens -= tokens
+                return 0.0
+            request_wait = (1 - self._requests) * 60 / (self.requests_per_minute * self._rate_factor)
+            token_wait = (tokens - self._tokens) * 60 / (self.tokens_per_minute * self._rate_factor)
+            return max(request_wait, token_wait, 0.01)
+
+    def acquire(self, tokens=0):
+        # Block until one request and the given number of tokens are available
+        while True:
+            wait = self._reserve(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens=0):
+        # Wait without blocking the event loop until one request and the tokens are available
+        while True:
+            wait = self._reserve(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def record_success(self):
+        # Recover the allowed rate additively after a successful request
+        with self._lock:
+            self._rate_factor = min(1.0, self._rate_factor + 0.05)
+            self._backoff = 0.0
+
+    def record_rate_limit(self, retry_after=None):
+        # Pause all callers and halve the allowed rate after a 429
+        with self._lock:
+            self._rate_factor = max(0.1, self._rate_factor / 2)
+            self._backoff = min(max(self._backoff * 2, 1.0), 60.0)
+            delay = max(retry_after or 0.0, self._backoff)
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            logger.warning(f"Rate limited, pausing requests for {delay:.1f} seconds (rate at {self._rate_factor:.0%})")
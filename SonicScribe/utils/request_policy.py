@@ -0,0 +1,83 @@
+import math
+import random
+import asyncio
+from collections import deque
+
+from SonicScribe.utils.rate_limiter import get_retry_after
+
+# HTTP statuses worth another attempt: timeouts, conflicts, rate limits and server errors.
+# Other 4xx replies (bad request, authentication, file too large) fail the same way every time.
+RETRYABLE_STATUS = {408, 409, 425, 429}
+
+# Errors in the input or the program rather than the service; retrying cannot help
+FATAL_ERRORS = (FileNotFoundError, IsADirectoryError, NotADirectoryError, PermissionError,
+                ValueError, TypeError, ImportError, NotImplementedError)
+
+# Wall-clock limit of one remote attempt when none is set: a base plus an allowance per MB uploaded,
+# so a stalled connection is abandoned long before the HTTP read timeout of every byte would
+DEADLINE_BASE_SECONDS = 60.0
+DEADLINE_SECONDS_PER_MB = 20.0
+
+def is_retryable(error):
+    # Whether a failed transcription request may succeed if sent again
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, FATAL_ERRORS):
+        return False
+    # Anything else (a dropped connection inside the client, an unexpected reply) is treated as transient
+    return True
+
+class RequestPolicy:
+    # Retries, deadlines and hedging of Whisper requests, shared by every chunk of a run (or of a
+    # batch or service) so the latency it learns covers many requests. Translation requests use only
+    # its retry_delay.
+    #
+    # Each attempt gets a wall-clock deadline: deadline seconds if set, else the request timeout,
+    # else (for remote backends) DEADLINE_BASE_SECONDS plus DEADLINE_SECONDS_PER_MB of upload.
+    # Failures that is_retryable accepts are tried again up to attempts times in total, after an
+    # exponential backoff with jitter, or after the server's Retry-After if that is longer.
+    #
+    # With hedge_percentile (e.g. 95), a request still running after that percentile of the recent
+    # latencies (scaled to its upload size) gets a duplicate, and whichever answers first is used.
+    # Hedging starts once min_samples requests have finished and only applies to remote backends.
+
+    def __init__(self, attempts=3, deadline=None, base_delay=1.0, max_delay=30.0, hedge_percentile=None,
+                 min_samples=5, window=50):
+        self.attempts = max(1, attempts)
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        # Recent latencies in seconds per MB uploaded
+        self._latencies = deque(maxlen=window)
+
+    def attempt_deadline(self, size, request_timeout=None, remote=True):
+        # Seconds one attempt of a size-byte upload may take, or None for no limit
+        if self.deadline is not None:
+            return self.deadline
+        if request_timeout is not None:
+            return request_timeout
+        if not remote:
+            return None
+        return DEADLINE_BASE_SECONDS + DEADLINE_SECONDS_PER_MB * size / (1024 * 1024)
+
+    def retry_delay(self, attempt, error):
+        # Seconds to wait before attempt + 1: exponential backoff with jitter, or the server's hint
+        backoff = min(self.max_delay, self.base_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+        retry_after = get_retry_after(error)
+        return max(backoff, retry_after) if retry_after is not None else backoff
+
+    def record_latency(self, seconds, size):
+        self._latencies.append(seconds / max(size / (1024 * 1024), 0.01))
+
+    def hedge_delay(self, size):
+        # Seconds after which a size-byte request gets a duplicate, or None if it should not
+        if self.hedge_percentile is None or len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        rank = min(len(ordered) - 1, max(0, math.ceil(self.hedge_percentile / 100 * len(ordered)) - 1))
+        return ordered[rank] * max(size / (1024 * 1024), 0.01)
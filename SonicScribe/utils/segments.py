@@ -0,0 +1,79 @@
+import logging
+from array import array
+from typing import Any, Dict, Iterable
+
+logger = logging.getLogger("SonicScribe")
+
+class SegmentStore:
+    # Column-oriented container for transcript segments. Timestamps are kept in typed arrays
+    # (8 bytes per value instead of a float object and a dict slot each) and texts in plain lists,
+    # with no per-segment dict at all, so a long transcript costs a fraction of the equivalent
+    # list of dicts. original_text is None for segments that were never translated, and cue
+    # numbers are kept only for segments that came with one (e.g. parsed from an SRT file).
+    # Iterating or indexing yields segment dicts, so it can stand in for the list of dicts
+    # the rest of SonicScribe passes around.
+
+    __slots__ = ("starts", "ends", "texts", "originals", "indices")
+
+    def __init__(self, segments: Iterable[Dict[str, Any]] = ()):
+        self.starts = array("d")
+        self.ends = array("d")
+        self.texts = []
+        self.originals = []
+        self.indices = None
+        self.extend(segments)
+
+    def append(self, start, end, text, original_text=None, index=None):
+        if index is not None and self.indices is None:
+            # Segments before the first numbered one keep their position as cue number
+            self.indices = array("q", range(1, len(self.texts) + 1))
+        self.starts.append(start)
+        self.ends.append(end)
+        self.texts.append(text)
+        # An untranslated segment shares one string object for both columns
+        self.originals.append(text if original_text == text else original_text)
+        if self.indices is not None:
+            self.indices.append(index if index is not None else len(self.texts))
+
+    def extend(self, segments: Iterable[Dict[str, Any]]):
+        # Append segment dicts (or another SegmentStore), skipping malformed ones
+        if isinstance(segments, SegmentStore):
+            for i in range(len(segments)):
+                self.append(segments.starts[i], segments.ends[i], segments.texts[i], segments.originals[i],
+                            segments.indices[i] if segments.indices is not None else None)
+            return
+        for segment in segments:
+            if "start" not in segment or "end" not in segment or "text" not in segment:
+                logger.warning(f"Skipping malformed segment: {segment}")
+                continue
+            self.append(float(segment["start"]), float(segment["end"]), segment["text"],
+                        segment.get("original_text"), segment.get("index"))
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __bool__(self):
+        return bool(self.texts)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            sliced = SegmentStore()
+            sliced.extend(self[j] for j in range(*i.indices(len(self))))
+            return sliced
+        segment = {"start": self.starts[i], "end": self.ends[i], "text": self.texts[i]}
+        if self.originals[i] is not None:
+            segment["original_text"] = self.originals[i]
+        if self.indices is not None:
+            segment["index"] = self.indices[i]
+        return segment
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def cue_numbers(self, first=1):
+        # Cue number of every segment: its own, or its position counted from first
+        return self.indices if self.indices is not None else range(first, first + len(self))
+
+    def to_list(self):
+        return list(self)
@@ -0,0 +1,107 @@
+import os
+import logging
+from bisect import bisect_right
+from typing import List, Dict, Any, Optional, Tuple
+from SonicScribe.utils.audio_extractor import load_audio, export_audio
+
+logger = logging.getLogger("SonicScribe")
+
+# An offset map is a list of (trimmed_start, original_start, duration) tuples in seconds,
+# one per kept speech region, in playback order.
+OffsetMap = List[Tuple[float, float, float]]
+
+def detect_speech_regions(audio, frame_ms=30, silence_thresh=None, min_silence_ms=1000, padding_ms=200):
+    # Energy-based voice activity detection. Returns a list of (start_ms, end_ms) speech regions.
+    if silence_thresh is None:
+        # Relative to the loudness of the whole file, so quiet recordings are not cut away entirely
+        silence_thresh = audio.dBFS - 16
+
+    total_ms = len(audio)
+    regions = []
+    region_start = None
+
+    for pos in range(0, total_ms, frame_ms):
+        is_speech = audio[pos:pos + frame_ms].dBFS > silence_thresh
+        if is_speech and region_start is None:
+            region_start = pos
+        elif not is_speech and region_start is not None:
+            regions.append([region_start, pos])
+            region_start = None
+    if region_start is not None:
+        regions.append([region_start, total_ms])
+
+    # Pad each region and merge regions separated by less than min_silence_ms
+    merged = []
+    for start, end in regions:
+        start = max(0, start - padding_ms)
+        end = min(total_ms, end + padding_ms)
+        if merged and start - merged[-1][1] < min_silence_ms:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    return [(start, end) for start, end in merged]
+
+def remove_silence(audio_path, output_dir=None, silence_thresh=None, min_silence_ms=1000, padding_ms=200):
+    # Cut non-speech regions out of an audio file before it is uploaded.
+    # Returns (output_path, offset_map); offset_map is None if nothing was removed.
+    output_dir = output_dir or os.path.dirname(audio_path)
+    os.makedirs(output_dir, exist_ok=True)
+    base_name, ext = os.path.splitext(os.path.basename(audio_path))
+    output_path = os.path.join(output_dir, f"{base_name}_speech{ext}")
+
+    logger.info(f"Detecting speech regions in: {audio_path}")
+    audio = load_audio(audio_path)
+    regions = detect_speech_regions(audio, silence_thresh=silence_thresh,
+                                    min_silence_ms=min_silence_ms, padding_ms=padding_ms)
+
+    if not regions:
+        logger.warning("No speech detected, keeping the original audio")
+        return audio_path, None
+
+    kept_ms = sum(end - start for start, end in regions)
+    if kept_ms >= len(audio):
+        logger.info("No silence long enough to remove")
+        return audio_path, None
+
+    # Join the raw slices in one go; repeated AudioSegment concatenation copies the whole buffer each time
+    pieces = []
+    offset_map = []
+    trimmed_ms = 0
+    for start, end in regions:
+        piece = audio[start:end]
+        offset_map.append((trimmed_ms / 1000.0, start / 1000.0, len(piece) / 1000.0))
+        pieces.append(piece.raw_data)
+        trimmed_ms += len(piece)
+    speech = audio._spawn(b"".join(pieces))
+
+    export_audio(speech, output_path)
+    logger.info(f"Removed {(len(audio) - kept_ms) / 1000:.1f} of {len(audio) / 1000:.1f} seconds of silence "
+                f"({len(regions)} speech regions), saved to: {output_path}")
+    return output_path, offset_map
+
+def remap_timestamp(seconds, offset_map: OffsetMap, is_end=False, trimmed_starts=None):
+    # Map a timestamp in the silence-removed audio back to original-media time
+    if trimmed_starts is None:
+        trimmed_starts = [region[0] for region in offset_map]
+    i = bisect_right(trimmed_starts, seconds) - 1
+    # An end time that lands exactly on a region boundary belongs to the region before it
+    if is_end and i > 0 and seconds == trimmed_starts[i]:
+        i -= 1
+    i = max(i, 0)
+    trimmed_start, original_start, duration = offset_map[i]
+    return original_start + min(max(seconds - trimmed_start, 0.0), duration)
+
+def remap_segments(segments: List[Dict[str, Any]], offset_map: Optional[OffsetMap]) -> List[Dict[str, Any]]:
+    # Shift segment start/end values back to original-media time
+    if not offset_map:
+        return segments
+
+    trimmed_starts = [region[0] for region in offset_map]
+    remapped = []
+    for seg in segments:
+        seg = dict(seg)
+        seg["start"] = remap_timestamp(seg["start"], offset_map, trimmed_starts=trimmed_starts)
+        seg["end"] = max(seg["start"], remap_timestamp(seg["end"], offset_map, is_end=True, trimmed_starts=trimmed_starts))
+        remapped.append(seg)
+    return remapped
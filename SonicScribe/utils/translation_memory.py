@@ -0,0 +1,126 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+import unicodedata
+from typing import Dict, Iterable, Optional, Tuple
+
+from SonicScribe.utils.cache import DEFAULT_CACHE_DIR
+
+logger = logging.getLogger("SonicScribe")
+
+DEFAULT_MEMORY_PATH = os.path.join(DEFAULT_CACHE_DIR, "translations.sqlite3")
+
+def normalize_text(text):
+    # Normalize source text so trivially different copies of a line share one entry
+    return unicodedata.normalize("NFC", " ".join(str(text).split()))
+
+class TranslationMemory:
+    # Persistent segment-level translation store backed by SQLite. Entries are keyed by
+    # normalized source text, source language, target language and model, and the least
+    # recently used entries are evicted once the store holds more than max_entries.
+
+    def __init__(self, path=DEFAULT_MEMORY_PATH, max_entries=200000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " source_text TEXT NOT NULL,"
+            " source_language TEXT NOT NULL,"
+            " target_language TEXT NOT NULL,"
+            " model TEXT NOT NULL,"
+            " translation TEXT NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (source_text, source_language, target_language, model))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS translations_last_used ON translations (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def _language(language):
+        return (language or "unknown").strip().lower()
+
+    def lookup(self, texts: Iterable[str], source_language, target_language="en", model="gpt-4o-mini") -> Dict[str, str]:
+        # Return {normalized source text: translation} for every text found in the memory
+        keys = list(dict.fromkeys(normalize_text(text) for text in texts))
+        found = {}
+        if not keys:
+            return found
+
+        source_language = self._language(source_language)
+        target_language = self._language(target_language)
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self._conn.execute(
+                    "SELECT source_text, translation FROM translations"
+                    " WHERE source_language = ? AND target_language = ? AND model = ?"
+                    f" AND source_text IN ({','.join('?' * len(batch))})",
+                    [source_language, target_language, model, *batch]
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE translations SET last_used = ? WHERE source_text = ? AND source_language = ?"
+                    " AND target_language = ? AND model = ?",
+                    [(now, text, source_language, target_language, model) for text in found]
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, text, source_language, target_language="en", model="gpt-4o-mini") -> Optional[str]:
+        # Translation of a single line, or None on a miss
+        return self.lookup([text], source_language, target_language, model).get(normalize_text(text))
+
+    def store(self, pairs: Iterable[Tuple[str, str]], source_language, target_language="en", model="gpt-4o-mini"):
+        # Save (source text, translation) pairs
+        now = time.time()
+        source_language = self._language(source_language)
+        target_language = self._language(target_language)
+        rows = [
+            (normalize_text(text), source_language, target_language, model, translation, now)
+            for text, translation in pairs
+            if normalize_text(text) and translation
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Drop the least recently used entries beyond max_entries
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM translations WHERE rowid IN"
+                " (SELECT rowid FROM translations ORDER BY last_used ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+            logger.debug(f"Evicted {count - self.max_entries} entries from translation memory")
+
+    def stats(self):
+        # Hit/miss counters for this process
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,104 +1,230 @@
-from openai import OpenAI
-import os
-import re
-from dotenv import load_dotenv
-import time
+import json
+import asyncio
 import logging
-import math
 from typing import List, Dict, Any
+from SonicScribe.utils.translation_memory import normalize_text
+from SonicScribe.utils.rate_limiter import RateLimiter, estimate_tokens, get_retry_after
+from SonicScribe.utils.clients import get_api_key, get_async_client, request_options, run_sync, to_thread
+from SonicScribe.utils.metrics import timed
+from SonicScribe.utils.request_policy import RequestPolicy, is_retryable
 
 logger = logging.getLogger("SonicScribe")
 
-# Load environment variables
-load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=api_key)
+def _translated_segment(segment, text):
+    # Create a new segment with both original and translated text
+    return {
+        "start": segment["start"],
+        "end": segment["end"],
+        "text": text,
+        "original_text": segment["text"]
+    }
 
-def translate_segments_to_english(segments: List[Dict[str, Any]], batch_size=10, model="gpt-4o-mini", source_language="unknown") -> List[Dict[str, Any]]:
-    # Translate segments to English in batches, preserving the original text.
+# Prompt tokens per translation batch, by model. Replies are about as long as prompts, so this
+# keeps both well inside each model's output limit while amortising the instructions over many lines.
+MODEL_BATCH_TOKENS = {
+    "gpt-4o-mini": 3000,
+    "gpt-4o": 3000,
+    "gpt-4.1-mini": 3000,
+    "gpt-4.1": 3000,
+    "gpt-3.5-turbo": 1000
+}
+DEFAULT_BATCH_TOKENS = 1500
+
+def plan_batches(segments, indices, max_tokens, max_segments=50):
+    # Pack the given segment indices, in order, into batches of at most max_tokens estimated
+    # prompt tokens and max_segments segments. A segment longer than the budget gets its own batch.
+    batches = []
+    current = []
+    current_tokens = 0
+    for i in indices:
+        tokens = estimate_tokens(segments[i]["text"]) + 8  # id and JSON punctuation
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_segments):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def _parse_translations(content):
+    # Read {"translations": {"<id>": "<text>"}} from a reply; anything malformed counts as missing
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        logger.warning("Translation reply was not valid JSON")
+        return {}
+    translations = data.get("translations") if isinstance(data, dict) else None
+    if isinstance(translations, list):
+        # Tolerate [{"id": ..., "text": ...}] as well
+        translations = {str(item.get("id")): item.get("text") for item in translations if isinstance(item, dict)}
+    if not isinstance(translations, dict):
+        return {}
+    return {str(key): value.strip() for key, value in translations.items() if isinstance(value, str) and value.strip()}
+
+async def _translate_batch_async(current_batch, model, source_language, rate_limiter, client, request_timeout=None,
+                                 max_attempts=5, max_rounds=3, metrics=None, request_policy=None):
+    # Translate one batch of segments. Returns one translation per segment, or None where the
+    # model returned nothing for that segment. Segments are sent as JSON keyed by id and the reply
+    # is requested as a JSON object; ids missing from a reply are re-requested on their own, up to
+    # max_rounds requests in total. Retries after 429s under the shared limiter, which sees every
+    # 429 because the SDK's own retries are turned off, and after other transient failures with the
+    # backoff of request_policy (a RequestPolicy).
+    # Requests, retries and token usage are counted in metrics (a RunMetrics), if given.
+    from openai import RateLimitError
+
+    client = client.with_options(max_retries=0)
+    request_policy = request_policy or RequestPolicy()
+    translations = {}
+    pending = {str(i + 1): ' '.join(segment['text'].split()) for i, segment in enumerate(current_batch)}
+
+    for round_number in range(1, max_rounds + 1):
+        if metrics is not None and round_number > 1:
+            metrics.increment("translation_rerequests")
+        messages = [
+            {"role": "system", "content": f"You are a translation assistant. Translate {source_language} to English accurately. "
+                                          "Reply with a JSON object of the form {\"translations\": {\"<id>\": \"<English text>\"}} "
+                                          "containing every id you were given."},
+            {"role": "user", "content": json.dumps({"segments": [{"id": key, "text": text} for key, text in pending.items()]},
+                                                   ensure_ascii=False)}
+        ]
+
+        # Reserve room for the prompt and a reply of about the same size
+        tokens = 2 * estimate_tokens(messages[0]["content"] + messages[1]["content"])
+
+        for attempt in range(1, max_attempts + 1):
+            await rate_limiter.acquire_async(tokens)
+            if metrics is not None:
+                metrics.increment("translation_requests")
+            try:
+                response = await client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    response_format={"type": "json_object"},
+                    **request_options(request_timeout)
+                )
+                rate_limiter.record_success()
+                break
+            except RateLimitError as e:
+                rate_limiter.record_rate_limit(get_retry_after(e))
+                if attempt == max_attempts:
+                    raise
+                if metrics is not None:
+                    metrics.increment("translation_retries")
+            except Exception as e:
+                # Timeouts, server errors and dropped connections
+                if not is_retryable(e) or attempt == max_attempts:
+                    raise
+                if metrics is not None:
+                    metrics.increment("translation_retries")
+                await asyncio.sleep(request_policy.retry_delay(attempt, e))
+
+        usage = getattr(response, "usage", None)
+        if metrics is not None and usage is not None:
+            metrics.increment("prompt_tokens", usage.prompt_tokens or 0)
+            metrics.increment("completion_tokens", usage.completion_tokens or 0)
+
+        received = _parse_translations(response.choices[0].message.content)
+        for key in list(pending):
+            if key in received:
+                translations[key] = received[key]
+                del pending[key]
+
+        if not pending:
+            break
+        if round_number < max_rounds:
+            logger.info(f"Re-requesting {len(pending)} segment(s) missing from the translation reply")
+
+    if pending:
+        logger.warning(f"No translation returned for {len(pending)} segment(s) after {max_rounds} request(s)")
+    return [translations.get(str(i + 1)) for i in range(len(current_batch))]
+
+async def translate_segments_async(segments: List[Dict[str, Any]], batch_size=50, model="gpt-4o-mini", source_language="unknown", memory=None, max_workers=4, rate_limiter=None, client=None, request_timeout=None, semaphore=None, batch_tokens=None, metrics=None, request_policy=None) -> List[Dict[str, Any]]:
+    # Translate segments to English in concurrent batches, preserving the original text and order.
+    # Batches are packed up to batch_tokens estimated prompt tokens (by default the model's entry in
+    # MODEL_BATCH_TOKENS) and at most batch_size segments.
+    # A shared asyncio.Semaphore passed as semaphore bounds concurrent batches across several calls.
+    # If a TranslationMemory is given, known lines are taken from it and only the rest are sent to GPT.
+    # Requests are paced by rate_limiter (a RateLimiter), or by a default one when none is given.
+    # Batch timings and translated segments are recorded in metrics (a RunMetrics), if given.
+    # request_policy (a RequestPolicy) sets the backoff between retries of a failed request.
     if not segments:
         logger.warning("No segments to translate")
         return []
     
     # Check API key
-    if not api_key:
+    if not get_api_key():
         logger.error("OpenAI API key not found in environment variables")
         return segments
-        
-    logger.info(f"Starting translation of {len(segments)} segments in {math.ceil(len(segments)/batch_size)} batches")
+    
+    rate_limiter = rate_limiter or RateLimiter()
+    request_policy = request_policy or RequestPolicy()
+    client = client or get_async_client()
+    translated_segments = [None] * len(segments)
+    if metrics is not None:
+        metrics.increment("segments_to_translate", len(segments))
+    
+    # Look up previously translated lines before building any batch
+    pending = list(range(len(segments)))
+    if memory is not None:
+        # SQLite reads block, so they run off the event loop
+        known = await to_thread(memory.lookup, [s["text"] for s in segments], source_language, "en", model)
+        pending = []
+        for i, segment in enumerate(segments):
+            translation = known.get(normalize_text(segment["text"]))
+            if translation is not None:
+                translated_segments[i] = _translated_segment(segment, translation)
+            else:
+                pending.append(i)
+        logger.info(f"Translation memory: {len(segments) - len(pending)} of {len(segments)} segments already translated")
+        if metrics is not None:
+            metrics.increment("translation_memory_hits", len(segments) - len(pending))
+            metrics.increment("segments_translated", len(segments) - len(pending))
+    
+    batches = plan_batches(segments, pending, batch_tokens or MODEL_BATCH_TOKENS.get(model, DEFAULT_BATCH_TOKENS), batch_size)
+    logger.info(f"Starting translation of {len(pending)} segments in {len(batches)} batches with {max_workers} worker(s)")
     logger.info(f"Source language: {source_language}")
     
-    translated_segments = []
+    workers = semaphore or asyncio.Semaphore(max(1, max_workers))
     
-    # Process in batches
-    for batch_idx in range(0, len(segments), batch_size):
-        end_idx = min(batch_idx + batch_size, len(segments))
-        current_batch = segments[batch_idx:end_idx]
+    async def translate_batch(batch_number, batch_indices):
+        async with workers:
+            try:
+                with timed(metrics, "translation_batch"):
+                    translations = await _translate_batch_async([segments[i] for i in batch_indices], model,
+                                                                source_language, rate_limiter, client, request_timeout,
+                                                                metrics=metrics, request_policy=request_policy)
+            except Exception as e:
+                logger.error(f"Translation error in batch {batch_number + 1}: {e}")
+                # Keep original segments if there's an error
+                translations = [None] * len(batch_indices)
         
-        logger.info(f"Translating batch {batch_idx//batch_size + 1}/{math.ceil(len(segments)/batch_size)} ({len(current_batch)} segments)...")
+        new_translations = []
+        for i, translation in zip(batch_indices, translations):
+            if translation:
+                translated_segments[i] = _translated_segment(segments[i], translation)
+                new_translations.append((segments[i]["text"], translation))
+            else:
+                # If no match found, keep original
+                translated_segments[i] = _translated_segment(segments[i], segments[i]["text"])
         
-        # Prepare batch request with simpler format
-        messages = [
-            {"role": "system", "content": f"You are a translation assistant. Translate {source_language} to English accurately."},
-            {"role": "user", "content": "Translate each of these numbered segments to English. Return ONLY the translations, one per line, preserving the numbering:"}
-        ]
-        
-        # Add each segment as a numbered item
-        for i, segment in enumerate(current_batch):
-            messages[1]["content"] += f"\n{i+1}. {segment['text']}"
-        
-        try:
-            response = client.chat.completions.create(
-                model=model,
-                messages=messages
-            )
-            
-            # Parse the response - should be one translation per line
-            translated_text = response.choices[0].message.content.strip()
-            translated_lines = translated_text.split('\n')
-            
-            # Match translations with original segments
-            for i, segment in enumerate(current_batch):
-                # Try to find a matching numbered line
-                matching_line = None
-                for line in translated_lines:
-                    # Look for lines with the format "1. Translated text" or just numbered lines
-                    match = re.match(rf'^{i+1}\.\s*(.*)', line.strip())
-                    if match:
-                        matching_line = match.group(1)
-                        break
-                
-                if matching_line:
-                    # Create a new segment with both original and translated text
-                    translated_segments.append({
-                        "start": segment["start"],
-                        "end": segment["end"],
-                        "text": matching_line,
-                        "original_text": segment["text"]
-                    })
-                else:
-                    # If no match found, keep original
-                    translated_segments.append({
-                        "start": segment["start"],
-                        "end": segment["end"],
-                        "text": segment["text"],
-                        "original_text": segment["text"]
-                    })
-            
-            # Small delay to prevent rate limiting
-            time.sleep(1)
-            
-        except Exception as e:
-            logger.error(f"Translation error in batch {batch_idx//batch_size + 1}: {e}")
-            # Add original segments if there's an error
-            for segment in current_batch:
-                translated_segments.append({
-                    "start": segment["start"],
-                    "end": segment["end"],
-                    "text": segment["text"],
-                    "original_text": segment["text"]
-                })
-            time.sleep(2)  # Longer delay after an error
+        if memory is not None:
+            await to_thread(memory.store, new_translations, source_language, "en", model)
+        if metrics is not None:
+            metrics.increment("segments_translated", len(batch_indices))
+        logger.info(f"Translated batch {batch_number + 1}/{len(batches)} ({len(batch_indices)} segments)")
+    
+    await asyncio.gather(*(translate_batch(n, indices) for n, indices in enumerate(batches)))
     
+    if memory is not None:
+        stats = memory.stats()
+        logger.info(f"Translation memory: {stats['hits']} hits, {stats['misses']} misses")
     logger.info(f"Translation completed: {len(translated_segments)} segments processed")
-    return translated_segments
\ No newline at end of file
+    return translated_segments
+
+def translate_segments_to_english(segments: List[Dict[str, Any]], batch_size=50, model="gpt-4o-mini", source_language="unknown", memory=None, max_workers=4, rate_limiter=None, request_timeout=None, batch_tokens=None) -> List[Dict[str, Any]]:
+    # Synchronous wrapper around translate_segments_async
+    return run_sync(translate_segments_async(segments, batch_size, model, source_language, memory,
+                                             max_workers, rate_limiter, request_timeout=request_timeout,
+                                             batch_tokens=batch_tokens))
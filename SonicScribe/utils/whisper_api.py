@@ -1,153 +1,611 @@
 import os
-from openai import OpenAI
-from dotenv import load_dotenv
+import mmap
+import asyncio
 import logging
 import time
-from tenacity import retry, stop_after_attempt, wait_exponential
-from pydub import AudioSegment
+import shutil
+import tempfile
+from SonicScribe.utils.audio_extractor import (
+    decode_audio_file, export_audio, get_audio_format, stream_audio_chunks, read_wav_info, make_wav_header
+)
+from SonicScribe.utils.chunk_planner import OVERLAP_SECONDS, MAX_REPEATED_WORDS, plan_chunks, trim_repeated_segments, drop_repeated_words
+from SonicScribe.utils.backends import get_backend
+from SonicScribe.utils.fingerprints import fingerprint_pcm, reusable_spans
+from SonicScribe.utils.clients import get_api_key, run_sync, to_thread
+from SonicScribe.utils.metrics import timed
+from SonicScribe.utils.request_policy import RequestPolicy, is_retryable
 
 logger = logging.getLogger("SonicScribe")
 
-# Load environment variables
-load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=api_key)
+# Streamed chunks are uploaded as mono 16 kHz PCM WAV
+STREAM_SAMPLE_RATE = 16000
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-def transcribe_audio(audio_path, model="whisper-1"):
-    # Transcribe audio with retry mechanism
-    logger.info(f"Sending audio to Whisper API using model: {model}")
+# Times split_audio_file plans again after a chunk encoded larger than the budget
+MAX_SPLIT_ATTEMPTS = 4
+
+async def transcribe_audio_async(audio_path, model="whisper-1", client=None, request_timeout=None, metrics=None, backend=None,
+                                 request_policy=None):
+    # Transcribe audio, retrying transient failures. audio_path may also be an in-memory
+    # (filename, bytes) tuple, which is uploaded without touching the disk.
+    # backend (a TranscriptionBackend or a name from backends.BACKENDS) does the work;
+    # the default is the Whisper API through client.
+    # request_policy (a RequestPolicy) sets the attempts, the deadline of each attempt and hedging; errors
+    # that cannot succeed on another attempt (a missing file, a rejected request) are raised at once.
+    # Each attempt is recorded in metrics (a RunMetrics), if given.
+    backend = get_backend(backend, client)
+    policy = request_policy or RequestPolicy()
+    logger.info(f"Sending audio to {'Whisper API' if backend.remote else f'{backend.name} backend'} using model: {model}")
 
     # Validate input file
-    if not os.path.exists(audio_path):
+    if isinstance(audio_path, (str, os.PathLike)) and not os.path.exists(audio_path):
         logger.error(f"Audio file not found: {audio_path}")
         return None
     
     # Check API key
-    if not api_key:
+    if backend.remote and not get_api_key():
         logger.error("OpenAI API key not found in environment variables")
         return None
 
-    try:
-        with open(audio_path, "rb") as audio_file:
+    size = _upload_size(audio_path)
+    for attempt in range(1, policy.attempts + 1):
+        try:
             logger.info("Starting transcription request...")
-            start_time = time.time()
-            
-            response = client.audio.transcriptions.create(
-                model=model,
-                file=audio_file,
-                response_format="verbose_json"
-            )
-            
-            elapsed_time = time.time() - start_time
-            logger.info(f"Transcription completed in {elapsed_time:.2f} seconds")
-            
-            # Log basic stats about the response
-            if hasattr(response, "segments"):
-                logger.info(f"Received {len(response.segments)} segments")
-            
-            return response
-            
-    except Exception as e:
-        logger.error(f"Error during transcription: {str(e)}")
+            response = await _hedged_request(audio_path, model, request_timeout, metrics, backend, policy, size)
+        except Exception as e:
+            if not is_retryable(e) or attempt == policy.attempts:
+                logger.error(f"Error during transcription: {str(e) or type(e).__name__}")
+                raise
+            delay = policy.retry_delay(attempt, e)
+            logger.warning(f"Transcription attempt {attempt} failed ({str(e) or type(e).__name__}), retrying in {delay:.1f} seconds")
+            if metrics is not None:
+                metrics.increment("whisper_retries")
+            await asyncio.sleep(delay)
+            continue
+        
+        # Log basic stats about the response
+        if hasattr(response, "segments"):
+            logger.info(f"Received {len(response.segments)} segments")
+        return response
+
+async def _request_once(audio_path, model, request_timeout, metrics, backend, policy, size):
+    # One attempt, bounded by the policy's deadline and recorded in metrics
+    # Only requests that leave the machine count as Whisper requests and uploads
+    counters = {"whisper_requests": 1} if backend.remote else {}
+    start_time = time.time()
+    try:
+        response = await asyncio.wait_for(backend.transcribe(audio_path, model, request_timeout),
+                                          policy.attempt_deadline(size, request_timeout, backend.remote))
+    except asyncio.CancelledError:
+        # Lost a hedge race or the run was cancelled; not a failure of the service
+        raise
+    except Exception:
+        if metrics is not None:
+            metrics.record(backend.stage, time.time() - start_time, **counters, whisper_errors=1)
         raise
+    
+    elapsed_time = time.time() - start_time
+    logger.info(f"Transcription completed in {elapsed_time:.2f} seconds")
+    policy.record_latency(elapsed_time, size)
+    if metrics is not None:
+        if backend.remote:
+            counters["bytes_uploaded"] = size
+        metrics.record(backend.stage, elapsed_time, **counters, audio_seconds=_audio_seconds(response))
+    return response
 
-def split_audio_file(audio_path, output_dir, chunk_size_mb=20):
-    # Split audio file into chunks of specified size using pydub
-    import math
+async def _hedged_request(audio_path, model, request_timeout, metrics, backend, policy, size):
+    # Send a request and, if it outlasts the policy's hedge delay, a duplicate; the first response wins
+    # and the other request is cancelled. Fails only once every request in flight has failed.
+    delay = policy.hedge_delay(size) if backend.remote else None
+    primary = asyncio.ensure_future(_request_once(audio_path, model, request_timeout, metrics, backend, policy, size))
+    if delay is None:
+        return await primary
     
+    pending = {primary}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if not done:
+            logger.info(f"Request running longer than {delay:.1f} seconds, sending a hedged duplicate")
+            if metrics is not None:
+                metrics.increment("whisper_hedges")
+            pending.add(asyncio.ensure_future(_request_once(audio_path, model, request_timeout, metrics, backend, policy, size)))
+        error = None
+        while True:
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary and metrics is not None:
+                        metrics.increment("whisper_hedge_wins")
+                    return task.result()
+                error = task.exception()
+            if not pending:
+                raise error
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in pending:
+            task.cancel()
+
+def _upload_size(audio):
+    # Bytes of a file path or (filename, bytes) upload
+    if isinstance(audio, (str, os.PathLike)):
+        return os.path.getsize(audio)
+    return len(audio[1])
+
+def _audio_seconds(response):
+    # Duration Whisper reports for a verbose_json response, or the end of its last segment
+    duration = getattr(response, "duration", None)
+    if duration:
+        return float(duration)
+    segments = getattr(response, "segments", None) or []
+    return float(segments[-1].end) if segments else 0.0
+
+def transcribe_audio(audio_path, model="whisper-1", request_timeout=None, backend=None, request_policy=None):
+    # Synchronous wrapper around transcribe_audio_async
+    return run_sync(transcribe_audio_async(audio_path, model, request_timeout=request_timeout, backend=backend,
+                                           request_policy=request_policy))
+
+def segments_from_response(text_response):
+    # Convert a Whisper response (API object or merged dict) into a list of segment dicts
+    if hasattr(text_response, "segments"):
+        segments = text_response.segments
+    else:
+        segments = text_response.get("segments", [])
+    
+    original_segments = []
+    for seg in segments or []:
+        if hasattr(seg, 'start') and hasattr(seg, 'end') and hasattr(seg, 'text'):
+            original_segments.append({
+                "start": seg.start,
+                "end": seg.end,
+                "text": seg.text
+            })
+        else:
+            original_segments.append(seg.copy() if hasattr(seg, 'copy') else dict(seg))
+    return original_segments
+
+def split_audio_file(audio_path, output_dir, chunk_size_mb=20, overlap_seconds=OVERLAP_SECONDS, reuse=None):
+    # Split an audio file into chunks of at most chunk_size_mb, re-encoded with the source file's
+    # settings. Cuts land on quiet frames and neighbouring chunks overlap by overlap_seconds
+    # (see chunk_planner.plan_chunks). The byte budget becomes a duration through the format's bitrate,
+    # or the file's average bitrate for FLAC and other variable-rate formats; if a chunk still encodes
+    # too large, the file is planned again at the bitrate that chunk actually needed.
+    # The file is decoded once by ffmpeg into raw PCM in output_dir and read through a memory map,
+    # so only the chunk being encoded is held in memory, whatever the length of the file.
+    # Returns a list of (chunk_path, offset_seconds, keep_after) tuples in playback order, where
+    # keep_after is the previous chunk's cut (see chunk_planner.trim_repeated_segments).
+    # reuse, if given, is called with the decoded PCM and its layout and returns stretches whose
+    # segments are already known (see chunk_planner.plan_chunks); those are not exported, and their
+    # tuples carry the plan's reused dict (segments and language) in place of a chunk path.
     os.makedirs(output_dir, exist_ok=True)
     logger.info(f"Splitting audio file: {audio_path}")
     
-    # Load audio file
-    audio = AudioSegment.from_wav(audio_path)
-    
-    # Calculate duration in milliseconds
-    total_duration_ms = len(audio)
-    total_size = os.path.getsize(audio_path)
-    
-    # Calculate how many milliseconds per chunk based on file size
-    ms_per_mb = total_duration_ms / (total_size / (1024 * 1024))
-    ms_per_chunk = ms_per_mb * chunk_size_mb
-    
-    # Convert to integer
-    ms_per_chunk = int(ms_per_chunk)
-    
-    logger.info(f"Audio duration: {total_duration_ms/1000} seconds, splitting into ~{ms_per_chunk/1000} second chunks")
+    pcm_path = os.path.join(output_dir, "decoded.pcm")
+    try:
+        layout = decode_audio_file(audio_path, pcm_path)
+        with open(pcm_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return _split_pcm(b"", layout, audio_path, output_dir, chunk_size_mb, overlap_seconds, reuse)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as pcm:
+                    return _split_pcm(pcm, layout, audio_path, output_dir, chunk_size_mb, overlap_seconds, reuse, mm)
+    finally:
+        try:
+            os.remove(pcm_path)
+        except FileNotFoundError:
+            pass
+
+def _split_pcm(pcm, layout, audio_path, output_dir, chunk_size_mb, overlap_seconds, reuse, mm=None):
+    # Plan and encode the chunks of split_audio_file from the decoded PCM (a memory map mm, if given)
+    from pydub import AudioSegment
+
+    extension = os.path.splitext(audio_path)[1]
+    pcm_per_second = layout["sample_rate"] * layout["block_align"]
+    duration = len(pcm) / pcm_per_second
+    budget = int(chunk_size_mb * 1024 * 1024)
+    reused = reuse(pcm, layout) if reuse is not None else ()
     
-    # Create chunks
-    chunks = []
-    total_chunks = math.ceil(total_duration_ms / ms_per_chunk)
+    # Encoded bytes per second of audio, with headroom for container overhead and bitrate swings
+    bitrate = get_audio_format(audio_path)["bitrate"]
+    if bitrate:
+        encoded_per_second = int(bitrate.rstrip("k")) * 1000 / 8 * 1.05
+    else:
+        encoded_per_second = os.path.getsize(audio_path) / max(duration, 0.001) * 1.1
     
-    for i in range(total_chunks):
-        start_ms = i * ms_per_chunk
-        end_ms = min(start_ms + ms_per_chunk, total_duration_ms)
+    for attempt in range(MAX_SPLIT_ATTEMPTS):
+        plan = plan_chunks(pcm, layout, len(pcm), int(budget / encoded_per_second * pcm_per_second), overlap_seconds,
+                           reused=reused)
+        logger.info(f"Audio duration: {duration:.1f} seconds, planned {len(plan)} chunks of up to "
+                    f"{budget / encoded_per_second:.1f} seconds")
         
-        chunk_path = os.path.join(output_dir, f"chunk_{i+1}.wav")
-        chunk_audio = audio[start_ms:end_ms]
-        chunk_audio.export(chunk_path, format="wav")
+        chunks = []
+        oversized = None
+        for i, chunk in enumerate(plan):
+            if "reused" in chunk:
+                chunks.append((chunk["reused"], chunk["offset"], None))
+                continue
+            chunk_path = os.path.join(output_dir, f"chunk_{i+1}{extension}")
+            audio = AudioSegment(data=bytes(pcm[chunk["start"]:chunk["end"]]), sample_width=layout["sample_width"],
+                                 frame_rate=layout["sample_rate"], channels=layout["channels"])
+            export_audio(audio, chunk_path)
+            del audio
+            # Let the kernel drop the decoded pages this chunk used, so RSS does not grow with file length
+            if mm is not None and hasattr(mm, "madvise"):
+                page_start = chunk["start"] - chunk["start"] % mmap.PAGESIZE
+                mm.madvise(mmap.MADV_DONTNEED, page_start, chunk["end"] - page_start)
+            chunks.append((chunk_path, chunk["offset"], chunk["keep_after"]))
+            size = os.path.getsize(chunk_path)
+            if size > budget:
+                oversized = size / chunk["duration"]
+                break
+            logger.info(f"Created chunk {i+1}/{len(plan)}: {chunk['offset']:.1f}-{chunk['offset'] + chunk['duration']:.1f} seconds")
         
-        chunks.append(chunk_path)
-        logger.info(f"Created chunk {i+1}/{total_chunks}: {start_ms/1000}-{end_ms/1000} seconds")
+        if oversized is None:
+            return chunks
+        logger.info(f"Chunk {len(chunks)} encoded larger than {chunk_size_mb} MB, planning again with smaller chunks")
+        for chunk_path, _, _ in chunks:
+            if isinstance(chunk_path, str):
+                os.remove(chunk_path)
+        encoded_per_second = max(oversized, encoded_per_second) * 1.1
     
-    return chunks
+    raise RuntimeError(f"Could not split {audio_path} into chunks of at most {chunk_size_mb} MB")
 
-def transcribe_large_audio(audio_path, model="whisper-1", chunk_size_mb=20):
-    # Split and transcribe large audio files using Whisper API
-    logger.info(f"Audio file may be too large, splitting into chunks")
+def plan_wav_chunks(audio_path, chunk_size_mb=20, overlap_seconds=OVERLAP_SECONDS, reuse=None):
+    # Plan chunks of a PCM WAV file as byte ranges, each filling the upload budget exactly except
+    # for the distance its cut was moved back to a quiet frame (see chunk_planner.plan_chunks).
+    # Only the audio around each cut is read, unless reuse (see split_audio_file) reads it all.
+    # Returns (wav_info, plan), or (None, None) if the file is not PCM WAV.
+    info = read_wav_info(audio_path)
+    if info is None:
+        return None, None
     
-    # Create a directory for chunks
-    chunk_dir = os.path.join(os.path.dirname(audio_path), "chunks")
-    os.makedirs(chunk_dir, exist_ok=True)
+    bytes_per_second = info["sample_rate"] * info["block_align"]
+    # Leave room for the 44-byte header of each uploaded slice
+    chunk_bytes = int(chunk_size_mb * 1024 * 1024) - 44
     
-    # Split audio into chunks
-    chunks = split_audio_file(audio_path, chunk_dir, chunk_size_mb)
-    logger.info(f"Split audio into {len(chunks)} chunks")
+    with open(audio_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with memoryview(mm)[info["data_offset"]:info["data_offset"] + info["data_size"]] as data:
+            reused = reuse(data, info) if reuse is not None else ()
+            plan = plan_chunks(data, info, info["data_size"], chunk_bytes, overlap_seconds, reused=reused)
+    for chunk in plan:
+        chunk["start_byte"] = info["data_offset"] + chunk.pop("start")
+        chunk["end_byte"] = info["data_offset"] + chunk.pop("end")
     
-    # Process each chunk
-    all_segments = []
-    total_duration = 0
+    logger.info(f"Audio duration: {info['data_size'] / bytes_per_second:.1f} seconds, "
+                f"planned {len(plan)} chunks of up to {chunk_bytes / bytes_per_second:.1f} seconds")
+    return info, plan
+
+def iter_wav_chunks(audio_path, info, plan):
+    # Yield ((filename, wav_bytes), offset_seconds, keep_after) for each planned chunk, slicing a
+    # memory map of the source so only the chunks being uploaded are held in memory.
+    # Reused stretches of the plan yield (reused, offset_seconds, None), reused holding their segments and language.
+    base_name = os.path.splitext(os.path.basename(audio_path))[0]
     
-    for i, chunk_path in enumerate(chunks):
-        logger.info(f"Transcribing chunk {i+1}/{len(chunks)}")
-        
-        try:
-            chunk_response = transcribe_audio(chunk_path, model)
+    with open(audio_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i, chunk in enumerate(plan):
+            if "reused" in chunk:
+                yield chunk["reused"], chunk["offset"], None
+                continue
+            data = mm[chunk["start_byte"]:chunk["end_byte"]]
             
-            if hasattr(chunk_response, "segments") and chunk_response.segments:
-                # Convert TranscriptionSegment objects to dictionaries and adjust timestamps
-                for segment in chunk_response.segments:
-                    all_segments.append({
-                        "start": segment.start + total_duration,
-                        "end": segment.end + total_duration,
-                        "text": segment.text
-                    })
-                
-                # Get chunk duration for the next offset
-                chunk_audio = AudioSegment.from_wav(chunk_path)
-                total_duration += len(chunk_audio) / 1000.0  # Convert from ms to seconds
-            else:
-                logger.warning(f"No segments found in chunk {i+1}")
-        except Exception as e:
-            logger.error(f"Error transcribing chunk {i+1}: {e}")
+            # Let the kernel drop the pages we just copied so RSS does not grow with file length
+            if hasattr(mm, "madvise"):
+                page_start = chunk["start_byte"] - chunk["start_byte"] % mmap.PAGESIZE
+                mm.madvise(mmap.MADV_DONTNEED, page_start, chunk["end_byte"] - page_start)
+            
+            header = make_wav_header(len(data), info["sample_rate"], info["channels"], info["sample_width"])
+            yield (f"{base_name}_chunk_{i+1}.wav", header + data), chunk["offset"], chunk.get("keep_after")
+
+class ChunkTranscriptionError(Exception):
+    # Raised when one or more chunks of a large file could not be transcribed
+    def __init__(self, failed_chunks):
+        self.failed_chunks = failed_chunks
+        super().__init__(f"Failed to transcribe chunk(s) {', '.join(str(i) for i in failed_chunks)}")
+
+async def _transcribe_chunk_async(upload, offset, model, client, request_timeout, metrics=None, backend=None, keep_after=None,
+                                  request_policy=None):
+    # Transcribe a single chunk and shift its segments to the position of the chunk in the full file.
+    # With keep_after from the chunk plan, segments the previous, overlapping chunk already covers are dropped.
+    # Returns (segments, language), where language is the one Whisper reported for the chunk.
+    chunk_response = await transcribe_audio_async(upload, model, client, request_timeout, metrics, backend, request_policy)
+    if chunk_response is None:
+        raise RuntimeError("Whisper API returned no response")
+
+    segments = []
+    for segment in getattr(chunk_response, "segments", None) or []:
+        # Convert TranscriptionSegment objects to dictionaries and adjust timestamps
+        segments.append({
+            "start": segment.start + offset,
+            "end": segment.end + offset,
+            "text": segment.text
+        })
+    return trim_repeated_segments(segments, keep_after), getattr(chunk_response, "language", None)
+
+async def iter_chunk_segments_async(chunks, model="whisper-1", max_workers=4, client=None, request_timeout=None, semaphore=None,
+                                    checkpoint=None, metrics=None, backend=None, request_policy=None):
+    # Transcribe (upload, offset_seconds[, keep_after]) chunks with at most max_workers concurrent requests and
+    # yield (segments, language) for each chunk in chunk order as soon as it and every earlier chunk
+    # are done, where language is the language Whisper reported for the chunk (or None).
+    # chunks may be a lazy (blocking) generator: it is advanced in a worker thread, and at most
+    # twice max_workers chunks are held in memory at once. Chunks that still fail after their
+    # retries are skipped, and ChunkTranscriptionError is raised once the others are done.
+    # A shared asyncio.Semaphore passed as semaphore bounds uploads across several files.
+    # With a JobCheckpoint, finished chunks are recorded as they complete and are not uploaded again.
+    # Requests and finished chunks are counted in metrics (a RunMetrics), if given.
+    # backend (see transcribe_audio_async) transcribes each chunk; the default is the Whisper API.
+    # Chunks planned with overlap carry keep_after (see chunk_planner): segments the previous chunk
+    # already covers are dropped, and words repeated from the end of the previous chunk are removed.
+    # A chunk whose upload is a dict of segments and language (audio found in a FingerprintIndex)
+    # is not uploaded; those segments are used as they are.
+    # request_policy (see transcribe_audio_async) is shared by every chunk, so hedging learns from
+    # the latency of earlier chunks; a default one is made for this call if none is given.
+    workers = max(1, max_workers)
+    request_policy = request_policy or RequestPolicy()
+    running = semaphore or asyncio.Semaphore(workers)
+    pending = asyncio.Semaphore(workers * 2)
+    backend = get_backend(backend, client)
+    iterator = iter(chunks)
+    queued = asyncio.Queue()
+    tasks = []
     
-    # Clean up chunks
-    for chunk_path in chunks:
+    async def transcribe_queued(index, upload, offset, keep_after):
         try:
-            os.remove(chunk_path)
-        except:
-            pass
+            async with running:
+                segments, language = await _transcribe_chunk_async(upload, offset, model, client, request_timeout, metrics,
+                                                                   backend, keep_after, request_policy)
+            if checkpoint is not None:
+                checkpoint.record_chunk(index, offset, segments, language)
+            if metrics is not None:
+                metrics.increment("chunks_transcribed")
+            return segments, language
+        finally:
+            pending.release()
+    
+    async def checkpointed(result):
+        pending.release()
+        if metrics is not None:
+            metrics.increment("chunks_resumed")
+        return result
     
+    async def reused(upload):
+        pending.release()
+        if metrics is not None:
+            metrics.increment("chunks_reused")
+        return upload["segments"], upload["language"]
+    
+    async def feed():
+        # Keep uploading ahead of the consumer, which may still be busy with earlier chunks
+        try:
+            while True:
+                await pending.acquire()
+                chunk = await to_thread(next, iterator, None)
+                if chunk is None:
+                    pending.release()
+                    break
+                upload, offset, keep_after = chunk if len(chunk) == 3 else (*chunk, None)
+                index = len(tasks) + 1
+                done = checkpoint.chunk_segments(index, offset) if checkpoint is not None else None
+                if isinstance(upload, dict):
+                    tasks.append(asyncio.create_task(reused(upload)))
+                    logger.info(f"Chunk {index} matched repeated audio, reusing {len(upload['segments'])} segment(s)")
+                elif done is not None:
+                    tasks.append(asyncio.create_task(checkpointed(done)))
+                    logger.info(f"Chunk {index} already transcribed, reusing checkpoint")
+                else:
+                    tasks.append(asyncio.create_task(transcribe_queued(index, upload, offset, keep_after)))
+                    logger.info(f"Queued chunk {index} for transcription")
+                queued.put_nowait(tasks[-1])
+        finally:
+            queued.put_nowait(None)
+    
+    feeder = asyncio.create_task(feed())
+    failed_chunks = []
+    # Last segments yielded, enough to recognise words the next chunk repeats
+    previous = []
     try:
-        os.rmdir(chunk_dir)
-    except:
-        pass
+        chunk_number = 0
+        while True:
+            task = await queued.get()
+            if task is None:
+                break
+            chunk_number += 1
+            try:
+                segments, language = await task
+            except Exception as e:
+                logger.error(f"Error transcribing chunk {chunk_number}: {e}")
+                failed_chunks.append(chunk_number)
+                continue
+            segments = drop_repeated_words(previous, segments)
+            if segments:
+                previous = (previous + segments)[-MAX_REPEATED_WORDS:]
+            else:
+                logger.warning(f"No segments found in chunk {chunk_number}")
+            yield segments, language
+        
+        # Re-raise a failure of the chunk source itself
+        await feeder
+    finally:
+        # Cancelled, closed early or the chunk source failed: stop every upload still in flight
+        feeder.cancel()
+        for task in tasks:
+            task.cancel()
     
-    # Return combined results
+    if failed_chunks:
+        raise ChunkTranscriptionError(failed_chunks)
+
+async def _merge_chunk_segments(chunk_segments):
+    # Merge the per-chunk segments of an async iterator into a single transcription result
+    all_segments = []
+    languages = []
+    async for segments, language in chunk_segments:
+        all_segments.extend(segments)
+        if language:
+            languages.append(language)
+    
+    # Return combined results, with the language Whisper reported most often
     if all_segments:
         return {
             "text": " ".join([s["text"] for s in all_segments]),
-            "segments": all_segments
+            "segments": all_segments,
+            "language": max(set(languages), key=languages.count) if languages else None
         }
     else:
-        return None
\ No newline at end of file
+        return None
+
+async def _transcribe_chunks_async(chunks, model, max_workers, client=None, request_timeout=None, checkpoint=None, backend=None,
+                                   request_policy=None):
+    # Transcribe (upload, offset_seconds) chunks and merge their segments in chunk order
+    return await _merge_chunk_segments(iter_chunk_segments_async(chunks, model, max_workers, client, request_timeout,
+                                                                 checkpoint=checkpoint, backend=backend,
+                                                                 request_policy=request_policy))
+
+async def iter_large_audio_async(audio_path, model="whisper-1", chunk_size_mb=20, max_workers=4, client=None, request_timeout=None, semaphore=None,
+                                 checkpoint=None, metrics=None, backend=None, fingerprints=None, request_policy=None,
+                                 work_dir=None):
+    # Split a large audio file and yield (segments, language) for each chunk in playback order,
+    # uploading up to max_workers chunks concurrently. With a JobCheckpoint the chunk plan,
+    # chunk files and finished chunks are kept until the job completes, so a restart resumes.
+    # Otherwise chunk files go to a temporary directory in work_dir (by default the directory of
+    # audio_path), which is removed afterwards.
+    # With a FingerprintIndex, stretches of audio it already holds (an intro, a jingle or an ad
+    # transcribed in an earlier file) reuse its segments instead of being transcribed, and once
+    # every chunk is done the rest of the file is added to the index.
+    logger.info(f"Audio file may be too large, splitting into chunks")
+    backend = get_backend(backend, client)
+    model_key = backend.cache_key(model)
+    fingerprint = None
+    spans = []
+    
+    def reuse(pcm, layout):
+        # Called by the planner with the decoded audio: fingerprint it and look it up
+        nonlocal fingerprint, spans
+        with timed(metrics, "fingerprint"):
+            fingerprint = fingerprint_pcm(pcm, layout)
+            spans = reusable_spans(fingerprints.match(fingerprint, model_key), fingerprint)
+        if spans:
+            seconds = sum(span["end"] - span["start"] for span in spans)
+            logger.info(f"Found {len(spans)} stretch(es) of repeated audio ({seconds:.1f} seconds) in the fingerprint index")
+            if metrics is not None:
+                metrics.increment("audio_seconds_reused", seconds)
+        return spans
+    
+    async def store(segments, languages):
+        # Index the audio that was transcribed, i.e. everything between the reused stretches
+        if fingerprint is None or not segments:
+            return
+        language = max(set(languages), key=languages.count) if languages else None
+        frame_seconds = fingerprint["frame_seconds"]
+        bounds = [0] + [int(bound / frame_seconds) for span in spans for bound in (span["start"], span["end"])] + [len(fingerprint["bits"])]
+        transcribed = [(bounds[i], bounds[i + 1]) for i in range(0, len(bounds), 2) if bounds[i + 1] > bounds[i]]
+        try:
+            await to_thread(fingerprints.store, fingerprint, transcribed, segments, model_key, language)
+        except Exception as e:
+            logger.warning(f"Could not update the fingerprint index: {e}")
+    
+    # PCM WAV is sliced straight from a memory map and uploaded from memory
+    with timed(metrics, "chunking"):
+        info, plan = await to_thread(plan_wav_chunks, audio_path, chunk_size_mb, reuse=reuse if fingerprints is not None else None)
+    if plan is not None:
+        if checkpoint is not None:
+            checkpoint.record_plan(plan)
+        if metrics is not None:
+            metrics.increment("chunks_planned", len(plan))
+        logger.info(f"Transcribing {len(plan)} chunks with {max(1, min(max_workers, len(plan)))} worker(s)")
+        segments = []
+        languages = []
+        async for result in iter_chunk_segments_async(iter_wav_chunks(audio_path, info, plan), model,
+                                                        min(max_workers, len(plan)), client, request_timeout,
+                                                        semaphore, checkpoint, metrics, backend, request_policy):
+            segments.extend(result[0])
+            if result[1]:
+                languages.append(result[1])
+            yield result
+        await store(segments, languages)
+        return
+    
+    # Compressed formats are re-encoded into chunk files with pydub, in the checkpoint's chunk
+    # directory or else in a directory of this run's own, so concurrent runs on audio in the same
+    # directory never write or delete each other's chunk files
+    if checkpoint is not None:
+        chunk_dir = checkpoint.chunk_dir
+        os.makedirs(chunk_dir, exist_ok=True)
+    else:
+        work_dir = work_dir or os.path.dirname(audio_path) or None
+        if work_dir:
+            os.makedirs(work_dir, exist_ok=True)
+        chunk_dir = tempfile.mkdtemp(prefix="chunks_", dir=work_dir)
+    try:
+        # Reuse the chunk files of an interrupted run, or split audio into chunks. Reused stretches
+        # are planned with their segments in place of a chunk file.
+        chunks = None
+        if checkpoint is not None and checkpoint.plan:
+            chunks = [(chunk["path"] if chunk["path"] is not None else chunk["reused"], chunk["offset"], chunk.get("keep_after"))
+                      for chunk in checkpoint.plan]
+            if all(os.path.exists(chunk[0]) for chunk in chunks if isinstance(chunk[0], str)):
+                logger.info(f"Reusing {len(chunks)} chunk files from checkpoint")
+            else:
+                chunks = None
+        if chunks is None:
+            with timed(metrics, "chunking"):
+                chunks = await to_thread(split_audio_file, audio_path, chunk_dir, chunk_size_mb,
+                                         reuse=reuse if fingerprints is not None else None)
+            logger.info(f"Split audio into {len(chunks)} chunks")
+            if checkpoint is not None:
+                checkpoint.record_plan([
+                    {"path": upload, "offset": offset, "keep_after": keep_after} if isinstance(upload, str)
+                    else {"path": None, "offset": offset, "keep_after": keep_after, "reused": upload}
+                    for upload, offset, keep_after in chunks
+                ])
+        logger.info(f"Transcribing {len(chunks)} chunks with {max(1, min(max_workers, len(chunks)))} worker(s)")
+        if metrics is not None:
+            metrics.increment("chunks_planned", len(chunks))
+    
+        segments = []
+        languages = []
+        async for result in iter_chunk_segments_async(chunks, model, min(max_workers, len(chunks)), client, request_timeout,
+                                                      semaphore, checkpoint, metrics, backend, request_policy):
+            segments.extend(result[0])
+            if result[1]:
+                languages.append(result[1])
+            yield result
+        # A run resumed from checkpointed chunk files has no fingerprint and adds nothing
+        await store(segments, languages)
+    finally:
+        # Checkpointed chunk files are removed with the finished job
+        if checkpoint is None:
+            shutil.rmtree(chunk_dir, ignore_errors=True)
+
+async def transcribe_large_audio_async(audio_path, model="whisper-1", chunk_size_mb=20, max_workers=4, client=None, request_timeout=None,
+                                       checkpoint=None, metrics=None, backend=None, fingerprints=None, request_policy=None):
+    # Split and transcribe large audio files using Whisper API, uploading up to
+    # max_workers chunks concurrently. Raises ChunkTranscriptionError if any chunk
+    # still fails after its retries, so no part of the file is silently dropped.
+    # With a JobCheckpoint, an interrupted call resumes from the first unfinished chunk.
+    # With a FingerprintIndex, audio transcribed in earlier files is not transcribed again.
+    return await _merge_chunk_segments(iter_large_audio_async(audio_path, model, chunk_size_mb, max_workers,
+                                                              client, request_timeout, checkpoint=checkpoint, metrics=metrics,
+                                                              backend=backend, fingerprints=fingerprints,
+                                                              request_policy=request_policy))
+
+def transcribe_large_audio(audio_path, model="whisper-1", chunk_size_mb=20, max_workers=4, request_timeout=None, checkpoint=None,
+                           backend=None, fingerprints=None, request_policy=None):
+    # Synchronous wrapper around transcribe_large_audio_async
+    return run_sync(transcribe_large_audio_async(audio_path, model, chunk_size_mb, max_workers,
+                                                 request_timeout=request_timeout, checkpoint=checkpoint, backend=backend,
+                                                 fingerprints=fingerprints, request_policy=request_policy))
+
+def stream_chunks(input_path, chunk_size_mb=20):
+    # Decode a media file through an ffmpeg pipe into WAV chunks of at most chunk_size_mb
+    chunk_seconds = chunk_size_mb * 1024 * 1024 / (STREAM_SAMPLE_RATE * 2)
+    return stream_audio_chunks(input_path, chunk_seconds, STREAM_SAMPLE_RATE)
+
+async def transcribe_audio_stream_async(input_path, model="whisper-1", chunk_size_mb=20, max_workers=4, client=None, request_timeout=None,
+                                        backend=None, request_policy=None):
+    # Transcribe a media file while it is still being decoded: chunks from the ffmpeg
+    # pipe are uploaded as soon as they are complete instead of after full extraction
+    return await _transcribe_chunks_async(stream_chunks(input_path, chunk_size_mb), model, max_workers, client, request_timeout,
+                                          backend=backend, request_policy=request_policy)
+
+def transcribe_audio_stream(input_path, model="whisper-1", chunk_size_mb=20, max_workers=4, request_timeout=None, backend=None,
+                            request_policy=None):
+    # Synchronous wrapper around transcribe_audio_stream_async
+    return run_sync(transcribe_audio_stream_async(input_path, model, chunk_size_mb, max_workers,
+                                                  request_timeout=request_timeout, backend=backend,
+                                                  request_policy=request_policy))
@@ -0,0 +1,64 @@
+"""Measure package import and CLI startup time.
+
+Each measurement runs in a fresh interpreter so nothing is already imported.
+Exits non-zero if the median exceeds --max-ms or if importing SonicScribe
+pulls in one of the heavy dependencies that should only load on first use.
+
+    python benchmarks/bench_import.py --runs 10 --max-ms 300
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# Modules that must not be loaded by a bare `import SonicScribe`
+HEAVY_MODULES = ["openai", "httpx", "pydub", "moviepy", "dotenv", "rich", "questionary"]
+
+IMPORT_SNIPPET = "import SonicScribe"
+CLI_COMMAND = [sys.executable, "-m", "SonicScribe.main", "--version"]
+
+def time_command(command, runs):
+    # Wall time in milliseconds of each run of a command
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def loaded_heavy_modules():
+    # Heavy modules present in sys.modules after importing the package
+    snippet = f"{IMPORT_SNIPPET}; import sys, json; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    output = subprocess.run([sys.executable, "-c", snippet], check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SonicScribe import and CLI startup time")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per measurement")
+    parser.add_argument("--max-ms", type=float, help="Fail if a median exceeds this many milliseconds")
+    args = parser.parse_args()
+
+    baseline = statistics.median(time_command([sys.executable, "-c", "pass"], args.runs))
+    results = {
+        "import SonicScribe": statistics.median(time_command([sys.executable, "-c", IMPORT_SNIPPET], args.runs)),
+        "sonicscribe --version": statistics.median(time_command(CLI_COMMAND, args.runs)),
+    }
+
+    failed = False
+    print(f"{'interpreter startup':<24}{baseline:8.1f} ms")
+    for name, median in results.items():
+        over = args.max_ms is not None and median > args.max_ms
+        failed = failed or over
+        print(f"{name:<24}{median:8.1f} ms  (+{median - baseline:.1f} ms){'  OVER BUDGET' if over else ''}")
+
+    heavy = loaded_heavy_modules()
+    if heavy:
+        failed = True
+        print(f"`{IMPORT_SNIPPET}` eagerly loaded: {', '.join(heavy)}")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Offline throughput benchmark against the local mock OpenAI server.
+
+Runs transcribe_large_audio, translate_segments_to_english, the
+translate_srt CLI and the full sonicscribe CLI on synthetic media of
+several lengths, with every request going to mock_openai.py. For each run
+it reports wall time, requests issued, bytes uploaded and peak Python
+memory (tracemalloc). Results can be saved as JSON and compared against
+an earlier run, e.g. before and after a change:
+
+    python benchmarks/bench_pipeline.py --json before.json
+    python benchmarks/bench_pipeline.py --baseline before.json --latency 0.2 --rate-limit-rate 0.05
+
+The full CLI scenario needs ffmpeg for audio extraction.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+
+from mock_openai import MockOpenAIServer
+
+# Benchmark the checkout this script lives in, whether or not the package is installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Synthetic media is 16 kHz mono 16-bit PCM
+SAMPLE_RATE = 16000
+
+def write_wav(path, seconds):
+    # Noise-filled WAV of the given length, written in one-second blocks
+    rng = random.Random(seconds)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        for _ in range(int(seconds)):
+            # Random bytes built from getrandbits, since Random.randbytes needs Python 3.9
+            f.writeframes(rng.getrandbits(SAMPLE_RATE * 16).to_bytes(SAMPLE_RATE * 2, "little"))
+    return path
+
+def make_segments(count):
+    # Subtitle-like segments of a few seconds each
+    return [{
+        "start": i * 4.0,
+        "end": i * 4.0 + 3.5,
+        "text": f"Bonjour et bienvenue, ceci est la phrase numéro {i + 1} de notre émission."
+    } for i in range(count)]
+
+def measure(name, server, function, trace_memory=True):
+    # Run function once and return its wall time, requests, uploaded bytes and peak memory
+    before = server.stats()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    error = None
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            function()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    after = server.stats()
+    return {
+        "name": name,
+        "wall_seconds": round(elapsed, 3),
+        "requests": after["requests"] - before["requests"],
+        "bytes_uploaded": after["bytes_received"] - before["bytes_received"],
+        "peak_memory_mb": round(peak / (1024 * 1024), 2) if peak is not None else None,
+        "error": error
+    }
+
+def scenarios(workdir, lengths, args):
+    # (name, callable) pairs for every benchmarked entry point and media length
+    from SonicScribe.utils.whisper_api import transcribe_large_audio
+    from SonicScribe.utils.translator import translate_segments_to_english
+    from SonicScribe.utils.file_manager import write_srt
+    from SonicScribe import main as sonicscribe_main, translate_srt
+
+    def run_cli(module, argv):
+        saved = sys.argv
+        sys.argv = [module.__name__] + argv
+        try:
+            if module.main() != 0:
+                raise RuntimeError(f"{module.__name__} exited with an error")
+        finally:
+            sys.argv = saved
+
+    connection = ["--base-url", args.base_url]
+    for seconds in lengths:
+        wav = write_wav(os.path.join(workdir, f"audio_{seconds}s.wav"), seconds)
+        segments = make_segments(max(1, int(seconds / 4)))
+        srt = os.path.join(workdir, f"subtitles_{seconds}s.srt")
+        write_srt(segments, srt)
+        label = f"{seconds}s"
+
+        yield f"transcribe_large_audio {label}", lambda wav=wav: transcribe_large_audio(
+            wav, chunk_size_mb=args.chunk_size, max_workers=args.workers)
+        yield f"translate_segments_to_english {label}", lambda segments=segments: translate_segments_to_english(
+            segments, source_language="fr", max_workers=args.workers)
+        yield f"translate_srt {label}", lambda srt=srt: run_cli(translate_srt, [
+            "--input", srt, "--output", srt + ".en.srt", "--language", "fr", "--no-cache",
+            "--workers", str(args.workers)] + connection)
+        if not args.skip_cli:
+            yield f"sonicscribe --translate {label}", lambda wav=wav, label=label: run_cli(sonicscribe_main, [
+                "--input", wav, "--output-dir", os.path.join(workdir, "out", label), "--translate",
+                "--language", "fr", "--non-interactive", "--no-cache", "--audio-format", "wav",
+                "--chunk-size", str(args.chunk_size), "--workers", str(args.workers)] + connection)
+
+def print_results(results, baseline=None):
+    previous = {result["name"]: result for result in baseline or []}
+    print(f"{'scenario':<40}{'wall s':>9}{'reqs':>7}{'uploaded MB':>13}{'peak MB':>9}  vs baseline")
+    for result in results:
+        peak = f"{result['peak_memory_mb']:.1f}" if result["peak_memory_mb"] is not None else "-"
+        line = (f"{result['name']:<40}{result['wall_seconds']:>9.2f}{result['requests']:>7}"
+                f"{result['bytes_uploaded'] / (1024 * 1024):>13.1f}{peak:>9}")
+        old = previous.get(result["name"])
+        if old and old["wall_seconds"]:
+            line += f"  {100 * (result['wall_seconds'] / old['wall_seconds'] - 1):+.1f}% time, {result['requests'] - old['requests']:+d} reqs"
+        if result["error"]:
+            line += f"  FAILED {result['error']}"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SonicScribe offline against a local mock OpenAI server")
+    parser.add_argument("--lengths", default="60,600,1800", help="Comma-separated lengths in seconds of the synthetic media")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent chunks / translation batches")
+    parser.add_argument("--chunk-size", type=int, default=20, help="Chunk size in MB for transcription")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean mock response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform jitter in seconds around --latency")
+    parser.add_argument("--upload-latency", type=float, default=0.0, help="Extra mock latency per uploaded MB")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with a 429")
+    parser.add_argument("--skip-cli", action="store_true", help="Skip the full sonicscribe CLI scenario (needs ffmpeg)")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Do not trace peak memory (tracing slows the run down)")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against results saved earlier with --json")
+    args = parser.parse_args()
+
+    # Never send a real key, even to localhost
+    os.environ["OPENAI_API_KEY"] = "sk-benchmark"
+
+    from SonicScribe.utils.clients import configure_clients
+    # Import the client library up front so the first scenario does not pay for it
+    import openai  # noqa: F401
+
+    lengths = [int(length) for length in args.lengths.split(",")]
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    with MockOpenAIServer(latency=args.latency, jitter=args.jitter, upload_latency=args.upload_latency,
+                          error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate) as server, \
+            tempfile.TemporaryDirectory(prefix="sonicscribe-bench-") as workdir:
+        args.base_url = server.base_url
+        configure_clients(base_url=server.base_url)
+        results = [measure(name, server, function, not args.no_tracemalloc)
+                   for name, function in scenarios(workdir, lengths, args)]
+        statuses = server.stats()["statuses"]
+
+    print_results(results, baseline)
+    print(f"Mock responses by status: {statuses}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": {key: value for key, value in vars(args).items() if key not in ("json", "baseline")},
+                       "results": results}, f, indent=2)
+
+    return 1 if any(result["error"] for result in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
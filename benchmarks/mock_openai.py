@@ -0,0 +1,204 @@
+"""Local stand-in for the OpenAI endpoints SonicScribe uses.
+
+Serves /v1/audio/transcriptions (verbose_json) and /v1/chat/completions
+(translation batches and language detection) with configurable latency,
+server errors and 429s, and counts requests and uploaded bytes. Used by
+bench_pipeline.py; it can also run on its own and be targeted with
+`sonicscribe --base-url http://127.0.0.1:8000/v1`:
+
+    python benchmarks/mock_openai.py --port 8000 --latency 0.3 --rate-limit-rate 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Uploaded bytes that stand for one transcribed segment, and the seconds each segment covers
+BYTES_PER_SEGMENT = 64 * 1024
+SEGMENT_SECONDS = 4.0
+
+class MockOpenAIServer:
+    # Threaded HTTP server answering like the OpenAI API. latency is the mean delay of every
+    # response (uniformly jittered by +-jitter), upload_latency is added per uploaded MB.
+    # error_rate and rate_limit_rate are the fractions of requests answered with a 500 or a 429.
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, jitter=0.0, upload_latency=0.0,
+                 error_rate=0.0, rate_limit_rate=0.0, retry_after=1, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.upload_latency = upload_latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = Counter()
+        self.statuses = Counter()
+        self.bytes_received = 0
+
+        handler = type("Handler", (_Handler,), {"mock": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def stats(self):
+        # Snapshot of the counters since the server started
+        with self._lock:
+            return {
+                "requests": sum(self.requests.values()),
+                "by_endpoint": dict(self.requests),
+                "statuses": dict(self.statuses),
+                "bytes_received": self.bytes_received
+            }
+
+    def _record(self, path, size):
+        with self._lock:
+            self.requests[path] += 1
+            self.bytes_received += size
+
+    def _record_status(self, status):
+        with self._lock:
+            self.statuses[status] += 1
+
+    def _fault(self):
+        # Status to inject for this request, if any
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500
+        return None
+
+    def _delay(self, size):
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        return max(0.0, self.latency + jitter) + self.upload_latency * size / (1024 * 1024)
+
+class _Handler(BaseHTTPRequestHandler):
+    mock = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        size = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(size)
+        path = self.path.split("?")[0]
+        self.mock._record(path, size)
+        time.sleep(self.mock._delay(size))
+
+        fault = self.mock._fault()
+        if fault == 429:
+            return self._reply(429, {"error": {"message": "Rate limit reached (mock)", "type": "requests", "code": "rate_limit_exceeded"}},
+                               {"Retry-After": str(self.mock.retry_after)})
+        if fault == 500:
+            return self._reply(500, {"error": {"message": "Internal server error (mock)", "type": "server_error"}})
+
+        if path.endswith("/audio/transcriptions"):
+            return self._reply(200, _transcription(size))
+        if path.endswith("/chat/completions"):
+            return self._reply(200, _chat_completion(json.loads(body)))
+        return self._reply(404, {"error": {"message": f"Unknown endpoint {path}", "type": "invalid_request_error"}})
+
+    def _reply(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.mock._record_status(status)
+
+def _transcription(size):
+    # verbose_json response with one segment per BYTES_PER_SEGMENT uploaded bytes
+    count = max(1, size // BYTES_PER_SEGMENT)
+    segments = [{
+        "id": i,
+        "seek": 0,
+        "start": i * SEGMENT_SECONDS,
+        "end": (i + 1) * SEGMENT_SECONDS,
+        "text": f" Bonjour et bienvenue, ceci est le segment numéro {i + 1} de la transcription.",
+        "tokens": [],
+        "temperature": 0.0,
+        "avg_logprob": -0.2,
+        "compression_ratio": 1.2,
+        "no_speech_prob": 0.01
+    } for i in range(count)]
+    return {
+        "task": "transcribe",
+        "language": "french",
+        "duration": count * SEGMENT_SECONDS,
+        "text": "".join(segment["text"] for segment in segments),
+        "segments": segments
+    }
+
+def _chat_completion(request):
+    # Translation batches are answered as JSON, anything else as a language detection
+    if (request.get("response_format") or {}).get("type") == "json_object":
+        segments = json.loads(request["messages"][-1]["content"])["segments"]
+        content = json.dumps({"translations": {segment["id"]: f"[en] {segment['text']}" for segment in segments}}, ensure_ascii=False)
+    else:
+        content = "fr"
+    prompt_tokens = sum(len(message["content"]) for message in request["messages"]) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "gpt-4o-mini"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock of the OpenAI endpoints used by SonicScribe")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean seconds before each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform jitter in seconds around --latency")
+    parser.add_argument("--upload-latency", type=float, default=0.0, help="Extra seconds per uploaded MB")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with a 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with a 429")
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(args.host, args.port, args.latency, args.jitter, args.upload_latency,
+                              args.error_rate, args.rate_limit_rate, args.retry_after)
+    print(f"Mock OpenAI API listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(json.dumps(server.stats(), indent=2))
+
+if __name__ == "__main__":
+    main()
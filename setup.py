@@ -20,15 +20,20 @@ setup(
     packages=find_packages(include=["SonicScribe", "SonicScribe.*"]),
     include_package_data=True,
     install_requires=[
-        "openai>=1.0.0",
+        "openai>=1.17.0",
         "moviepy>=1.0.3",
         "python-dotenv>=1.0.0",
-        "tenacity>=8.0.0",
         "rich>=13.0.0",
         "pydub>=0.25.1",
         "typing-extensions>=4.0.0",
         "questionary>=1.10.0"
     ],
+    extras_require={
+        # Offline language detection, used before falling back to GPT
+        "langdetect": ["langdetect>=1.0.9"],
+        # Offline transcription on the CPU (--backend local)
+        "local": ["faster-whisper>=1.0.0"],
+    },
     entry_points={
         "console_scripts": [
             "sonicscribe=SonicScribe.main:main",
@@ -0,0 +1,36 @@
+import os
+
+from SonicScribe.utils.cache import ArtifactCache
+
+def _fill(cache, key, size, mtime):
+    path = cache.put_json(key, "x" * (size - 2))
+    os.utime(path, (mtime, mtime))
+    return path
+
+def test_evicts_least_recently_used_first(tmp_path):
+    cache = ArtifactCache(str(tmp_path), max_size_mb=3000 / (1024 * 1024))
+    first = _fill(cache, "aa1", 1000, 1000)
+    second = _fill(cache, "bb2", 1000, 2000)
+    # Reading an entry makes it the most recently used
+    assert cache.get_json("aa1") == "x" * 998
+    third = _fill(cache, "cc3", 1000, 3000)
+    assert cache.size == 3000
+    cache.put_json("dd4", "x" * 998)
+    assert os.path.exists(first) and not os.path.exists(second) and os.path.exists(third)
+    assert cache.size <= cache.max_size
+    assert cache.get_json("bb2") is None
+
+def test_skips_entries_larger_than_the_cache(tmp_path):
+    cache = ArtifactCache(str(tmp_path), max_size_mb=100 / (1024 * 1024))
+    source = tmp_path / "big.flac"
+    source.write_bytes(b"\0" * 200)
+    assert cache.put_file("key", str(source)) is None
+    assert cache.put_json("key", "x" * 200) is None
+    assert cache.size == 0
+
+def test_replacing_an_entry_counts_only_the_difference(tmp_path):
+    cache = ArtifactCache(str(tmp_path), max_size_mb=1)
+    cache.put_json("key", "x" * 98)
+    cache.put_json("key", "x" * 48)
+    assert cache.size == 50
+    assert ArtifactCache(str(tmp_path), max_size_mb=1).size == 50
@@ -0,0 +1,77 @@
+import os
+import time
+
+import pytest
+
+from SonicScribe.utils.checkpoint import CheckpointInUseError, JobCheckpoint, expire_jobs
+
+PLAN = [{"start": 0, "end": 100, "offset": 0.0}, {"start": 90, "end": 200, "offset": 4.5}]
+
+def test_resume_restores_finished_units(tmp_path):
+    checkpoint = JobCheckpoint.for_job("job", str(tmp_path))
+    checkpoint.record_plan(PLAN)
+    checkpoint.record_chunk(0, 0.0, [{"start": 0.0, "end": 1.0, "text": "hola"}], "es")
+    checkpoint.store([("hola", "hello")], "ES", "en", "gpt-4o-mini")
+    checkpoint.close()
+
+    resumed = JobCheckpoint.for_job("job", str(tmp_path))
+    resumed.record_plan(PLAN)
+    assert resumed.chunk_segments(0, 0.0) == ([{"start": 0.0, "end": 1.0, "text": "hola"}], "es")
+    assert resumed.chunk_segments(1, 4.5) is None
+    assert resumed.lookup(["Hola", "hola "], "es", "EN", "gpt-4o-mini") == {"hola": "hello"}
+    assert resumed.lookup(["hola"], "es", "en", "gpt-4o") == {}
+    resumed.close()
+
+def test_plan_mismatch_discards_chunks(tmp_path):
+    checkpoint = JobCheckpoint.for_job("job", str(tmp_path))
+    checkpoint.record_plan(PLAN)
+    checkpoint.record_chunk(0, 0.0, [{"start": 0.0, "end": 1.0, "text": "hola"}])
+    checkpoint.store([("hola", "hello")], "es", "en", "gpt-4o-mini")
+    checkpoint.close()
+
+    resumed = JobCheckpoint.for_job("job", str(tmp_path))
+    resumed.record_plan(PLAN[:1])
+    assert resumed.chunk_segments(0, 0.0) is None
+    # Translations do not depend on the chunk plan
+    assert resumed.lookup(["hola"], "es", "en", "gpt-4o-mini") == {"hola": "hello"}
+    resumed.close()
+
+    again = JobCheckpoint.for_job("job", str(tmp_path))
+    assert again.plan == PLAN[:1] and again.chunks == {}
+    again.close()
+
+def test_checkpoint_is_held_by_one_run(tmp_path):
+    checkpoint = JobCheckpoint.for_job("job", str(tmp_path))
+    with pytest.raises(CheckpointInUseError):
+        JobCheckpoint.for_job("job", str(tmp_path))
+    checkpoint.remove()
+    assert not os.path.exists(os.path.join(str(tmp_path), "job"))
+    JobCheckpoint.for_job("job", str(tmp_path)).close()
+
+def test_ignores_a_truncated_manifest_line(tmp_path):
+    checkpoint = JobCheckpoint.for_job("job", str(tmp_path))
+    checkpoint.record_plan(PLAN)
+    checkpoint.close()
+    with open(checkpoint.path, "a", encoding="utf-8") as f:
+        f.write('{"type": "chunk", "ind')
+    resumed = JobCheckpoint.for_job("job", str(tmp_path))
+    assert resumed.plan == PLAN and resumed.chunks == {}
+    resumed.close()
+
+def test_expire_jobs_keeps_recent_and_running_jobs(tmp_path):
+    jobs_dir = str(tmp_path)
+    for key in ("old", "running", "recent"):
+        checkpoint = JobCheckpoint.for_job(key, jobs_dir)
+        checkpoint.record_plan(PLAN)
+        if key != "running":
+            checkpoint.close()
+        else:
+            running = checkpoint
+    old = time.time() - 30 * 24 * 3600
+    for key in ("old", "running"):
+        os.utime(os.path.join(jobs_dir, key, "manifest.jsonl"), (old, old))
+
+    assert expire_jobs(jobs_dir) == 1
+    assert sorted(os.listdir(jobs_dir)) == ["recent", "running"]
+    running.close()
+    assert expire_jobs(str(tmp_path / "missing")) == 0
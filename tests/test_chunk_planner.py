@@ -0,0 +1,72 @@
+from array import array
+import sys
+
+from SonicScribe.utils.chunk_planner import drop_repeated_words, plan_chunks, trim_repeated_segments
+
+RATE = 1000
+LAYOUT = {"sample_rate": RATE, "channels": 1, "sample_width": 2, "block_align": 2}
+
+def pcm(seconds, quiet=()):
+    # Loud mono 16-bit PCM with silence over each (start, end) second range in quiet
+    samples = array("h", [8000 if i % 2 else -8000 for i in range(int(seconds * RATE))])
+    for start, end in quiet:
+        for i in range(int(start * RATE), int(end * RATE)):
+            samples[i] = 0
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return samples.tobytes()
+
+def test_plan_chunks_covers_the_data_with_overlap():
+    data = pcm(60)
+    plan = plan_chunks(data, LAYOUT, len(data), chunk_bytes=20 * RATE * 2, overlap_seconds=1.0, search_seconds=2.0)
+    assert plan[0]["start"] == 0 and plan[-1]["end"] == len(data)
+    assert plan[0]["keep_after"] is None
+    for previous, chunk in zip(plan, plan[1:]):
+        assert chunk["end"] - chunk["start"] <= 20 * RATE * 2
+        assert chunk["start"] < previous["end"]
+        assert chunk["keep_after"] == previous["end"] / (RATE * 2)
+        assert chunk["offset"] == chunk["start"] / (RATE * 2)
+
+def test_plan_chunks_cuts_on_quiet_frames():
+    data = pcm(40, quiet=[(18.5, 18.8), (17.0, 17.3)])
+    plan = plan_chunks(data, LAYOUT, len(data), chunk_bytes=20 * RATE * 2, overlap_seconds=1.0, search_seconds=2.0)
+    cut = plan[0]["end"] / (RATE * 2)
+    assert 18.5 <= cut <= 18.8
+    assert 17.0 <= plan[1]["start"] / (RATE * 2) <= 17.3
+
+def test_plan_chunks_small_input_is_one_chunk():
+    data = pcm(5)
+    assert plan_chunks(data, LAYOUT, len(data), chunk_bytes=len(data)) == [
+        {"start": 0, "end": len(data), "offset": 0.0, "duration": 5.0, "keep_after": None}
+    ]
+
+def test_trim_repeated_segments():
+    segments = [{"start": 0.0, "end": 1.0}, {"start": 1.0, "end": 2.0}, {"start": 1.5, "end": 3.0}]
+    assert trim_repeated_segments(segments, None) is segments
+    assert trim_repeated_segments(segments, 2.0) == [{"start": 1.5, "end": 3.0}]
+
+def test_drop_repeated_words_cuts_the_repeated_run():
+    previous = [{"start": 8.0, "end": 10.0, "text": "and then we went to the market"}]
+    segments = [{"start": 9.2, "end": 12.0, "text": " to the market, where it rained"}]
+    assert drop_repeated_words(previous, segments) == [{"start": 10.0, "end": 12.0, "text": " where it rained"}]
+
+def test_drop_repeated_words_drops_a_fully_repeated_segment():
+    previous = [{"start": 8.0, "end": 10.0, "text": "we went to the Market."}]
+    segments = [{"start": 9.0, "end": 9.9, "text": "the market"}, {"start": 9.9, "end": 12.0, "text": "It rained."}]
+    assert drop_repeated_words(previous, segments) == [segments[1]]
+
+def test_drop_repeated_words_ignores_segments_after_the_boundary():
+    previous = [{"start": 8.0, "end": 10.0, "text": "to the market"}]
+    segments = [{"start": 10.5, "end": 12.0, "text": "the market was closed"}]
+    assert drop_repeated_words(previous, segments) == segments
+    assert drop_repeated_words([], segments) == segments
+
+def test_drop_repeated_words_needs_more_than_one_common_word():
+    previous = [{"start": 8.0, "end": 10.0, "text": "and we looked at the"}]
+    segments = [{"start": 9.5, "end": 12.0, "text": "the dog barked at the gate"}]
+    assert drop_repeated_words(previous, segments) == segments
+
+def test_drop_repeated_words_drops_one_word_inside_the_overlap():
+    previous = [{"start": 8.0, "end": 10.0, "text": "we went to the market"}]
+    segments = [{"start": 9.4, "end": 9.9, "text": "Market."}, {"start": 9.9, "end": 12.0, "text": "It rained."}]
+    assert drop_repeated_words(previous, segments) == [segments[1]]
@@ -0,0 +1,37 @@
+from SonicScribe.utils.file_manager import format_time, parse_srt, render_segments
+
+SEGMENTS = [
+    {"start": 0.0, "end": 1.5, "text": "Hello there."},
+    {"start": 1.5, "end": 3.25, "text": "Second line\nwith a break"},
+    {"start": 3599.9996, "end": 3661.0, "text": "Past the hour"}
+]
+
+def test_srt_round_trip():
+    parsed = parse_srt(render_segments(SEGMENTS, ("srt",))["srt"])
+    assert [segment["index"] for segment in parsed] == [1, 2, 3]
+    assert [segment["text"] for segment in parsed] == [segment["text"] for segment in SEGMENTS]
+    assert [segment["start"] for segment in parsed] == [0.0, 1.5, 3600.0]
+    assert [segment["end"] for segment in parsed] == [1.5, 3.25, 3661.0]
+
+def test_parsed_cue_numbers_are_kept():
+    content = "7\n00:00:01,000 --> 00:00:02,000\nA\n\n9\n00:00:02,000 --> 00:00:03,000\nB\n\n"
+    assert render_segments(parse_srt(content), ("srt",))["srt"] == content
+
+def test_parse_srt_tolerates_bom_crlf_and_missing_indices():
+    content = "﻿1\r\n00:00:00,5 --> 00:00:01.250 X:10\r\nFirst\r\n\r\n\r\n00:00:02,000 --> 00:00:03,000\r\nSecond\r\n"
+    parsed = parse_srt(content)
+    assert [(segment["index"], segment["start"], segment["end"], segment["text"]) for segment in parsed] == [
+        (1, 0.5, 1.25, "First"), (2, 2.0, 3.0, "Second")
+    ]
+
+def test_bilingual_keeps_original_above_translation():
+    segments = [
+        {"start": 0.0, "end": 1.0, "text": "Hello", "original_text": "Hola"},
+        {"start": 1.0, "end": 2.0, "text": "OK", "original_text": "OK"}
+    ]
+    parsed = parse_srt(render_segments(segments, ("bilingual",))["bilingual"])
+    assert [segment["text"] for segment in parsed] == ["Hola\nHello", "OK"]
+
+def test_format_time_rounds_to_whole_milliseconds():
+    assert format_time(1.9996) == "00:00:02,000"
+    assert format_time(-1) == "00:00:00,000"
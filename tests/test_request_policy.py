@@ -0,0 +1,90 @@
+import asyncio
+import types
+
+import pytest
+
+from SonicScribe.utils.backends import TranscriptionBackend
+from SonicScribe.utils.metrics import RunMetrics
+from SonicScribe.utils.request_policy import RequestPolicy, is_retryable
+from SonicScribe.utils.whisper_api import _hedged_request
+
+class StatusError(Exception):
+    # Shaped like the SDK's APIStatusError: a status_code and the response's headers
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+        self.response = types.SimpleNamespace(headers=headers or {})
+
+@pytest.mark.parametrize("status", [408, 409, 425, 429, 500, 502, 503])
+def test_retryable_statuses(status):
+    assert is_retryable(StatusError(status))
+
+@pytest.mark.parametrize("status", [400, 401, 403, 404, 413, 422])
+def test_fatal_statuses(status):
+    assert not is_retryable(StatusError(status))
+
+def test_errors_without_status():
+    assert is_retryable(asyncio.TimeoutError())
+    assert is_retryable(ConnectionResetError())
+    assert is_retryable(RuntimeError("unexpected reply"))
+    assert not is_retryable(FileNotFoundError("a.flac"))
+    assert not is_retryable(ValueError("bad option"))
+
+def test_retry_delay_honours_retry_after():
+    error = StatusError(429, {"retry-after": "7"})
+    policy = RequestPolicy(base_delay=0.1, max_delay=1.0)
+    assert policy.retry_delay(1, error) == 7.0
+    assert 0.5 <= policy.retry_delay(5, RuntimeError()) <= 1.0
+
+class FakeBackend(TranscriptionBackend):
+    # Answers the nth request after delays[n] seconds, or raises errors[n] if set
+    name = "fake"
+    remote = True
+    stage = "whisper_request"
+
+    def __init__(self, delays, errors=()):
+        self.delays = list(delays)
+        self.errors = list(errors) + [None] * len(delays)
+        self.calls = 0
+
+    async def transcribe(self, audio, model, request_timeout=None):
+        n = self.calls
+        self.calls += 1
+        await asyncio.sleep(self.delays[n])
+        if self.errors[n] is not None:
+            raise self.errors[n]
+        return types.SimpleNamespace(request=n, segments=[], duration=1.0)
+
+def _hedging_policy():
+    policy = RequestPolicy(hedge_percentile=50, min_samples=2)
+    for _ in range(4):
+        policy.record_latency(0.05, 1024 * 1024)
+    return policy
+
+def _request(backend, policy, metrics=None):
+    return asyncio.run(_hedged_request(("a.wav", b"\0"), "whisper-1", None, metrics, backend, policy, 1024 * 1024))
+
+def test_slow_request_is_hedged_and_the_duplicate_wins():
+    backend = FakeBackend([5.0, 0.0])
+    metrics = RunMetrics()
+    assert _request(backend, _hedging_policy(), metrics).request == 1
+    assert backend.calls == 2
+    assert metrics.get("whisper_hedges") == 1 and metrics.get("whisper_hedge_wins") == 1
+
+def test_fast_request_is_not_hedged():
+    backend = FakeBackend([0.0, 0.0])
+    assert _request(backend, _hedging_policy()).request == 0
+    assert backend.calls == 1
+
+def test_no_hedging_without_enough_samples():
+    backend = FakeBackend([0.2, 0.0])
+    assert _request(backend, RequestPolicy(hedge_percentile=50, min_samples=2)).request == 0
+    assert backend.calls == 1
+
+def test_hedge_fails_only_when_every_request_fails():
+    backend = FakeBackend([0.2, 0.0], errors=[None, ConnectionResetError()])
+    assert _request(backend, _hedging_policy()).request == 0
+
+    backend = FakeBackend([0.2, 0.0], errors=[TimeoutError(), ConnectionResetError()])
+    with pytest.raises(TimeoutError):
+        _request(backend, _hedging_policy())
@@ -0,0 +1,99 @@
+import json
+import os
+import socket
+import threading
+import time
+from http.client import HTTPConnection
+
+import pytest
+
+from SonicScribe.server import TranscriptionService, make_server
+
+@pytest.fixture(scope="module")
+def service(tmp_path_factory):
+    # One service for the whole module; no request here ever becomes a job
+    tmp_path = tmp_path_factory.mktemp("service")
+    media = tmp_path / "media"
+    media.mkdir()
+    (media / "talk.wav").write_bytes(b"RIFF")
+    service = TranscriptionService({"output_dir": str(tmp_path / "out")}, jobs=1, queue_size=1,
+                                   cache_dir=str(tmp_path / "cache"), use_cache=False,
+                                   input_root=str(media)).start()
+    server = make_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    service.port = server.server_address[1]
+    service.media = str(media)
+    yield service
+    server.shutdown()
+    server.server_close()
+    service.stop()
+
+def post(service, body, path="/jobs"):
+    connection = HTTPConnection("127.0.0.1", service.port, timeout=10)
+    connection.request("POST", path, body if isinstance(body, bytes) else json.dumps(body).encode("utf-8"))
+    response = connection.getresponse()
+    result = response.status, json.loads(response.read())
+    connection.close()
+    return result
+
+def queued(service):
+    # Queue slots in use once the handler has given back any it took; it answers just before that
+    deadline = time.time() + 5
+    while service.health()["queued"] and time.time() < deadline:
+        time.sleep(0.01)
+    return service.health()["queued"]
+
+@pytest.mark.parametrize("body, message", [
+    (b"[]", "Request body must be a JSON object"),
+    (b'"talk.wav"', "Request body must be a JSON object"),
+    ({}, "Missing 'input'"),
+    ({"input": ["talk.wav"]}, "'input' must be a path"),
+    ({"input": "/etc/hostname"}, "Input must be under"),
+    ({"input": "{media}/../talk.wav"}, "Input must be under"),
+    ({"input": "{media}/missing.wav"}, "Input file not found"),
+    ({"input": "{media}/talk.wav", "colour": "red"}, "Unknown options: colour"),
+    ({"input": "{media}/talk.wav", "chunk_size_mb": "big"}, ""),
+    ({"input": "{media}/talk.wav", "output_dir": "../elsewhere"}, "output_dir must be under"),
+    ({"input": "{media}/talk.wav", "output_dir": "/tmp"}, "output_dir must be under"),
+])
+def test_bad_requests_get_400(service, body, message):
+    if isinstance(body, dict):
+        body = {name: value.format(media=service.media) if isinstance(value, str) else value
+                for name, value in body.items()}
+    status, payload = post(service, body)
+    assert status == 400
+    assert message in payload["error"]
+    # The slot taken for the request is given back
+    assert queued(service) == 0
+
+def test_unsupported_upload_gets_400(service):
+    status, payload = post(service, b"0123456789", "/jobs?filename=notes.txt")
+    assert status == 400 and "Unsupported media file" in payload["error"]
+    assert queued(service) == 0
+    assert not os.path.isdir(service.upload_dir) or not os.listdir(service.upload_dir)
+
+def test_full_queue_gets_429_before_the_upload_is_read(service):
+    service.reserve()
+    try:
+        # Announce far more than is sent: the answer must come without waiting for the body
+        client = socket.create_connection(("127.0.0.1", service.port), timeout=10)
+        client.sendall(b"POST /jobs?filename=talk.wav HTTP/1.1\r\nHost: x\r\nContent-Length: 5000000000\r\n\r\n" + b"\0" * 1024)
+        reply = b""
+        while b"\r\n\r\n" not in reply:
+            reply += client.recv(65536)
+        client.close()
+    finally:
+        service.release()
+    head = reply.split(b"\r\n\r\n")[0].decode().lower()
+    assert head.startswith("http/1.1 429")
+    assert "retry-after: 5" in head and "connection: close" in head
+    assert queued(service) == 0
+    assert not os.path.isdir(service.upload_dir) or not os.listdir(service.upload_dir)
+
+def test_full_queue_gets_429_for_json_jobs(service):
+    service.reserve()
+    try:
+        status, payload = post(service, {"input": os.path.join(service.media, "talk.wav")})
+    finally:
+        service.release()
+    assert status == 429 and "Queue is full" in payload["error"]
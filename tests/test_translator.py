@@ -0,0 +1,29 @@
+import json
+
+from SonicScribe.utils.translator import _parse_translations, plan_batches
+
+def test_parse_translations_object():
+    content = json.dumps({"translations": {"1": " Hello ", "2": "World", "3": "", "4": 5}})
+    assert _parse_translations(content) == {"1": "Hello", "2": "World"}
+
+def test_parse_translations_list_of_items():
+    content = json.dumps({"translations": [{"id": 1, "text": "Hello"}, {"id": "2", "text": "World"}, "junk"]})
+    assert _parse_translations(content) == {"1": "Hello", "2": "World"}
+
+def test_parse_translations_malformed_replies_count_as_missing():
+    for content in ("not json", None, "[]", json.dumps({"translations": "Hello"}), json.dumps({"other": {}})):
+        assert _parse_translations(content) == {}
+
+def test_plan_batches_respects_token_budget_and_order():
+    segments = [{"text": "x" * 40} for _ in range(10)]  # 11 + 8 estimated tokens each
+    batches = plan_batches(segments, range(10), max_tokens=60)
+    assert batches == [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]]
+
+def test_plan_batches_respects_segment_limit_and_indices():
+    segments = [{"text": "a"} for _ in range(10)]
+    assert plan_batches(segments, [1, 3, 5, 7, 9], max_tokens=1000, max_segments=2) == [[1, 3], [5, 7], [9]]
+
+def test_plan_batches_gives_an_oversized_segment_its_own_batch():
+    segments = [{"text": "a"}, {"text": "x" * 1000}, {"text": "b"}]
+    assert plan_batches(segments, range(3), max_tokens=50) == [[0], [1], [2]]
+    assert plan_batches(segments, [], max_tokens=50) == []